@@ -11,7 +11,8 @@ from app.db import get_engine  # noqa
 from app import models  # noqa: F401  (ensure models are imported)
 
 config = context.config
-if config.config_file_name is not None:
+# in-process runs (app startup) keep the application's logging setup
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 target_metadata = SQLModel.metadata
@@ -29,16 +30,24 @@ def run_migrations_offline() -> None:
     with context.begin_transaction():
         context.run_migrations()
 
+def _run_with_connection(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        compare_type=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
 def run_migrations_online() -> None:
+    # app.scripts.bootstrap passes its own connection, which holds the migration lock
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
     connectable = get_engine()
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=target_metadata,
-            compare_type=True,
-        )
-        with context.begin_transaction():
-            context.run_migrations()
+        _run_with_connection(connection)
 
 if context.is_offline_mode():
     run_migrations_offline()
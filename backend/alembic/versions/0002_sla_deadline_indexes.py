@@ -0,0 +1,46 @@
+"""sla deadline expression indexes
+
+Revision ID: 0002_sla_deadline_indexes
+Revises: 0001_initial
+Create Date: 2026-10-19 09:12:40
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_sla_deadline_indexes"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+OPEN_SLA_JOBS = "status IN ('unassigned', 'assigned', 'in_progress') AND sla_started_at IS NOT NULL"
+
+def upgrade():
+    # timestamptz + interval depends only on its inputs, so these are safe to index
+    op.execute(
+        "CREATE FUNCTION job_sla_due_at(started timestamptz, minutes integer) RETURNS timestamptz "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$ SELECT started + make_interval(mins => minutes) $$"
+    )
+    op.execute(
+        "CREATE FUNCTION job_sla_risk_at(started timestamptz, minutes integer) RETURNS timestamptz "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$ SELECT started + make_interval(secs => minutes * 48) $$"
+    )
+    op.create_index(
+        "ix_jobs_sla_due_open", "jobs", [sa.text("job_sla_due_at(sla_started_at, sla_minutes_total)")],
+        postgresql_where=sa.text(OPEN_SLA_JOBS),
+    )
+    op.create_index(
+        "ix_jobs_sla_risk_open", "jobs", [sa.text("job_sla_risk_at(sla_started_at, sla_minutes_total)")],
+        postgresql_where=sa.text(OPEN_SLA_JOBS),
+    )
+    op.create_index(
+        "ix_alerts_open_entity", "alerts", ["alert_type", "entity_type", "entity_id"],
+        postgresql_where=sa.text("status <> 'resolved'"),
+    )
+
+def downgrade():
+    op.drop_index("ix_alerts_open_entity", table_name="alerts")
+    op.drop_index("ix_jobs_sla_risk_open", table_name="jobs")
+    op.drop_index("ix_jobs_sla_due_open", table_name="jobs")
+    op.execute("DROP FUNCTION job_sla_risk_at(timestamptz, integer)")
+    op.execute("DROP FUNCTION job_sla_due_at(timestamptz, integer)")
@@ -0,0 +1,25 @@
+"""alert escalation level and open due_by index
+
+Revision ID: 0003_alert_escalation
+Revises: 0002_sla_deadline_indexes
+Create Date: 2026-10-19 11:40:05
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_alert_escalation"
+down_revision = "0002_sla_deadline_indexes"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("alerts", sa.Column("escalation_level", sa.Integer(), nullable=False, server_default="0"))
+    op.create_index(
+        "ix_alerts_open_due", "alerts", ["due_by"],
+        postgresql_where=sa.text("status = 'open' AND due_by IS NOT NULL"),
+    )
+
+def downgrade():
+    op.drop_index("ix_alerts_open_due", table_name="alerts")
+    op.drop_column("alerts", "escalation_level")
@@ -0,0 +1,55 @@
+"""deduplicate open alerts per entity
+
+Revision ID: 0004_alert_dedupe
+Revises: 0003_alert_escalation
+Create Date: 2026-10-19 13:05:51
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_alert_dedupe"
+down_revision = "0003_alert_escalation"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("alerts", sa.Column("occurrences", sa.Integer(), nullable=False, server_default="1"))
+    op.add_column("alerts", sa.Column("last_seen_at", sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE alerts SET last_seen_at = created_at")
+    op.alter_column("alerts", "last_seen_at", nullable=False, server_default=sa.text("now()"))
+
+    # fold existing duplicates into the oldest unresolved alert per key and resolve the rest
+    op.execute(
+        """
+        WITH ranked AS (
+            SELECT id,
+                   row_number() OVER w AS rn,
+                   count(*) OVER (PARTITION BY alert_type, entity_type, entity_id) AS n,
+                   max(created_at) OVER (PARTITION BY alert_type, entity_type, entity_id) AS last_seen
+            FROM alerts
+            WHERE status <> 'resolved' AND entity_id IS NOT NULL
+            WINDOW w AS (PARTITION BY alert_type, entity_type, entity_id ORDER BY created_at, id)
+        )
+        UPDATE alerts
+        SET occurrences = CASE WHEN ranked.rn = 1 THEN ranked.n ELSE alerts.occurrences END,
+            last_seen_at = CASE WHEN ranked.rn = 1 THEN ranked.last_seen ELSE alerts.last_seen_at END,
+            status = CASE WHEN ranked.rn = 1 THEN alerts.status ELSE 'resolved' END
+        FROM ranked
+        WHERE alerts.id = ranked.id AND ranked.n > 1
+        """
+    )
+    op.drop_index("ix_alerts_open_entity", table_name="alerts")
+    op.create_index(
+        "uq_alerts_open_entity", "alerts", ["alert_type", "entity_type", "entity_id"], unique=True,
+        postgresql_where=sa.text("status <> 'resolved'"),
+    )
+
+def downgrade():
+    op.drop_index("uq_alerts_open_entity", table_name="alerts")
+    op.create_index(
+        "ix_alerts_open_entity", "alerts", ["alert_type", "entity_type", "entity_id"],
+        postgresql_where=sa.text("status <> 'resolved'"),
+    )
+    op.drop_column("alerts", "last_seen_at")
+    op.drop_column("alerts", "occurrences")
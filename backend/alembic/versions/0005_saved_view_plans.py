@@ -0,0 +1,31 @@
+"""saved view versions and sort indexes
+
+Revision ID: 0005_saved_view_plans
+Revises: 0004_alert_dedupe
+Create Date: 2026-10-19 15:22:10
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_saved_view_plans"
+down_revision = "0004_alert_dedupe"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("saved_views", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+    # every sort a saved view may use is backed by an index
+    op.create_index("ix_jobs_last_update_at", "jobs", ["last_update_at"])
+    op.create_index("ix_jobs_customer", "jobs", ["customer"])
+    op.create_index("ix_drivers_last_update_at", "drivers", ["last_update_at"])
+    op.create_index("ix_vehicles_last_update_at", "vehicles", ["last_update_at"])
+    op.create_index("ix_alerts_created_at", "alerts", ["created_at"])
+
+def downgrade():
+    op.drop_index("ix_alerts_created_at", table_name="alerts")
+    op.drop_index("ix_vehicles_last_update_at", table_name="vehicles")
+    op.drop_index("ix_drivers_last_update_at", table_name="drivers")
+    op.drop_index("ix_jobs_customer", table_name="jobs")
+    op.drop_index("ix_jobs_last_update_at", table_name="jobs")
+    op.drop_column("saved_views", "version")
@@ -0,0 +1,45 @@
+"""driver hours rollover dates and compliance sweep indexes
+
+Revision ID: 0006_compliance_sweep
+Revises: 0005_saved_view_plans
+Create Date: 2026-10-19 17:05:41
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_compliance_sweep"
+down_revision = "0005_saved_view_plans"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, predicate) -- the predicates must match the text()
+# clauses in app/services/compliance.py exactly
+PARTIAL_INDEXES = [
+    ("ix_drivers_hours_today_ok", "drivers", ["hours_today"], "compliance_state = 'ok'"),
+    ("ix_drivers_hours_week_ok", "drivers", ["hours_week"], "compliance_state = 'ok'"),
+    ("ix_drivers_blocked", "drivers", ["id"], "compliance_state = 'blocked'"),
+    ("ix_vehicles_service_ok", "vehicles", ["next_service_date"], "compliance_state = 'ok'"),
+    ("ix_vehicles_faults_ok", "vehicles", ["faults_open"], "compliance_state = 'ok'"),
+    ("ix_vehicles_blocked", "vehicles", ["id"], "compliance_state = 'blocked'"),
+    ("ix_vehicles_service_available", "vehicles", ["next_service_date"], "status = 'available'"),
+    ("ix_vehicles_due_service", "vehicles", ["next_service_date"], "status = 'due_service'"),
+]
+
+def upgrade():
+    op.add_column("drivers", sa.Column("hours_today_date", sa.Date(), nullable=True))
+    op.add_column("drivers", sa.Column("hours_week_start", sa.Date(), nullable=True))
+    # existing counters are taken to be for the current day and week
+    op.execute("UPDATE drivers SET hours_today_date = current_date, hours_week_start = date_trunc('week', current_date)::date")
+    op.create_index("ix_drivers_hours_today_date", "drivers", ["hours_today_date"])
+    op.create_index("ix_drivers_hours_week_start", "drivers", ["hours_week_start"])
+    for name, table, columns, predicate in PARTIAL_INDEXES:
+        op.create_index(name, table, columns, postgresql_where=sa.text(predicate))
+
+def downgrade():
+    for name, table, _, _ in reversed(PARTIAL_INDEXES):
+        op.drop_index(name, table_name=table)
+    op.drop_index("ix_drivers_hours_week_start", table_name="drivers")
+    op.drop_index("ix_drivers_hours_today_date", table_name="drivers")
+    op.drop_column("drivers", "hours_week_start")
+    op.drop_column("drivers", "hours_today_date")
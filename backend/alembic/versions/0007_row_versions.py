@@ -0,0 +1,31 @@
+"""row versions for compare-and-swap writes and the job claim queue
+
+Revision ID: 0007_row_versions
+Revises: 0006_compliance_sweep
+Create Date: 2026-10-19 18:52:03
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_row_versions"
+down_revision = "0006_compliance_sweep"
+branch_labels = None
+depends_on = None
+
+# must match UNCLAIMED_JOBS and CLAIM_RANK in app/services/jobs.py
+UNCLAIMED_JOBS = "status = 'unassigned' AND owner_user_id IS NULL"
+CLAIM_RANK = "(CASE priority WHEN 'critical' THEN 0 WHEN 'high' THEN 1 WHEN 'normal' THEN 2 ELSE 3 END)"
+
+def upgrade():
+    for table in ("jobs", "drivers", "vehicles"):
+        op.add_column(table, sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+    op.create_index(
+        "ix_jobs_claim_queue", "jobs", [sa.text(CLAIM_RANK), "scheduled_at"],
+        postgresql_where=sa.text(UNCLAIMED_JOBS),
+    )
+
+def downgrade():
+    op.drop_index("ix_jobs_claim_queue", table_name="jobs")
+    for table in ("vehicles", "drivers", "jobs"):
+        op.drop_column(table, "version")
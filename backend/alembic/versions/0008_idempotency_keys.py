@@ -0,0 +1,32 @@
+"""idempotency keys for retried POSTs
+
+Revision ID: 0008_idempotency_keys
+Revises: 0007_row_versions
+Create Date: 2026-10-19 19:31:17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_idempotency_keys"
+down_revision = "0007_row_versions"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("scope", sa.String(length=100), nullable=False),
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column("request_hash", sa.String(length=64), nullable=False),
+        sa.Column("status_code", sa.Integer(), nullable=True),
+        sa.Column("response_body", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("scope", "key"),
+    )
+    op.create_index("ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
+
+def downgrade():
+    op.drop_index("ix_idempotency_keys_expires_at", table_name="idempotency_keys")
+    op.drop_table("idempotency_keys")
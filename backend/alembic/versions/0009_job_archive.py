@@ -0,0 +1,81 @@
+"""partition jobs into live and archive, daily rollups of archived jobs
+
+Revision ID: 0009_job_archive
+Revises: 0008_idempotency_keys
+Create Date: 2026-10-19 20:14:36
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_job_archive"
+down_revision = "0008_idempotency_keys"
+branch_labels = None
+depends_on = None
+
+# same predicates as migrations 0002 and 0007
+OPEN_SLA_JOBS = "status IN ('unassigned', 'assigned', 'in_progress') AND sla_started_at IS NOT NULL"
+UNCLAIMED_JOBS = "status = 'unassigned' AND owner_user_id IS NULL"
+CLAIM_RANK = "(CASE priority WHEN 'critical' THEN 0 WHEN 'high' THEN 1 WHEN 'normal' THEN 2 ELSE 3 END)"
+# must match ARCHIVABLE_JOBS in app/services/archive.py
+ARCHIVABLE_JOBS = "archived = false AND status IN ('completed', 'failed', 'cancelled')"
+
+def _jobs_constraints_and_indexes(key: list[str]):
+    # everything migrations 0001-0007 put on jobs; on a partitioned table the
+    # primary key and unique constraint have to include the partition key
+    op.create_primary_key("jobs_pkey", "jobs", ["id", *key])
+    op.create_unique_constraint("jobs_job_code_key", "jobs", ["job_code", *key])
+    op.create_foreign_key("jobs_driver_id_fkey", "jobs", "drivers", ["driver_id"], ["id"], ondelete="SET NULL")
+    op.create_foreign_key("jobs_vehicle_id_fkey", "jobs", "vehicles", ["vehicle_id"], ["id"], ondelete="SET NULL")
+    op.create_foreign_key("jobs_owner_user_id_fkey", "jobs", "users", ["owner_user_id"], ["id"], ondelete="SET NULL")
+    op.create_index("ix_jobs_status", "jobs", ["status"])
+    op.create_index("ix_jobs_scheduled_at", "jobs", ["scheduled_at"])
+    op.create_index("ix_jobs_last_update_at", "jobs", ["last_update_at"])
+    op.create_index("ix_jobs_customer", "jobs", ["customer"])
+    op.create_index(
+        "ix_jobs_sla_due_open", "jobs", [sa.text("job_sla_due_at(sla_started_at, sla_minutes_total)")],
+        postgresql_where=sa.text(OPEN_SLA_JOBS),
+    )
+    op.create_index(
+        "ix_jobs_sla_risk_open", "jobs", [sa.text("job_sla_risk_at(sla_started_at, sla_minutes_total)")],
+        postgresql_where=sa.text(OPEN_SLA_JOBS),
+    )
+    op.create_index(
+        "ix_jobs_claim_queue", "jobs", [sa.text(CLAIM_RANK), "scheduled_at"],
+        postgresql_where=sa.text(UNCLAIMED_JOBS),
+    )
+
+def upgrade():
+    # Rebuilds jobs as LIST (archived) partitioned: jobs_live for current work,
+    # jobs_archive for what the archiver moves out. Rows are copied once and the
+    # indexes built after the copy; every job starts out live.
+    op.add_column("jobs", sa.Column("archived", sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.execute("ALTER TABLE jobs RENAME TO jobs_unpartitioned")
+    op.execute("CREATE TABLE jobs (LIKE jobs_unpartitioned INCLUDING DEFAULTS) PARTITION BY LIST (archived)")
+    op.execute("CREATE TABLE jobs_live PARTITION OF jobs FOR VALUES IN (false)")
+    op.execute("CREATE TABLE jobs_archive PARTITION OF jobs FOR VALUES IN (true)")
+    op.execute("INSERT INTO jobs SELECT * FROM jobs_unpartitioned")
+    op.execute("DROP TABLE jobs_unpartitioned")
+    _jobs_constraints_and_indexes(["archived"])
+    op.create_index("ix_jobs_archivable", "jobs", ["last_update_at"], postgresql_where=sa.text(ARCHIVABLE_JOBS))
+
+    op.create_table(
+        "job_daily_rollups",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("customer", sa.String(), nullable=False),
+        sa.Column("priority", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("jobs", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("resolved", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("resolution_minutes", sa.Float(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("day", "customer", "priority", "status"),
+    )
+
+def downgrade():
+    op.drop_table("job_daily_rollups")
+    op.execute("ALTER TABLE jobs RENAME TO jobs_partitioned")
+    op.execute("CREATE TABLE jobs (LIKE jobs_partitioned INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO jobs SELECT * FROM jobs_partitioned")
+    op.execute("DROP TABLE jobs_partitioned")
+    _jobs_constraints_and_indexes([])
+    op.drop_column("jobs", "archived")
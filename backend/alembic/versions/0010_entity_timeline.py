@@ -0,0 +1,45 @@
+"""per-entity timeline indexes and audit batch entity links
+
+Revision ID: 0010_entity_timeline
+Revises: 0009_job_archive
+Create Date: 2026-10-19 21:02:18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010_entity_timeline"
+down_revision = "0009_job_archive"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "audit_log_entities",
+        sa.Column("audit_id", sa.Uuid(), sa.ForeignKey("audit_log_entries.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("entity_type", sa.String(), nullable=False),
+        sa.Column("entity_id", sa.Uuid(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("audit_id", "entity_type", "entity_id"),
+    )
+    # id breaks timestamp ties, so keyset pages walk these indexes without a sort
+    op.create_index(
+        "ix_audit_log_entities_timeline", "audit_log_entities",
+        ["entity_type", "entity_id", sa.text("timestamp DESC"), sa.text("audit_id DESC")],
+    )
+    op.create_index(
+        "ix_alerts_entity_timeline", "alerts",
+        ["entity_type", "entity_id", sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+    # built inside the migration transaction: the in-process bootstrap holds its
+    # advisory lock in an outer transaction, so CONCURRENTLY is not available
+    op.create_index(
+        "ix_audit_entity_timeline", "audit_log_entries",
+        ["entity_type", "entity_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+    )
+
+def downgrade():
+    op.drop_index("ix_audit_entity_timeline", table_name="audit_log_entries")
+    op.drop_index("ix_alerts_entity_timeline", table_name="alerts")
+    op.drop_index("ix_audit_log_entities_timeline", table_name="audit_log_entities")
+    op.drop_table("audit_log_entities")
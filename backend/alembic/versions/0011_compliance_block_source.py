@@ -0,0 +1,31 @@
+"""record which blocks the compliance sweep raised
+
+Revision ID: 0011_compliance_block_source
+Revises: 0010_entity_timeline
+Create Date: 2026-10-20 10:14:52
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011_compliance_block_source"
+down_revision = "0010_entity_timeline"
+branch_labels = None
+depends_on = None
+
+# the sweep only clears its own blocks; predicates match app/services/compliance.py
+SWEEP_BLOCKED = "compliance_state = 'blocked' AND blocked_by = 'sweep'"
+
+def upgrade():
+    for table in ("drivers", "vehicles"):
+        op.add_column(table, sa.Column("blocked_by", sa.String(), nullable=True))
+        # until now the sweep cleared every block, so existing ones are taken to be its own
+        op.execute(f"UPDATE {table} SET blocked_by = 'sweep' WHERE compliance_state = 'blocked'")
+        op.drop_index(f"ix_{table}_blocked", table_name=table)
+        op.create_index(f"ix_{table}_sweep_blocked", table, ["id"], postgresql_where=sa.text(SWEEP_BLOCKED))
+
+def downgrade():
+    for table in ("vehicles", "drivers"):
+        op.drop_index(f"ix_{table}_sweep_blocked", table_name=table)
+        op.create_index(f"ix_{table}_blocked", table, ["id"], postgresql_where=sa.text("compliance_state = 'blocked'"))
+        op.drop_column(table, "blocked_by")
@@ -0,0 +1,24 @@
+"""global job_code uniqueness across the live and archive partitions
+
+Revision ID: 0012_job_codes
+Revises: 0011_compliance_block_source
+Create Date: 2026-10-20 11:02:37
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012_job_codes"
+down_revision = "0011_compliance_block_source"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # jobs_job_code_key has to include the partition key since 0009, so it only
+    # keeps codes unique within live or within archive. Every code is reserved
+    # here instead, once, and stays reserved after its job is archived.
+    op.create_table("job_codes", sa.Column("job_code", sa.String(), primary_key=True))
+    op.execute("INSERT INTO job_codes (job_code) SELECT DISTINCT job_code FROM jobs")
+
+def downgrade():
+    op.drop_table("job_codes")
@@ -0,0 +1,37 @@
+"""(sort column, id) indexes for saved view sorts
+
+Revision ID: 0013_view_sort_keys
+Revises: 0012_job_codes
+Create Date: 2026-10-20 12:26:09
+"""
+
+from alembic import op
+
+revision = "0013_view_sort_keys"
+down_revision = "0012_job_codes"
+branch_labels = None
+depends_on = None
+
+# Saved views order by (sort column, id) so offset pages are stable. With the
+# single-column indexes from 0001/0005 that needs an incremental sort over every
+# matching row; these composites return rows in view order. Sorts on unique
+# columns (job_code, staff_id, registration) take no tiebreaker. Must match
+# ViewModule.sorts in app/services/views.py.
+SORT_INDEXES = [
+    ("ix_jobs_last_update_at", "jobs", "last_update_at"),
+    ("ix_jobs_scheduled_at", "jobs", "scheduled_at"),
+    ("ix_drivers_last_update_at", "drivers", "last_update_at"),
+    ("ix_vehicles_last_update_at", "vehicles", "last_update_at"),
+    ("ix_alerts_created_at", "alerts", "created_at"),
+    ("ix_alerts_severity", "alerts", "severity"),
+]
+
+def upgrade():
+    for name, table, column in SORT_INDEXES:
+        op.drop_index(name, table_name=table)
+        op.create_index(name, table, [column, "id"])
+
+def downgrade():
+    for name, table, column in reversed(SORT_INDEXES):
+        op.drop_index(name, table_name=table)
+        op.create_index(name, table, [column])
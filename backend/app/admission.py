@@ -0,0 +1,235 @@
+from __future__ import annotations
+import asyncio
+import json
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from app import metrics
+from app.config import settings
+from app.startup import pooled_background_workers
+
+# Admission control in front of the routes. Every request belongs to a route
+# class with its own concurrency limit and bounded wait queue, then takes one
+# of the shared DB slots (pool size + overflow, less one connection for each
+# background worker that uses the pool). Slots held back by
+# ADMISSION_RESERVED_SLOTS are only ever given to priority classes, and freed
+# slots go to waiting priority requests first, so a burst of reports or deep
+# audit paging cannot starve dispatch writes. A request that finds its queue
+# full, or waits longer than the class allows, gets 503 with Retry-After.
+
+
+@dataclass(frozen=True)
+class RouteClass:
+    name: str
+    concurrency: int
+    queue: int
+    max_wait: float  # seconds a request may wait for a slot
+    retry_after: int
+    priority: bool = False
+
+
+DEFAULT_CLASSES = {
+    "write": RouteClass("write", concurrency=32, queue=256, max_wait=5.0, retry_after=1, priority=True),
+    "dispatch": RouteClass("dispatch", concurrency=16, queue=128, max_wait=5.0, retry_after=1, priority=True),
+    "list": RouteClass("list", concurrency=16, queue=64, max_wait=2.0, retry_after=1),
+    "audit": RouteClass("audit", concurrency=4, queue=8, max_wait=1.0, retry_after=3),
+    "report": RouteClass("report", concurrency=2, queue=4, max_wait=1.0, retry_after=5),
+}
+
+# first match wins; class None means the route is never queued
+ROUTE_RULES = [
+    (re.compile(r"^/(health|ready|metrics|ingest|debug)(/|$)"), None, None),
+    (re.compile(r"^/jobs/(claim-next|[^/]+/(assign|candidates))$"), None, "dispatch"),
+    (re.compile(r"^/reports(/|$)"), {"GET"}, "report"),
+    (re.compile(r"^/audit(/|$)"), {"GET"}, "audit"),
+]
+SAFE_METHODS = {"GET", "HEAD"}
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    for pattern, methods, name in ROUTE_RULES:
+        if pattern.match(path) and (methods is None or method in methods):
+            return name
+    if method == "OPTIONS":
+        return None
+    return "list" if method in SAFE_METHODS else "write"
+
+
+def load_classes(raw: str) -> dict[str, RouteClass]:
+    # ADMISSION_CLASSES overrides per class, e.g. {"report": {"concurrency": 4, "queue": 10}}
+    classes = dict(DEFAULT_CLASSES)
+    if not raw:
+        return classes
+    overrides = json.loads(raw)
+    for name, values in overrides.items():
+        if name not in classes:
+            raise ValueError(f"Unknown route class in ADMISSION_CLASSES: {name}")
+        classes[name] = RouteClass(**{**classes[name].__dict__, **values})
+    return classes
+
+
+class Gate:
+    # A counting slot pool with a bounded FIFO queue, optionally split into
+    # priority and normal waiters. Runs on the event loop only; no locks.
+    # A released slot is handed straight to the next waiter.
+
+    def __init__(self, capacity: int, queue: int, reserved: int = 0) -> None:
+        self.capacity = capacity
+        self.queue = queue
+        self.reserved = min(reserved, capacity - 1)
+        self.active = 0
+        self.normal_active = 0
+        self._waiters: dict[bool, deque] = {True: deque(), False: deque()}
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters[True]) + len(self._waiters[False])
+
+    def _free_for(self, priority: bool) -> bool:
+        if self.active >= self.capacity:
+            return False
+        return priority or self.normal_active < self.capacity - self.reserved
+
+    def _take(self, priority: bool) -> None:
+        self.active += 1
+        if not priority:
+            self.normal_active += 1
+
+    async def acquire(self, priority: bool, timeout: float) -> Optional[str]:
+        # None once a slot is held, else why not: "queue_full" or "timeout"
+        ahead = self._waiters[True] if priority else self.waiting
+        if self._free_for(priority) and not ahead:
+            self._take(priority)
+            return None
+        if self.waiting >= self.queue:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            return None
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return None  # handed a slot at the deadline
+            self._abandon(priority, waiter)
+            return "timeout"
+        except asyncio.CancelledError:
+            # client went away while queued: give back a slot we may have been handed
+            if waiter.done():
+                self.release(priority)
+            else:
+                self._abandon(priority, waiter)
+            raise
+
+    def _abandon(self, priority: bool, waiter: asyncio.Future) -> None:
+        waiter.cancel()
+        self._waiters[priority].remove(waiter)
+
+    def release(self, priority: bool) -> None:
+        self.active -= 1
+        if not priority:
+            self.normal_active -= 1
+        for wake in (True, False):
+            queue = self._waiters[wake]
+            while queue and self._free_for(wake):
+                waiter = queue.popleft()
+                if not waiter.done():
+                    self._take(wake)
+                    waiter.set_result(True)
+                    return
+
+
+admission_waits = metrics.Histogram("ops_admission_wait_seconds", "Time requests waited for admission.", ("route_class",))
+admission_rejected = metrics.Counter("ops_admission_rejected_total", "Requests turned away by admission control.", ("route_class", "reason"))
+
+
+class AdmissionController:
+    def __init__(self, classes: dict[str, RouteClass], db_slots: int, reserved: int) -> None:
+        self.classes = classes
+        self.gates = {name: Gate(c.concurrency, c.queue) for name, c in classes.items()}
+        self.db = Gate(db_slots, sum(c.queue for c in classes.values()), reserved=reserved)
+
+    async def admit(self, route_class: RouteClass) -> Optional[str]:
+        # None when admitted (the caller must release), else the rejection reason
+        deadline = time.monotonic() + route_class.max_wait
+        gate = self.gates[route_class.name]
+        reason = await gate.acquire(False, route_class.max_wait)
+        if reason is not None:
+            return reason
+        try:
+            reason = await self.db.acquire(route_class.priority, max(0.0, deadline - time.monotonic()))
+        except asyncio.CancelledError:
+            gate.release(False)
+            raise
+        if reason is not None:
+            gate.release(False)
+            return f"db_{reason}"
+        return None
+
+    def release(self, route_class: RouteClass) -> None:
+        self.db.release(route_class.priority)
+        self.gates[route_class.name].release(False)
+
+    def queue_depths(self) -> dict[tuple, float]:
+        depths = {(name,): float(gate.waiting) for name, gate in self.gates.items()}
+        depths[("db",)] = float(self.db.waiting)
+        return depths
+
+    def in_flight(self) -> dict[tuple, float]:
+        active = {(name,): float(gate.active) for name, gate in self.gates.items()}
+        active[("db",)] = float(self.db.active)
+        return active
+
+
+class AdmissionMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.admission_enabled:
+            await self.app(scope, receive, send)
+            return
+        name = classify(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        route_class = admission.classes[name]
+        started = time.perf_counter()
+        reason = await admission.admit(route_class)
+        admission_waits.observe(time.perf_counter() - started, name)
+        if reason is not None:
+            admission_rejected.inc(name, reason)
+            await self._reject(send, route_class)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release(route_class)
+
+    @staticmethod
+    async def _reject(send, route_class: RouteClass) -> None:
+        body = json.dumps({"detail": "Server busy, retry later", "route_class": route_class.name}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(route_class.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+admission = AdmissionController(
+    load_classes(settings.admission_classes),
+    db_slots=settings.admission_db_slots or max(1, settings.db_pool_size + settings.db_max_overflow - pooled_background_workers()),
+    reserved=settings.admission_reserved_slots,
+)
+
+metrics.Gauge("ops_admission_queue_depth", "Requests waiting for admission, by route class.", admission.queue_depths, ("route_class",))
+metrics.Gauge("ops_admission_in_flight", "Requests admitted and running, by route class.", admission.in_flight, ("route_class",))
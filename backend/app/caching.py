@@ -0,0 +1,95 @@
+from __future__ import annotations
+import hashlib
+import re
+from typing import Optional
+
+from app.config import settings
+
+# Cache-Control per route, applied to responses that do not set their own.
+# Successful GETs with a revalidating policy also get a weak ETag over the
+# uncompressed body, and a matching If-None-Match is answered with 304 and
+# no body, so an unchanged page costs the client headers only.
+
+NO_STORE = "no-store"
+REVALIDATE = "private, no-cache"
+
+def _reports() -> str:
+    # short-lived and shared: the frontend proxy may serve one copy to everyone
+    seconds = int(settings.reports_cache_seconds)
+    return f"public, max-age={seconds}, s-maxage={seconds}" if seconds > 0 else REVALIDATE
+
+
+# first match wins; None for methods means any method
+CACHE_RULES = [
+    (re.compile(r"^/(health|ready|metrics|debug)(/|$)"), None, NO_STORE),
+    (re.compile(r"^/reports(/|$)"), {"GET", "HEAD"}, _reports),
+    (re.compile(r"^/"), {"GET", "HEAD"}, REVALIDATE),
+]
+
+
+def policy(method: str, path: str) -> str:
+    for pattern, methods, value in CACHE_RULES:
+        if pattern.match(path) and (methods is None or method in methods):
+            return value() if callable(value) else value
+    return NO_STORE
+
+
+def etag(body: bytes) -> bytes:
+    return b'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest().encode() + b'"'
+
+
+def _matches(if_none_match: Optional[bytes], tag: bytes) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(b",")]
+    return b"*" in candidates or tag in candidates or tag[2:] in candidates
+
+
+class CacheControlMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        value = policy(scope["method"], scope["path"]).encode()
+        revalidate = scope["method"] in ("GET", "HEAD") and value != NO_STORE.encode()
+        if_none_match = dict(scope["headers"]).get(b"if-none-match")
+        start: Optional[dict] = None
+        passthrough = False
+
+        async def send_cached(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                if not any(k.lower() == b"cache-control" for k, _ in headers):
+                    headers.append((b"cache-control", value))
+                message = {**message, "headers": headers}
+                if not revalidate or message["status"] != 200:
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+            if message.get("more_body", False):
+                # streamed: no ETag
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            body = message.get("body", b"")
+            tag = etag(body)
+            headers = [*start["headers"], (b"etag", tag)]
+            if _matches(if_none_match, tag):
+                headers = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"content-type")]
+                await send({**start, "status": 304, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_cached)
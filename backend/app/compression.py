@@ -0,0 +1,121 @@
+from __future__ import annotations
+import asyncio
+import gzip
+import time
+from typing import Optional
+
+import brotli
+
+from app import metrics
+from app.config import settings
+
+# Compresses complete response bodies of at least COMPRESSION_MIN_BYTES with
+# brotli or gzip, whichever the client prefers (brotli on a tie). The levels
+# are tuned for dynamic JSON, where a little ratio is worth a lot of CPU.
+# Streamed responses, already-encoded bodies and non-text types pass through.
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+# bodies this large are compressed on a worker thread instead of the event loop
+THREAD_BYTES = 256 * 1024
+
+compression_bytes = metrics.Counter("ops_http_compression_bytes_total", "Response body bytes before and after compression.", ("encoding", "stage"))
+compression_seconds = metrics.Histogram(
+    "ops_http_compression_seconds", "Time spent compressing one response body.", ("encoding",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05),
+)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    # "br", "gzip" or None, honouring q-values; identity when nothing acceptable is offered
+    offered: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+    wildcard = offered.get("*", 0.0)
+    ranked = sorted(
+        ((offered.get(name, wildcard), name) for name in ("br", "gzip")),
+        key=lambda item: (item[0], item[1] == "br"),
+        reverse=True,
+    )
+    q, name = ranked[0]
+    return name if q > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.compression_brotli_quality)
+    return gzip.compress(body, compresslevel=settings.compression_gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or settings.compression_min_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[dict] = None
+        streaming = False
+
+        async def send_compressed(message):
+            nonlocal start, streaming
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or streaming:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # streamed: send it as is
+                streaming = True
+                await send(start)
+                await send(message)
+                return
+            await send_body(start, body)
+
+        async def send_body(start: dict, body: bytes) -> None:
+            response_headers = list(start.get("headers", []))
+            names = {k.lower() for k, _ in response_headers}
+            content_type = next((v.decode("latin-1") for k, v in response_headers if k.lower() == b"content-type"), "")
+            if (
+                len(body) < settings.compression_min_bytes
+                or b"content-encoding" in names
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+            started = time.perf_counter()
+            if len(body) >= THREAD_BYTES:
+                compressed = await asyncio.to_thread(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            compression_seconds.observe(time.perf_counter() - started, encoding)
+            compression_bytes.inc(encoding, "in", amount=len(body))
+            compression_bytes.inc(encoding, "out", amount=len(compressed))
+            response_headers = [(k, v) for k, v in response_headers if k.lower() not in (b"content-length", b"vary")]
+            vary = [v for k, v in start.get("headers", []) if k.lower() == b"vary"]
+            response_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b", ".join([*vary, b"Accept-Encoding"])),
+            ]
+            await send({**start, "headers": response_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,16 +1,38 @@
 from __future__ import annotations
+from fastapi import Request
 from sqlmodel import create_engine, Session
 from app.config import settings
+from app import querylog
+from app.metrics import instrument_engine
+from app.replicas import is_sticky, replicas
 
 _engine = None
 
+def instrument(engine):
+    instrument_engine(engine)
+    if settings.query_log_enabled:
+        querylog.instrument_engine(engine)
+    return engine
+
 def get_engine():
     global _engine
     if _engine is None:
-        _engine = create_engine(settings.database_url, echo=False, pool_pre_ping=True)
+        _engine = instrument(create_engine(
+            settings.database_url,
+            echo=False,
+            pool_pre_ping=True,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+        ))
     return _engine
 
 def get_session():
     engine = get_engine()
     with Session(engine) as session:
         yield session
+
+def get_read_session(request: Request):
+    # for read-only endpoints: a healthy replica unless this client wrote recently
+    engine = replicas.pick(sticky=is_sticky(request.headers.get("cookie"))) or get_engine()
+    with Session(engine) as session:
+        yield session
@@ -1,14 +1,38 @@
 from __future__ import annotations
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.admission import AdmissionMiddleware
+from app.caching import CacheControlMiddleware
+from app.compression import CompressionMiddleware
 from app.config import settings
-from app.routers import health, jobs, drivers, vehicles, alerts, audit, saved_views, reports
+from app.metrics import MetricsMiddleware
+from app.routers import health, board, jobs, drivers, vehicles, alerts, audit, saved_views, reports, metrics, debug, dashboard, ingest
 from app.realtime import hub
+from app.replicas import ReadYourWritesMiddleware
+from app.services import notify
+from app.startup import run_startup, start_background_tasks
 
-app = FastAPI(title="Ops Console API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # migrations and warm-up run in the background so /health answers at once;
+    # /ready reports 503 until they finish
+    startup = asyncio.create_task(asyncio.to_thread(run_startup))
+    background = start_background_tasks()
+    stop_listener = notify.start_listener()
+    yield
+    stop_listener.set()
+    for task in [startup, *background]:
+        if not task.done():
+            task.cancel()
+
+app = FastAPI(title="Ops Console API", version="0.1.0", lifespan=lifespan)
 
 origins = [o.strip() for o in settings.cors_origins.split(",") if o.strip()]
+# innermost, so 503s from admission still carry CORS headers and are measured
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -16,8 +40,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ReadYourWritesMiddleware)
+# ETags are computed over the uncompressed body, then compressed; both count toward request latency
+app.add_middleware(CacheControlMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(jobs.router)
 app.include_router(drivers.router)
 app.include_router(vehicles.router)
@@ -25,14 +55,19 @@ app.include_router(alerts.router)
 app.include_router(audit.router)
 app.include_router(saved_views.router)
 app.include_router(reports.router)
+app.include_router(dashboard.router)
+app.include_router(board.router)
+app.include_router(debug.router)
+app.include_router(ingest.router)
 
 @app.websocket("/ws")
 async def ws_endpoint(ws: WebSocket):
     await hub.connect(ws)
     try:
         while True:
-            # clients may send keep-alive pings; ignore payload
-            await ws.receive_text()
+            # clients may send keep-alive pings (text or binary); ignore payload
+            if (await ws.receive())["type"] == "websocket.disconnect":
+                break
     except Exception:
         pass
     finally:
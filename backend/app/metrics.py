@@ -0,0 +1,246 @@
+from __future__ import annotations
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+
+# Prometheus text exposition without a client library. Samples are written to
+# per-thread shards so the request hot path never contends on a shared lock;
+# shards are only summed when /metrics is scraped.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 50, 100, 250)
+
+_registry: list = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Sharded:
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:  # once per thread
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _snapshot(self) -> list[list]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        return [list(s.items()) for s in shards]
+
+
+class Counter(_Sharded):
+    def __init__(self, name: str, help: str, labelnames: tuple = ()) -> None:
+        super().__init__()
+        self.name, self.help, self.labelnames = name, help, labelnames
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        totals: dict = {}
+        for items in self._snapshot():
+            for labels, value in items:
+                totals[labels] = totals.get(labels, 0.0) + value
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in sorted(totals.items())]
+        return lines
+
+
+class Histogram(_Sharded):
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> None:
+        super().__init__()
+        self.name, self.help, self.labelnames, self.buckets = name, help, labelnames, buckets
+        _registry.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        shard = self._shard()
+        cell = shard.get(labels)
+        if cell is None:
+            # per-bucket counts (non-cumulative), then +Inf, then sum
+            cell = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                cell[i] += 1
+                break
+        else:
+            cell[len(self.buckets)] += 1
+        cell[-1] += value
+
+    def render(self) -> list[str]:
+        totals: dict = {}
+        for items in self._snapshot():
+            for labels, cell in items:
+                acc = totals.setdefault(labels, [0] * len(cell))
+                for i, v in enumerate(list(cell)):
+                    acc[i] += v
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, cell in sorted(totals.items()):
+            running = 0
+            for bound, n in zip(self.buckets, cell):
+                running += n
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {running}")
+            running += cell[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {running}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {cell[-1]}")
+        return lines
+
+
+class Gauge:
+    # with labelnames, fn returns {label values tuple: value}
+    def __init__(self, name: str, help: str, fn: Callable[[], float], labelnames: tuple = ()) -> None:
+        self.name, self.help, self.fn, self.labelnames = name, help, fn, labelnames
+        _registry.append(self)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if not self.labelnames:
+            return lines + [f"{self.name} {self.fn()}"]
+        return lines + [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in sorted(self.fn().items())]
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+http_request_seconds = Histogram("ops_http_request_seconds", "HTTP request latency by route template.", ("method", "route", "status"))
+http_request_db_statements = Histogram(
+    "ops_http_request_db_statements", "SQL statements issued per HTTP request.", ("method", "route"), buckets=COUNT_BUCKETS
+)
+http_request_db_seconds = Histogram("ops_http_request_db_seconds", "Total DB time per HTTP request.", ("method", "route"))
+db_statement_seconds = Histogram("ops_db_statement_seconds", "Latency of individual SQL statements.")
+ws_broadcast_seconds = Histogram("ops_ws_broadcast_seconds", "Time to fan a hub message out to all clients.", ("type",))
+ws_messages_total = Counter("ops_ws_messages_total", "Hub messages broadcast.", ("type",))
+ws_frames_total = Counter("ops_ws_frames_total", "Hub frames sent to clients, by encoding.", ("encoding",))
+ws_bytes_total = Counter("ops_ws_bytes_total", "Hub frame bytes sent to clients before permessage-deflate, by encoding.", ("encoding",))
+ws_frame_bytes = Histogram(
+    "ops_ws_frame_bytes", "Encoded hub frame size before permessage-deflate, once per message and encoding.", ("encoding",),
+    buckets=(64, 128, 256, 512, 1024, 4096, 16384, 65536),
+)
+process_cpu_seconds = Gauge("process_cpu_seconds_total", "CPU time used by this process.", time.process_time)
+
+
+_route_templates: dict = {}
+
+
+def route_template(scope) -> str:
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "<unmatched>"
+    template = _route_templates.get(endpoint)
+    if template is None:
+        for route in scope["app"].routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                template = route.path
+                break
+        else:
+            template = "<unmatched>"
+        _route_templates[endpoint] = template
+    return template
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_seconds", "statement_shapes")
+
+    def __init__(self, scope) -> None:
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.statement_shapes: Optional[dict] = None
+
+    @property
+    def route(self) -> str:
+        return route_template(self.scope)
+
+
+# The stats object is mutated in place, so it is shared with the threadpool
+# workers that run sync endpoints and dependencies for the same request.
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def discard_failed_start(context, key: str) -> None:
+    # handle_error: a statement that raised never reaches after_cursor_execute, so
+    # drop its (cursor, start) entry or the next timing on this pooled connection
+    # pairs with it. Errors raised after the cursor ran (fetching) were already popped.
+    execution = context.execution_context
+    stack = context.connection.info.get(key) if execution is not None else None
+    if stack and stack[-1][0] is execution.cursor:
+        stack.pop()
+
+
+def instrument_engine(engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append((cursor, time.perf_counter()))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()[1]
+        db_statement_seconds.observe(elapsed)
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        discard_failed_start(context, "query_start")
+
+
+class MetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            method = scope["method"]
+            route = stats.route
+            http_request_seconds.observe(elapsed, method, route, str(status))
+            http_request_db_statements.observe(stats.statements, method, route)
+            http_request_db_seconds.observe(stats.db_seconds, method, route)
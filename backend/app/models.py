@@ -36,7 +36,11 @@ class Driver(SQLModel, table=True):
     status: str = "off_duty"  # on_duty, on_job, idle, off_duty
     hours_today: int = 0
     hours_week: int = 0
+    hours_today_date: Optional[date] = None  # local day hours_today counts; rolled over by the compliance sweep
+    hours_week_start: Optional[date] = None  # Monday of the week hours_week counts
     compliance_state: str = "ok"  # ok, blocked
+    blocked_by: Optional[str] = None  # "sweep" when the compliance sweep set the block; it never clears others
+    version: int = 1  # bumped by every write; see services/versioning.py
     last_update_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Vehicle(SQLModel, table=True):
@@ -51,6 +55,8 @@ class Vehicle(SQLModel, table=True):
     next_service_date: Optional[date] = None
     faults_open: int = 0
     compliance_state: str = "ok"
+    blocked_by: Optional[str] = None
+    version: int = 1
     last_update_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Job(SQLModel, table=True):
@@ -70,9 +76,27 @@ class Job(SQLModel, table=True):
     vehicle_id: Optional[uuid.UUID] = Field(default=None, foreign_key="vehicles.id")
     exceptions: Optional[str] = None
     owner_user_id: Optional[uuid.UUID] = Field(default=None, foreign_key="users.id")
+    version: int = 1
+    archived: bool = False  # set by services/archive.py; on Postgres the row then lives in the jobs_archive partition
     last_update_at: datetime = Field(default_factory=datetime.utcnow)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class JobCode(SQLModel, table=True):
+    # every job_code ever issued; jobs' own unique key is per partition (migration 0012)
+    __tablename__ = "job_codes"
+    job_code: str = Field(primary_key=True)
+
+class JobDailyRollup(SQLModel, table=True):
+    # per-day counts of archived jobs, which is all /reports reads of the archive
+    __tablename__ = "job_daily_rollups"
+    day: date = Field(primary_key=True)  # created_at date
+    customer: str = Field(primary_key=True)
+    priority: str = Field(primary_key=True)
+    status: str = Field(primary_key=True)
+    jobs: int = 0
+    resolved: int = 0  # jobs with a usable created -> last update duration
+    resolution_minutes: float = 0.0  # sum over the resolved jobs
+
 class Alert(SQLModel, table=True):
     __tablename__ = "alerts"
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
@@ -85,6 +109,9 @@ class Alert(SQLModel, table=True):
     status: str = "open"  # open, acknowledged, resolved
     created_at: datetime = Field(default_factory=datetime.utcnow)
     due_by: Optional[datetime] = None
+    escalation_level: int = 0
+    occurrences: int = 1
+    last_seen_at: datetime = Field(default_factory=datetime.utcnow)
 
 class AuditLogEntry(SQLModel, table=True):
     __tablename__ = "audit_log_entries"
@@ -99,6 +126,14 @@ class AuditLogEntry(SQLModel, table=True):
     source: str = "web"
     correlation_id: Optional[str] = None
 
+class AuditLogEntity(SQLModel, table=True):
+    # one row per entity a batch audit entry covers, so entity timelines find set-based changes too
+    __tablename__ = "audit_log_entities"
+    audit_id: uuid.UUID = Field(foreign_key="audit_log_entries.id", primary_key=True)
+    entity_type: str = Field(primary_key=True)
+    entity_id: uuid.UUID = Field(primary_key=True)
+    timestamp: datetime  # copied from the entry so the timeline index can order by it
+
 class SavedView(SQLModel, table=True):
     __tablename__ = "saved_views"
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
@@ -109,7 +144,18 @@ class SavedView(SQLModel, table=True):
     column_set_json: str = "{}"
     sort_json: str = "{}"
     grouping_json: str = "{}"
+    version: int = 1
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class IdempotencyKey(SQLModel, table=True):
+    __tablename__ = "idempotency_keys"
+    scope: str = Field(primary_key=True)  # endpoint the key was used on, e.g. "jobs.create"
+    key: str = Field(primary_key=True)
+    request_hash: str
+    status_code: Optional[int] = None  # None while the first request is still running
+    response_body: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
 
 def to_json(obj) -> str:
     return json.dumps(obj, default=str)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+import logging
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.metrics import current_request, discard_failed_start
+
+# Opt-in (QUERY_LOG_ENABLED=true) statement instrumentation: slow statements
+# with their parameter shape and route, sampled EXPLAIN (ANALYZE, BUFFERS) of
+# slow SELECTs, and per-request repeated-statement (N+1) detection.
+
+logger = logging.getLogger("app.querylog")
+
+# SELECTs that do more than read: ANALYZE would run these effects a second time
+SIDE_EFFECTS = re.compile(
+    r"\b(pg_notify|pg_(try_)?advisory_\w+|nextval|setval|pg_sleep)\s*\(|\bFOR\s+(NO\s+KEY\s+)?(UPDATE|SHARE|KEY\s+SHARE)\b|\bINTO\b",
+    re.IGNORECASE,
+)
+
+slow_queries: deque = deque(maxlen=200)
+n_plus_one: deque = deque(maxlen=200)
+
+
+def param_shape(parameters) -> object:
+    if isinstance(parameters, dict):
+        return {k: _value_shape(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return {"executemany": len(parameters), "row": param_shape(parameters[0])}
+        return [_value_shape(v) for v in parameters]
+    return None
+
+
+def _value_shape(value) -> str:
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def _explain(conn, statement: str, parameters) -> Optional[object]:
+    if (
+        conn.dialect.name != "postgresql"
+        or not statement.lstrip().upper().startswith("SELECT")
+        or SIDE_EFFECTS.search(statement)
+    ):
+        return None
+    # ANALYZE re-executes the statement, so only read-only SELECTs are sampled.
+    # A separate DBAPI cursor bypasses engine events and leaves the original
+    # cursor's result set untouched; the savepoint keeps a failed EXPLAIN from
+    # aborting the request's transaction.
+    try:
+        with conn.connection.dbapi_connection.cursor() as cur:
+            cur.execute("SAVEPOINT querylog_explain")
+            try:
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters)
+                return cur.fetchone()[0]
+            finally:
+                cur.execute("ROLLBACK TO SAVEPOINT querylog_explain")
+                cur.execute("RELEASE SAVEPOINT querylog_explain")
+    except Exception as e:  # diagnostics must never fail the request
+        logger.warning("EXPLAIN capture failed: %s", e)
+        return None
+
+
+def _route() -> Optional[str]:
+    stats = current_request.get()
+    if stats is None:
+        return None
+    return f"{stats.scope['method']} {stats.route}"
+
+
+def instrument_engine(engine) -> None:
+    threshold_s = settings.slow_query_ms / 1000.0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("querylog_start", []).append((cursor, time.perf_counter()))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["querylog_start"].pop()[1]
+        stats = current_request.get()
+
+        if stats is not None:
+            if stats.statement_shapes is None:
+                stats.statement_shapes = {}
+            seen = stats.statement_shapes.get(statement)
+            if seen is None:
+                seen = stats.statement_shapes[statement] = {"statement": statement, "count": 0}
+            seen["count"] += 1
+            if seen["count"] == settings.n_plus_one_threshold + 1:
+                # the entry keeps counting for the rest of the request
+                seen.update(at=datetime.utcnow().isoformat(), route=_route())
+                n_plus_one.append(seen)
+                logger.warning("repeated statement (%d+) in %s: %s", seen["count"], seen["route"], statement)
+
+        if elapsed < threshold_s:
+            return
+        entry = {
+            "at": datetime.utcnow().isoformat(),
+            "ms": round(elapsed * 1000.0, 2),
+            "route": _route(),
+            "statement": statement,
+            "params": param_shape(parameters),
+            "rowcount": cursor.rowcount,
+            "explain": None,
+        }
+        if settings.slow_query_explain_rate > 0 and random.random() < settings.slow_query_explain_rate:
+            entry["explain"] = _explain(conn, statement, parameters)
+        slow_queries.append(entry)
+        logger.warning("slow query %.1fms in %s params=%s: %s", entry["ms"], entry["route"], entry["params"], statement)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        discard_failed_start(context, "querylog_start")
+
+
+def snapshot() -> dict:
+    return {
+        "enabled": settings.query_log_enabled,
+        "slow_query_ms": settings.slow_query_ms,
+        "explain_rate": settings.slow_query_explain_rate,
+        "n_plus_one_threshold": settings.n_plus_one_threshold,
+        "slow_queries": list(reversed(slow_queries)),
+        "n_plus_one": list(reversed(n_plus_one)),
+    }
+
+
+def clear() -> None:
+    slow_queries.clear()
+    n_plus_one.clear()
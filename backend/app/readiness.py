@@ -0,0 +1,41 @@
+from __future__ import annotations
+import threading
+from typing import Dict, Set
+
+
+# Startup steps that must finish before the instance takes traffic (/ready).
+class Readiness:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._done: Set[str] = set()
+        self._errors: Dict[str, str] = {}
+
+    def require(self, *steps: str) -> None:
+        with self._lock:
+            self._pending.update(s for s in steps if s not in self._done)
+
+    def done(self, step: str) -> None:
+        with self._lock:
+            self._pending.discard(step)
+            self._done.add(step)
+
+    def fail(self, step: str, error: Exception) -> None:
+        with self._lock:
+            self._errors[step] = f"{type(error).__name__}: {error}"
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._done) and not self._pending and not self._errors
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "ready": bool(self._done) and not self._pending and not self._errors,
+                "pending": sorted(self._pending),
+                "done": sorted(self._done),
+                "errors": dict(self._errors),
+            }
+
+
+readiness = Readiness()
@@ -1,36 +1,117 @@
 from __future__ import annotations
 import asyncio
-from typing import Set
+import json
+import logging
+import time
+from typing import Callable, Dict, List, Optional
 from fastapi import WebSocket
 
+import msgpack
+
+from app import metrics
+
+# Hub frames go out as compact JSON text by default, or as MessagePack binary
+# frames to clients that ask for it with the "ops.msgpack" subprotocol (or
+# ?encoding=msgpack where subprotocols are awkward). Each message is encoded
+# once per encoding in use and the same frame is sent to every socket.
+# permessage-deflate is negotiated per connection by uvicorn when the client
+# offers it; that compression necessarily runs per socket.
+
+ENCODERS: Dict[str, Callable[[dict], object]] = {
+    "json": lambda message: json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=str),
+    "msgpack": lambda message: msgpack.packb(message, default=str),
+}
+SUBPROTOCOLS = {"ops.json": "json", "ops.msgpack": "msgpack"}
+
+logger = logging.getLogger("app.realtime")
+
+
+def negotiate(ws: WebSocket) -> tuple[str, Optional[str]]:
+    # (encoding, subprotocol to accept); the first offered subprotocol we know wins
+    for offered in ws.scope.get("subprotocols") or []:
+        if offered in SUBPROTOCOLS:
+            return SUBPROTOCOLS[offered], offered
+    encoding = ws.query_params.get("encoding", "json")
+    return (encoding if encoding in ENCODERS else "json"), None
+
+
+def frame(encoding: str, encoded) -> dict:
+    return {"type": "websocket.send", "text": encoded} if encoding == "json" else {"type": "websocket.send", "bytes": encoded}
+
+
 class WsHub:
     def __init__(self) -> None:
-        self._clients: Set[WebSocket] = set()
+        self._clients: Dict[WebSocket, str] = {}  # socket -> encoding
         self._lock = asyncio.Lock()
+        self._pending_sends = 0
+        self._listeners: List[Callable[[dict], None]] = []  # in-process consumers of every message
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    @property
+    def pending_sends(self) -> int:
+        return self._pending_sends
 
     async def connect(self, ws: WebSocket):
-        await ws.accept()
+        encoding, subprotocol = negotiate(ws)
+        await ws.accept(subprotocol=subprotocol)
         async with self._lock:
-            self._clients.add(ws)
+            self._clients[ws] = encoding
+
+    def subscribe(self, listener: Callable[[dict], None]) -> None:
+        # called synchronously on the event loop, so listeners must not block
+        self._listeners.append(listener)
 
     async def disconnect(self, ws: WebSocket):
         async with self._lock:
-            self._clients.discard(ws)
+            self._clients.pop(ws, None)
 
     async def broadcast_json(self, message: dict):
         async with self._lock:
-            clients = list(self._clients)
+            clients = list(self._clients.items())
+        msg_type = str(message.get("type", ""))
+        metrics.ws_messages_total.inc(msg_type)
+        for listener in self._listeners:
+            try:
+                listener(message)
+            except Exception:
+                logger.exception("hub listener failed on %s", msg_type)
         if not clients:
             return
+        started = time.perf_counter()
+        frames: dict[str, dict] = {}
+        sizes: dict[str, int] = {}
+        for _, encoding in clients:
+            if encoding not in frames:
+                encoded = ENCODERS[encoding](message)
+                frames[encoding] = frame(encoding, encoded)
+                sizes[encoding] = len(encoded.encode()) if encoding == "json" else len(encoded)
+                metrics.ws_frame_bytes.observe(sizes[encoding], encoding)
+        self._pending_sends += len(clients)
+        sent = dict.fromkeys(frames, 0)
         dead = []
-        for ws in clients:
-            try:
-                await ws.send_json(message)
-            except Exception:
-                dead.append(ws)
+        try:
+            for ws, encoding in clients:
+                try:
+                    await ws.send(frames[encoding])
+                    sent[encoding] += 1
+                except Exception:
+                    dead.append(ws)
+                finally:
+                    self._pending_sends -= 1
+        finally:
+            metrics.ws_broadcast_seconds.observe(time.perf_counter() - started, msg_type)
+            for encoding, n in sent.items():
+                metrics.ws_frames_total.inc(encoding, amount=n)
+                metrics.ws_bytes_total.inc(encoding, amount=n * sizes[encoding])
         if dead:
             async with self._lock:
                 for ws in dead:
-                    self._clients.discard(ws)
+                    self._clients.pop(ws, None)
 
 hub = WsHub()
+
+metrics.Gauge("ops_ws_clients", "Connected WebSocket clients.", lambda: hub.client_count)
+metrics.Gauge("ops_ws_pending_sends", "Hub frames queued for delivery across in-flight broadcasts.", lambda: hub.pending_sends)
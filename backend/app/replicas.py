@@ -0,0 +1,143 @@
+from __future__ import annotations
+import itertools
+import logging
+import threading
+import time
+from http.cookies import SimpleCookie
+from typing import Optional
+
+from sqlalchemy import text
+from sqlmodel import create_engine
+
+from app import metrics
+from app.config import settings
+
+logger = logging.getLogger("app.replicas")
+
+# GET endpoints read from DATABASE_READ_URLS when any are configured. A replica
+# only takes reads while its measured lag is at most REPLICA_MAX_LAG_SECONDS;
+# until the first lag check, and whenever every replica is behind or down,
+# reads go to the primary. A client that has just written is pinned to the
+# primary for READ_YOUR_WRITES_SECONDS through a cookie, so it always sees
+# its own changes whichever worker serves the next request.
+
+STICKY_COOKIE = "ops_read_primary_until"
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# NULL (unhealthy) on a standby whose WAL receiver is not streaming: once it has
+# disconnected, the received and replayed LSNs stay equal however far the
+# primary moves on. Otherwise 0 when everything received is replayed, else the
+# age of the last replayed transaction. Reading the receiver status needs
+# pg_monitor (or pg_read_all_stats); without it the replica is never used.
+LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+read_routing_total = metrics.Counter("ops_db_read_routing_total", "Read sessions by target and reason.", ("target", "reason"))
+
+
+class Replica:
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.lag: Optional[float] = None  # seconds; None = unknown or unreachable
+        self._engine = None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from app.db import instrument
+            self._engine = instrument(create_engine(
+                self.url,
+                echo=False,
+                pool_pre_ping=True,
+                pool_size=settings.db_pool_size,
+                max_overflow=settings.db_max_overflow,
+            ))
+        return self._engine
+
+    @property
+    def healthy(self) -> bool:
+        return self.lag is not None and self.lag <= settings.replica_max_lag_seconds
+
+
+class ReplicaSet:
+    def __init__(self, urls: list[str]) -> None:
+        self.replicas = [Replica(u) for u in urls]
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def check_lag(self) -> None:
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    lag = conn.execute(LAG_SQL).scalar()
+            except Exception as e:
+                if replica.lag is not None:
+                    logger.warning("replica %s unreachable: %s", replica.engine.url.host, e)
+                replica.lag = None
+                continue
+            if lag is None:
+                if replica.lag is not None:
+                    logger.warning("replica %s is not streaming WAL from the primary", replica.engine.url.host)
+                replica.lag = None
+            else:
+                replica.lag = float(lag)
+
+    def pick(self, sticky: bool):
+        # a replica engine, or None for the primary
+        if not self.replicas:
+            return None
+        if sticky:
+            read_routing_total.inc("primary", "read_your_writes")
+            return None
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            read_routing_total.inc("primary", "replica_lag")
+            return None
+        with self._lock:
+            replica = healthy[next(self._next) % len(healthy)]
+        read_routing_total.inc("replica", "ok")
+        return replica.engine
+
+    def max_lag(self) -> float:
+        lags = [r.lag for r in self.replicas if r.lag is not None]
+        return max(lags) if lags else -1.0
+
+
+def is_sticky(cookie_header: Optional[str]) -> bool:
+    if not cookie_header:
+        return False
+    morsel = SimpleCookie(cookie_header).get(STICKY_COOKIE)
+    try:
+        return morsel is not None and float(morsel.value) > time.time()
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    # marks the client after any successful write; only active with replicas configured
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in UNSAFE_METHODS or not replicas.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_marked(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                window = settings.read_your_writes_seconds
+                cookie = f"{STICKY_COOKIE}={time.time() + window:.3f}; Max-Age={int(window) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_marked)
+
+
+replicas = ReplicaSet([u.strip() for u in settings.database_read_urls.split(",") if u.strip()])
+
+metrics.Gauge("ops_db_replica_lag_seconds", "Highest measured replica lag; -1 when unknown.", replicas.max_lag)
+metrics.Gauge("ops_db_replicas_healthy", "Replicas currently taking reads.", lambda: sum(r.healthy for r in replicas.replicas))
@@ -1 +1 @@
-from . import health, jobs, drivers, vehicles, alerts, audit, saved_views, reports
+from . import health, jobs, drivers, vehicles, alerts, audit, saved_views, reports, metrics, debug, dashboard
@@ -1,63 +1,145 @@
 from __future__ import annotations
 import uuid
-from typing import Optional
+from collections import Counter
+from typing import Optional, Union
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select, func
 
-from app.db import get_session
+from app.db import get_session, get_read_session
 from app.models import Alert
-from app.schemas import Page
-from app.services.audit import write_audit
+from app.schemas import Page, GroupedPage
+from app.routers.saved_views import resolve_view
+from app.services.grouping import grouped, parse_group_by
+from app.services.alerts import FILTER_FIELDS, MAX_BULK_ALERTS, alert_filters, transition_alerts
+from app.services.audit import write_audit, write_audit_batch
+from app.services.dashboard import counters
+from app.services.timeline import entity_timeline
 
 router = APIRouter(prefix="/alerts", tags=["alerts"])
 
-@router.get("", response_model=Page)
+@router.get("", response_model=Union[Page, GroupedPage])
 def get_alerts(
     page: int = 1,
     page_size: int = 50,
     status: Optional[str] = None,
     severity: Optional[str] = None,
     alert_type: Optional[str] = None,
-    session: Session = Depends(get_session),
+    view_id: Optional[uuid.UUID] = None,
+    group_by: Optional[str] = None,
+    group_top: int = 0,
+    session: Session = Depends(get_read_session),
 ):
-    stmt = select(Alert)
-    if status:
-        stmt = stmt.where(Alert.status == status)
-    if severity:
-        stmt = stmt.where(Alert.severity == severity)
-    if alert_type:
-        stmt = stmt.where(Alert.alert_type == alert_type)
+    view = resolve_view(session, view_id, "alerts")
+    try:
+        group = parse_group_by("alerts", group_by, view)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    stmt = select(Alert).where(*alert_filters(status=status, severity=severity, alert_type=alert_type))
+    if view:
+        stmt = view.apply(stmt)
+
+    order_by = view.order_by if view else (Alert.created_at.desc(),)
+    if group:
+        return grouped(session, stmt, module="alerts", group_by=group, order_by=order_by, top=group_top)
 
     total = session.exec(select(func.count()).select_from(stmt.subquery())).one()
-    stmt = stmt.order_by(Alert.created_at.desc()).offset((page - 1) * min(page_size, 200)).limit(min(page_size, 200))
-    items = list(session.exec(stmt).all())
+    stmt = stmt.order_by(*order_by).offset((page - 1) * min(page_size, 200)).limit(min(page_size, 200))
+    items = view.fetch(session, stmt) if view else list(session.exec(stmt).all())
     return Page(items=items, total=int(total), page=page, page_size=min(page_size, 200))
 
-@router.post("/{alert_id}/ack")
-def ack_alert(alert_id: uuid.UUID, session: Session = Depends(get_session)):
+@router.get("/{alert_id}/timeline")
+def get_alert_timeline(alert_id: uuid.UUID, limit: int = 50, cursor: Optional[str] = None, session: Session = Depends(get_read_session)):
+    if session.get(Alert, alert_id) is None:
+        raise HTTPException(404, "Alert not found")
+    try:
+        return entity_timeline(session, "alert", alert_id, limit=min(max(limit, 1), 200), cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+def _transition_one(session: Session, alert_id: uuid.UUID, *, to_status: str, from_statuses: tuple[str, ...]) -> tuple[dict, Alert]:
+    # same guarded UPDATE as the bulk endpoints: an alert that is not in a source
+    # status is left alone, so a resolved alert never re-enters the open set
     alert = session.get(Alert, alert_id)
     if not alert:
         raise HTTPException(404, "Alert not found")
     before = alert.model_dump()
-    alert.status = "acknowledged"
-    session.add(alert)
+    rows = transition_alerts(session, to_status=to_status, from_statuses=from_statuses, ids=[alert_id])
+    if not rows:
+        session.rollback()
+        raise HTTPException(409, f"Alert is {before['status']}")
     session.commit()
     session.refresh(alert)
-    write_audit(session, actor_user_id=None, entity_type="alert", entity_id=alert.id, action="alert.ack", before=before, after=alert.model_dump())
-    return {"alert": alert}
+    counters.alert_changed((rows[0].old_status, rows[0].severity), (alert.status, alert.severity))
+    return before, alert
+
+@router.post("/{alert_id}/ack")
+def ack_alert(alert_id: uuid.UUID, session: Session = Depends(get_session)):
+    before, alert = _transition_one(session, alert_id, to_status="acknowledged", from_statuses=("open",))
+    # dumped first: write_audit commits, which expires the row
+    after = alert.model_dump()
+    write_audit(session, actor_user_id=None, entity_type="alert", entity_id=alert.id, action="alert.ack", before=before, after=after)
+    return {"alert": after}
 
 @router.post("/{alert_id}/resolve")
 def resolve_alert(alert_id: uuid.UUID, payload: dict, session: Session = Depends(get_session)):
-    alert = session.get(Alert, alert_id)
-    if not alert:
-        raise HTTPException(404, "Alert not found")
-    before = alert.model_dump()
     reason = payload.get("reason_code") or "resolved"
-    alert.status = "resolved"
-    session.add(alert)
-    session.commit()
-    session.refresh(alert)
+    before, alert = _transition_one(session, alert_id, to_status="resolved", from_statuses=("open", "acknowledged"))
     after = alert.model_dump()
-    after["reason_code"] = reason
-    write_audit(session, actor_user_id=None, entity_type="alert", entity_id=alert.id, action="alert.resolve", before=before, after=after)
-    return {"alert": alert}
+    write_audit(
+        session, actor_user_id=None, entity_type="alert", entity_id=alert.id, action="alert.resolve",
+        before=before, after={**after, "reason_code": reason},
+    )
+    return {"alert": after}
+
+def _bulk_target(payload: dict) -> tuple[Optional[list[uuid.UUID]], Optional[dict]]:
+    ids, filters = payload.get("ids"), payload.get("filter")
+    if ids is None and not filters:
+        raise HTTPException(400, "ids or filter is required")
+    try:
+        if ids is not None:
+            ids = [uuid.UUID(str(i)) for i in ids]
+            if len(ids) > MAX_BULK_ALERTS:
+                raise HTTPException(400, f"At most {MAX_BULK_ALERTS} ids per request")
+        if filters:
+            unknown = set(filters) - set(FILTER_FIELDS)
+            if unknown:
+                raise HTTPException(400, f"Unknown filter field: {sorted(unknown)[0]}")
+            filters = {k: (uuid.UUID(str(v)) if k == "entity_id" and v else v) for k, v in filters.items()}
+    except (TypeError, ValueError):
+        raise HTTPException(400, "Invalid alert id")
+    return ids, filters or None
+
+def _bulk_transition(session: Session, payload: dict, *, to_status: str, from_statuses: tuple[str, ...], action: str, after: Optional[dict] = None) -> dict:
+    ids, filters = _bulk_target(payload)
+    rows = transition_alerts(session, to_status=to_status, from_statuses=from_statuses, ids=ids, filters=filters, limit=MAX_BULK_ALERTS)
+    session.commit()
+    for r in rows:
+        counters.alert_changed((r.old_status, r.severity), (to_status, r.severity))
+    if rows:
+        write_audit_batch(
+            session,
+            actor_user_id=None,
+            entity_type="alert",
+            entity_ids=[r.id for r in rows],
+            action=action,
+            after={**(after or {}), **({"filter": filters} if filters else {})},
+            source="web",
+        )
+    # a full batch under a filter may have left matches behind: repeat until "more" is false
+    return {
+        "updated": len(rows),
+        "by_severity": dict(Counter(r.severity for r in rows)),
+        "more": filters is not None and len(rows) == MAX_BULK_ALERTS,
+    }
+
+@router.post("/bulk-ack")
+def bulk_ack_alerts(payload: dict, session: Session = Depends(get_session)):
+    return _bulk_transition(session, payload, to_status="acknowledged", from_statuses=("open",), action="alert.bulk_ack")
+
+@router.post("/bulk-resolve")
+def bulk_resolve_alerts(payload: dict, session: Session = Depends(get_session)):
+    reason = payload.get("reason_code") or "resolved"
+    return _bulk_transition(
+        session, payload, to_status="resolved", from_statuses=("open", "acknowledged"),
+        action="alert.bulk_resolve", after={"reason_code": reason},
+    )
@@ -1,8 +1,9 @@
 from __future__ import annotations
+import uuid
 from typing import Optional
 from fastapi import APIRouter, Depends
 from sqlmodel import Session, select, func
-from app.db import get_session
+from app.db import get_read_session
 from app.models import AuditLogEntry
 from app.schemas import Page
 
@@ -13,12 +14,16 @@ def get_audit(
     page: int = 1,
     page_size: int = 50,
     entity_type: Optional[str] = None,
+    entity_id: Optional[uuid.UUID] = None,
     action: Optional[str] = None,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
 ):
     stmt = select(AuditLogEntry)
     if entity_type:
         stmt = stmt.where(AuditLogEntry.entity_type == entity_type)
+    if entity_id:
+        # direct entries only; GET /<module>/{id}/timeline also covers batch entries and alerts
+        stmt = stmt.where(AuditLogEntry.entity_id == entity_id)
     if action:
         stmt = stmt.where(func.lower(AuditLogEntry.action).like(f"%{action.lower()}%"))
     total = session.exec(select(func.count()).select_from(stmt.subquery())).one()
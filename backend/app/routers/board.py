@@ -0,0 +1,29 @@
+from __future__ import annotations
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+
+from app.services.board import board
+
+router = APIRouter(prefix="/board", tags=["board"])
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+@router.get("")
+def get_board(
+    status: Optional[str] = None,
+    depot: Optional[str] = None,
+    priority: Optional[str] = None,
+    stale_minutes: Optional[int] = None,
+):
+    # open jobs served from the in-memory board; never touches the database.
+    # Encoded directly: jsonable_encoder costs several times the snapshot itself.
+    if not board.loaded:
+        raise HTTPException(503, "Job board not loaded yet")
+    snapshot = board.snapshot(status=status, depot=depot, priority=priority, stale_minutes=stale_minutes)
+    return Response(json.dumps(snapshot, default=_json_default, separators=(",", ":")), media_type="application/json")
@@ -0,0 +1,13 @@
+from __future__ import annotations
+from fastapi import APIRouter, HTTPException
+
+from app.services.dashboard import counters
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+@router.get("/summary")
+def get_summary():
+    # served from in-memory counters; never touches the database
+    if not counters.loaded:
+        raise HTTPException(503, "Dashboard counters not loaded yet")
+    return counters.summary()
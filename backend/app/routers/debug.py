@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException
+
+from app import querylog
+from app.config import settings
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+@router.get("/queries")
+def get_queries():
+    if not settings.query_log_enabled:
+        raise HTTPException(404, "Query log disabled (set QUERY_LOG_ENABLED=true)")
+    return querylog.snapshot()
+
+@router.delete("/queries")
+def clear_queries():
+    if not settings.query_log_enabled:
+        raise HTTPException(404, "Query log disabled (set QUERY_LOG_ENABLED=true)")
+    querylog.clear()
+    return {"ok": True}
@@ -1,16 +1,19 @@
 from __future__ import annotations
 import uuid
-from typing import Optional
+from typing import Optional, Union
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select, func
 
-from app.db import get_session
+from app.db import get_read_session
 from app.models import Driver, Job
-from app.schemas import Page
+from app.schemas import Page, GroupedPage
+from app.routers.saved_views import resolve_view
+from app.services.grouping import grouped, parse_group_by
+from app.services.timeline import entity_timeline
 
 router = APIRouter(prefix="/drivers", tags=["drivers"])
 
-@router.get("", response_model=Page)
+@router.get("", response_model=Union[Page, GroupedPage])
 def get_drivers(
     page: int = 1,
     page_size: int = 50,
@@ -19,8 +22,16 @@ def get_drivers(
     depot: Optional[str] = None,
     region: Optional[str] = None,
     compliance_state: Optional[str] = None,
-    session: Session = Depends(get_session),
+    view_id: Optional[uuid.UUID] = None,
+    group_by: Optional[str] = None,
+    group_top: int = 0,
+    session: Session = Depends(get_read_session),
 ):
+    view = resolve_view(session, view_id, "drivers")
+    try:
+        group = parse_group_by("drivers", group_by, view)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     stmt = select(Driver)
     if q:
         like = f"%{q.lower()}%"
@@ -34,15 +45,31 @@ def get_drivers(
     if compliance_state:
         stmt = stmt.where(Driver.compliance_state == compliance_state)
 
+    if view:
+        stmt = view.apply(stmt)
+
+    order_by = view.order_by if view else (Driver.last_update_at.desc(),)
+    if group:
+        return grouped(session, stmt, module="drivers", group_by=group, order_by=order_by, top=group_top)
+
     total = session.exec(select(func.count()).select_from(stmt.subquery())).one()
-    stmt = stmt.order_by(Driver.last_update_at.desc()).offset((page - 1) * min(page_size, 200)).limit(min(page_size, 200))
-    items = list(session.exec(stmt).all())
+    stmt = stmt.order_by(*order_by).offset((page - 1) * min(page_size, 200)).limit(min(page_size, 200))
+    items = view.fetch(session, stmt) if view else list(session.exec(stmt).all())
     return Page(items=items, total=int(total), page=page, page_size=min(page_size, 200))
 
 @router.get("/{driver_id}")
-def get_driver(driver_id: uuid.UUID, session: Session = Depends(get_session)):
+def get_driver(driver_id: uuid.UUID, session: Session = Depends(get_read_session)):
     driver = session.get(Driver, driver_id)
     if not driver:
         raise HTTPException(404, "Driver not found")
     current_job = session.exec(select(Job).where(Job.driver_id == driver.id).order_by(Job.last_update_at.desc())).first()
     return {"driver": driver, "current_job": current_job}
+
+@router.get("/{driver_id}/timeline")
+def get_driver_timeline(driver_id: uuid.UUID, limit: int = 50, cursor: Optional[str] = None, session: Session = Depends(get_read_session)):
+    if session.get(Driver, driver_id) is None:
+        raise HTTPException(404, "Driver not found")
+    try:
+        return entity_timeline(session, "driver", driver_id, limit=min(max(limit, 1), 200), cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
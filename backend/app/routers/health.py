@@ -1,7 +1,15 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.readiness import readiness
 
 router = APIRouter()
 
 @router.get("/health")
 def health():
     return {"ok": True}
+
+@router.get("/ready")
+def ready():
+    status = readiness.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
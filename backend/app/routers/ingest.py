@@ -0,0 +1,76 @@
+from __future__ import annotations
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Any
+
+from fastapi import APIRouter, Body, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.readiness import readiness
+from app.services.ingest import BufferFull, ingest_buffer, validate_events
+
+router = APIRouter(prefix="/ingest", tags=["ingest"])
+
+
+def _events(payload) -> list:
+    # {"events": [...]}, a bare list, or a single event
+    if isinstance(payload, dict):
+        payload = payload["events"] if "events" in payload else [payload]
+    if not isinstance(payload, list):
+        raise ValueError("events must be a list")
+    if len(payload) > settings.ingest_max_batch:
+        raise ValueError(f"At most {settings.ingest_max_batch} events per batch")
+    return payload
+
+
+def _offer(payload) -> dict:
+    # raises ValueError for a malformed batch and BufferFull under backpressure
+    events, rejected = validate_events(_events(payload), datetime.now(timezone.utc))
+    if events:
+        ingest_buffer.offer(events)
+    return {"accepted": len(events), "rejected": rejected}
+
+
+@router.post("/events", status_code=202)
+async def post_events(payload: Any = Body(...)):
+    # no DB work on the request path: events are buffered and applied by the flusher
+    if not readiness.ready:
+        raise HTTPException(503, "Not ready", headers={"Retry-After": "5"})
+    try:
+        return _offer(payload)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except BufferFull as e:
+        return JSONResponse({"detail": str(e)}, status_code=429, headers={"Retry-After": str(e.retry_after)})
+
+
+async def _receive(ws: WebSocket) -> Any:
+    # text or binary frames, both UTF-8 JSON; receive_json() would fail on a binary one
+    message = await ws.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    data = message.get("text")
+    if data is None:
+        data = message.get("bytes") or b""
+    return json.loads(data)
+
+
+@router.websocket("/ws")
+async def ingest_ws(ws: WebSocket):
+    # one ack per message; when the buffer is full the device is told to back
+    # off and nothing more is read from the socket until the retry time passes
+    await ws.accept()
+    try:
+        while True:
+            try:
+                payload = await _receive(ws)
+                await ws.send_json({"type": "ingest.ack", **_offer(payload)})
+            except ValueError as e:
+                await ws.send_json({"type": "ingest.error", "detail": str(e)})
+            except BufferFull as e:
+                await ws.send_json({"type": "ingest.busy", "detail": str(e), "retry_after": e.retry_after})
+                await asyncio.sleep(e.retry_after)
+    except WebSocketDisconnect:
+        pass
@@ -1,30 +1,99 @@
 from __future__ import annotations
 import uuid
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from typing import Awaitable, Callable, Optional, Union
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
 from datetime import datetime
 
-from app.db import get_session
-from app.models import Job, Driver, Vehicle
-from app.schemas import Page
-from app.services.jobs import list_jobs, assign_job
+from app.db import get_session, get_read_session
+from app.models import Job, JobCode, User
+from app.schemas import Page, GroupedPage
+from app.routers.saved_views import resolve_view
+from app.services.grouping import grouped, parse_group_by
+from app.services.candidates import find_candidates
+from app.services.jobs import (
+    TERMINAL_JOB_STATUSES, filter_jobs, list_jobs, assign_job, parse_include, get_job_with_relations,
+    release_job_resources, apply_released, set_job_status, claim_next_job,
+)
+from app.services.audit import write_audit
+from app.services.idempotency import KeyInProgress, idempotency, request_hash
+from app.services.versioning import VersionConflict
+from app.services.dashboard import counters
+from app.services.reference_cache import reference_cache
+from app.services.sla import sla_loop
+from app.services.timeline import entity_timeline
 from app.realtime import hub
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
 
+def _conflict(e: VersionConflict) -> HTTPException:
+    # the current row lets the client show what changed and retry with its version
+    return HTTPException(409, {"message": str(e), "entity_type": e.entity_type, "id": str(e.row_id), "current": jsonable_encoder(e.current)})
+
+
+def _version(payload: dict, key: str) -> Optional[int]:
+    value = payload.get(key)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(400, f"{key} must be an integer")
+
+
+async def _idempotent(session: Session, scope: str, key: Optional[str], payload: dict, handler: Callable[[], Awaitable[dict]]):
+    # with an Idempotency-Key, a retry gets the first response back byte for byte
+    # and the handler (its writes, audit and broadcasts) runs only once
+    if not key:
+        return await handler()
+    if len(key) > 255:
+        raise HTTPException(400, "Idempotency-Key is too long")
+    digest = request_hash(payload)
+    try:
+        stored = idempotency.begin(session, scope, key, digest)
+    except KeyInProgress as e:
+        raise HTTPException(409, str(e), headers={"Retry-After": "1"})
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    if stored is not None:
+        return Response(stored.body, status_code=stored.status_code, media_type="application/json", headers={"Idempotent-Replayed": "true"})
+
+    try:
+        response = JSONResponse(jsonable_encoder(await handler()))
+    except HTTPException as e:
+        if e.status_code >= 500:
+            idempotency.abandon(session, scope, key)
+            raise
+        # a rejected request is answered the same way on every retry
+        session.rollback()
+        idempotency.complete(session, scope, key, e.status_code, JSONResponse({"detail": jsonable_encoder(e.detail)}).body)
+        raise
+    except Exception:
+        idempotency.abandon(session, scope, key)
+        raise
+    idempotency.complete(session, scope, key, response.status_code, response.body)
+    return response
+
+
 @router.post("")
-async def create_job(payload: dict, session: Session = Depends(get_session)):
+async def create_job(
+    payload: dict,
+    session: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(default=None),
+):
+    return await _idempotent(session, "jobs.create", idempotency_key, payload, lambda: _create_job(payload, session))
+
+
+async def _create_job(payload: dict, session: Session) -> dict:
     job_code = payload.get("job_code")
     customer = payload.get("customer")
     if not job_code or not customer:
         raise HTTPException(400, "job_code and customer are required")
 
-    exists = session.exec(select(Job).where(Job.job_code == str(job_code))).first()
-    if exists:
-        raise HTTPException(409, "Job code already exists")
-
     job = Job(
         job_code=str(job_code),
         customer=str(customer),
@@ -35,8 +104,15 @@ async def create_job(payload: dict, session: Session = Depends(get_session)):
         exceptions=payload.get("exceptions"),
     )
     session.add(job)
-    session.commit()
+    # the job_codes key also covers archived jobs, which the partitioned jobs key does not
+    session.add(JobCode(job_code=job.job_code))
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(409, "Job code already exists")
     session.refresh(job)
+    counters.job_changed(None, (job.status, job.priority, None))
 
     await hub.broadcast_json(
         {
@@ -44,7 +120,12 @@ async def create_job(payload: dict, session: Session = Depends(get_session)):
             "payload": {
                 "id": str(job.id),
                 "job_code": job.job_code,
+                "customer": job.customer,
+                "priority": job.priority,
                 "status": job.status,
+                "pickup_site": job.pickup_site,
+                "drop_site": job.drop_site,
+                "version": job.version,
                 "source": "crm",
                 "last_update_at": job.last_update_at.isoformat(),
             },
@@ -64,7 +145,7 @@ async def create_job(payload: dict, session: Session = Depends(get_session)):
     )
     return {"job": job}
 
-@router.get("", response_model=Page)
+@router.get("", response_model=Union[Page, GroupedPage])
 def get_jobs(
     page: int = 1,
     page_size: int = 50,
@@ -75,12 +156,20 @@ def get_jobs(
     region: Optional[str] = None,
     priority: Optional[str] = None,
     stale_minutes: Optional[int] = None,
-    session: Session = Depends(get_session),
+    include_archived: bool = False,
+    include: Optional[str] = None,
+    view_id: Optional[uuid.UUID] = None,
+    group_by: Optional[str] = None,
+    group_top: int = 0,
+    session: Session = Depends(get_read_session),
 ):
-    items, total = list_jobs(
-        session,
-        page=page,
-        page_size=min(page_size, 200),
+    view = resolve_view(session, view_id, "jobs")
+    try:
+        relations = parse_include(include)
+        group = parse_group_by("jobs", group_by, view)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    filters = dict(
         q=q,
         status=status,
         customer=customer,
@@ -88,24 +177,101 @@ def get_jobs(
         region=region,
         priority=priority,
         stale_minutes=stale_minutes,
+        include_archived=include_archived,
+    )
+    if group:
+        if relations:
+            raise HTTPException(400, "include cannot be combined with group_by")
+        stmt = filter_jobs(view=view, **filters)
+        if view:
+            stmt = view.select_columns(stmt)
+        order_by = view.order_by if view else (Job.last_update_at.desc(),)
+        return grouped(session, stmt, module="jobs", group_by=group, order_by=order_by, top=group_top)
+
+    items, total = list_jobs(
+        session,
+        page=page,
+        page_size=min(page_size, 200),
+        include=relations,
+        view=view,
+        **filters,
     )
     return Page(items=items, total=total, page=page, page_size=min(page_size, 200))
 
+@router.post("/claim-next")
+async def claim_next(payload: dict, session: Session = Depends(get_session)):
+    # Phase 1: auth not implemented, so the claiming dispatcher is named in the body
+    user_id = payload.get("user_id")
+    if not user_id:
+        raise HTTPException(400, "user_id is required")
+    try:
+        user_id = uuid.UUID(str(user_id))
+    except ValueError:
+        raise HTTPException(400, "user_id must be a UUID")
+    if session.get(User, user_id) is None:
+        raise HTTPException(404, "User not found")
+
+    job = claim_next_job(session, user_id=user_id, priority=payload.get("priority"), customer=payload.get("customer"))
+    if job is None:
+        return {"job": None}
+    await hub.broadcast_json({"type": "job.updated", "payload": {"id": str(job.id), "status": job.status, "owner_user_id": str(user_id), "version": job.version, "last_update_at": job.last_update_at.isoformat()}})
+    return {"job": job}
+
 @router.get("/{job_id}")
-def get_job(job_id: uuid.UUID, session: Session = Depends(get_session)):
+def get_job(job_id: uuid.UUID, include: Optional[str] = None, session: Session = Depends(get_read_session)):
+    try:
+        relations = parse_include(include)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if relations:
+        item = get_job_with_relations(session, job_id, relations)
+        if not item:
+            raise HTTPException(404, "Job not found")
+        # relations sit next to the job, as they do without include
+        embedded = {name: item.pop(name) for name in relations}
+        return {"job": item, **embedded}
+
     job = session.get(Job, job_id)
     if not job:
         raise HTTPException(404, "Job not found")
-    driver = session.get(Driver, job.driver_id) if job.driver_id else None
-    vehicle = session.get(Vehicle, job.vehicle_id) if job.vehicle_id else None
+    driver = reference_cache.get_driver(session, job.driver_id)
+    vehicle = reference_cache.get_vehicle(session, job.vehicle_id)
     return {"job": job, "driver": driver, "vehicle": vehicle}
 
+@router.get("/{job_id}/timeline")
+def get_job_timeline(job_id: uuid.UUID, limit: int = 50, cursor: Optional[str] = None, session: Session = Depends(get_read_session)):
+    if session.get(Job, job_id) is None:
+        raise HTTPException(404, "Job not found")
+    try:
+        return entity_timeline(session, "job", job_id, limit=min(max(limit, 1), 200), cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@router.get("/{job_id}/candidates")
+def get_job_candidates(
+    job_id: uuid.UUID,
+    depot: Optional[str] = None,
+    region: Optional[str] = None,
+    vehicle_class: Optional[str] = None,
+    limit: int = 10,
+    session: Session = Depends(get_read_session),
+):
+    job = session.get(Job, job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return find_candidates(job, depot=depot, region=region, vehicle_class=vehicle_class, limit=min(max(limit, 1), 50))
+
 @router.post("/{job_id}/assign")
 async def post_assign(
     job_id: uuid.UUID,
     payload: dict,
     session: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(default=None),
 ):
+    return await _idempotent(session, f"jobs.assign:{job_id}", idempotency_key, payload, lambda: _assign(job_id, payload, session))
+
+
+async def _assign(job_id: uuid.UUID, payload: dict, session: Session) -> dict:
     driver_id = payload.get("driver_id")
     vehicle_id = payload.get("vehicle_id")
     override = bool(payload.get("override", False))
@@ -120,13 +286,30 @@ async def post_assign(
             actor_user_id=None,  # Phase 1: auth not implemented
             override=override,
             override_reason=override_reason,
+            version=_version(payload, "version"),
+            driver_version=_version(payload, "driver_version"),
+            vehicle_version=_version(payload, "vehicle_version"),
         )
+    except VersionConflict as e:
+        raise _conflict(e)
     except PermissionError as e:
         raise HTTPException(409, str(e))
     except ValueError as e:
         raise HTTPException(404, str(e))
 
-    await hub.broadcast_json({"type": "job.updated", "payload": {"id": str(job.id), "status": job.status, "last_update_at": job.last_update_at.isoformat()}})
+    await hub.broadcast_json(
+        {
+            "type": "job.updated",
+            "payload": {
+                "id": str(job.id),
+                "status": job.status,
+                "driver_id": str(job.driver_id) if job.driver_id else None,
+                "vehicle_id": str(job.vehicle_id) if job.vehicle_id else None,
+                "version": job.version,
+                "last_update_at": job.last_update_at.isoformat(),
+            },
+        }
+    )
     await hub.broadcast_json({"type": "driver.updated", "payload": {"id": str(job.driver_id) if job.driver_id else None, "status": "on_job" if job.driver_id else "off_duty", "job_id": str(job.id), "last_update_at": job.last_update_at.isoformat()}})
     await hub.broadcast_json({"type": "vehicle.updated", "payload": {"id": str(job.vehicle_id) if job.vehicle_id else None, "status": "in_use" if job.vehicle_id else "available", "job_id": str(job.id), "last_update_at": job.last_update_at.isoformat()}})
     await hub.broadcast_json({"type": "ops.refresh", "payload": {"entity": "job", "action": "assigned", "id": str(job.id), "last_update_at": job.last_update_at.isoformat()}})
@@ -147,11 +330,33 @@ async def update_job_status(
     if not job:
         raise HTTPException(404, "Job not found")
 
-    job.status = str(status)
-    job.last_update_at = datetime.utcnow()
-    session.add(job)
+    depot = reference_cache.job_depot(job.driver_id, job.vehicle_id)
+    status_before = job.status
+    now = datetime.utcnow()
+    try:
+        set_job_status(session, job, str(status), now, version=_version(payload, "version"))
+    except VersionConflict as e:
+        raise _conflict(e)
+    except PermissionError as e:
+        raise HTTPException(409, str(e))
+    released = []
+    if str(status) in TERMINAL_JOB_STATUSES and status_before not in TERMINAL_JOB_STATUSES:
+        released = release_job_resources(session, job, now)
     session.commit()
     session.refresh(job)
+    counters.job_changed((status_before, job.priority, depot), (job.status, job.priority, depot))
+    apply_released(released, now)
+    if job.sla_started_at is not None:
+        sla_loop.poke()
+    write_audit(
+        session,
+        actor_user_id=None,  # Phase 1: auth not implemented
+        entity_type="job",
+        entity_id=job.id,
+        action="job.status",
+        before={"status": status_before},
+        after={"status": job.status, "version": job.version},
+    )
 
     await hub.broadcast_json(
         {
@@ -159,6 +364,7 @@ async def update_job_status(
             "payload": {
                 "id": str(job.id),
                 "status": job.status,
+                "version": job.version,
                 "last_update_at": job.last_update_at.isoformat(),
             },
         }
@@ -175,5 +381,7 @@ async def update_job_status(
             },
         }
     )
+    for kind, row in released:
+        await hub.broadcast_json({"type": f"{kind}.updated", "payload": {"id": str(row.id), "status": "idle" if kind == "driver" else "available", "job_id": str(job.id), "last_update_at": job.last_update_at.isoformat()}})
 
     return {"job": job}
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app import metrics as app_metrics
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(app_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,55 +1,104 @@
 from __future__ import annotations
 
+import threading
+import time
 from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends
-from sqlmodel import Session, select
+from sqlalchemy import and_, case
+from sqlmodel import Session, select, func
 
-from app.db import get_session
-from app.models import Job
+from app.config import settings
+from app.db import get_read_session
+from app.models import Job, JobDailyRollup
+from app.services.dashboard import LIVE_JOBS
+from app.services.jobs import TERMINAL_JOB_STATUSES
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+# the report reads every live job, so each window is built at most once per
+# REPORTS_CACHE_SECONDS per process; the same TTL goes out as max-age
+_report_cache: dict[int, tuple[float, dict]] = {}
+_report_cache_lock = threading.Lock()
+
+
+def _daily_counts(session: Session):
+    # (day, status, priority, customer, jobs, resolved, resolution_minutes) rows:
+    # live jobs are aggregated in SQL, archived jobs come from their rollups
+    day = func.date(Job.created_at)
+    minutes = (func.extract("epoch", Job.last_update_at) - func.extract("epoch", Job.created_at)) / 60
+    resolved = and_(Job.status.in_(TERMINAL_JOB_STATUSES), minutes >= 0)
+    live = session.execute(
+        select(
+            day,
+            Job.status,
+            Job.priority,
+            Job.customer,
+            func.count(),
+            func.sum(case((resolved, 1), else_=0)),
+            func.sum(case((resolved, minutes), else_=0)),
+        )
+        .where(LIVE_JOBS)
+        .group_by(day, Job.status, Job.priority, Job.customer)
+    ).all()
+    archived = session.execute(
+        select(
+            JobDailyRollup.day,
+            JobDailyRollup.status,
+            JobDailyRollup.priority,
+            JobDailyRollup.customer,
+            JobDailyRollup.jobs,
+            JobDailyRollup.resolved,
+            JobDailyRollup.resolution_minutes,
+        )
+    ).all()
+    for d, status, priority, customer, jobs, n_resolved, total_minutes in [*live, *archived]:
+        yield str(d), status, priority, customer, int(jobs), int(n_resolved or 0), float(total_minutes or 0)
+
 
 @router.get("/jobs")
 def get_jobs_report(
     days: int = 180,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
 ):
     days = max(30, min(days, 730))
+    with _report_cache_lock:
+        cached = _report_cache.get(days)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    report = _build_report(session, days)
+    if settings.reports_cache_seconds > 0:
+        with _report_cache_lock:
+            _report_cache[days] = (time.monotonic() + settings.reports_cache_seconds, report)
+    return report
+
+
+def _build_report(session: Session, days: int) -> dict:
     now = datetime.utcnow()
-    start = now - timedelta(days=days)
-
-    jobs = list(session.exec(select(Job).where(Job.created_at >= start)).all())
-    all_jobs = list(session.exec(select(Job)).all())
-
-    status_counts = Counter(j.status for j in all_jobs)
-
-    completed_durations = []
-    for j in all_jobs:
-        if j.status in {"completed", "failed", "cancelled"}:
-            created = j.created_at or j.last_update_at
-            updated = j.last_update_at or j.created_at
-            if created and updated:
-                minutes = (updated - created).total_seconds() / 60
-                if minutes >= 0:
-                    completed_durations.append(minutes)
+    start = (now - timedelta(days=days)).date().isoformat()
 
-    avg_resolution_minutes = round(sum(completed_durations) / len(completed_durations), 1) if completed_durations else None
-
-    jobs_by_day = defaultdict(int)
-    status_by_day = defaultdict(lambda: Counter())
+    status_counts = Counter()
     priority_counts = Counter()
     customer_counts = Counter()
-
-    for j in jobs:
-        if not j.created_at:
+    jobs_by_day = defaultdict(int)
+    status_by_day = defaultdict(lambda: Counter())
+    monthly_volume = defaultdict(int)
+    resolved_jobs = 0
+    resolution_minutes = 0.0
+
+    for day_key, status, priority, customer, jobs, n_resolved, total_minutes in _daily_counts(session):
+        status_counts[status] += jobs
+        monthly_volume[day_key[:7]] += jobs
+        resolved_jobs += n_resolved
+        resolution_minutes += total_minutes
+        if day_key < start:
             continue
-        day_key = j.created_at.date().isoformat()
-        jobs_by_day[day_key] += 1
-        status_by_day[day_key][j.status] += 1
-        priority_counts[j.priority] += 1
-        customer_counts[j.customer] += 1
+        jobs_by_day[day_key] += jobs
+        status_by_day[day_key][status] += jobs
+        priority_counts[priority] += jobs
+        customer_counts[customer] += jobs
+
+    avg_resolution_minutes = round(resolution_minutes / resolved_jobs, 1) if resolved_jobs else None
 
     day_keys = sorted(jobs_by_day.keys())
     daily_volume = [
@@ -63,12 +112,6 @@ def get_jobs_report(
         for d in day_keys
     ]
 
-    monthly_volume = defaultdict(int)
-    for j in all_jobs:
-        if j.created_at:
-            m = j.created_at.strftime("%Y-%m")
-            monthly_volume[m] += 1
-
     month_keys = sorted(monthly_volume.keys())
     monthly_series = [{"month": m, "created": monthly_volume[m]} for m in month_keys]
 
@@ -78,8 +121,8 @@ def get_jobs_report(
         "window_days": days,
         "generated_at": now.isoformat(),
         "totals": {
-            "all_jobs": len(all_jobs),
-            "jobs_in_window": len(jobs),
+            "all_jobs": sum(status_counts.values()),
+            "jobs_in_window": sum(jobs_by_day.values()),
             "open_jobs": sum(status_counts.get(s, 0) for s in ["unassigned", "assigned", "in_progress", "late"]),
             "completed_jobs": int(status_counts.get("completed", 0)),
             "avg_resolution_minutes": avg_resolution_minutes,
@@ -1,18 +1,31 @@
 from __future__ import annotations
 import uuid
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session
 
-from app.db import get_session
+from app.db import get_session, get_read_session
 from app.models import SavedView
 from app.services.saved_views import list_views, upsert_view
+from app.services.views import MODULES, CompiledView, compile_view, view_plans
 
 router = APIRouter(prefix="/saved-views", tags=["saved-views"])
 
 DEFAULT_USER_ID = uuid.UUID("00000000-0000-0000-0000-000000000001")  # Phase 1 placeholder
 
+def resolve_view(session: Session, view_id: Optional[uuid.UUID], module: str) -> Optional[CompiledView]:
+    # shared by the list endpoints' ?view_id=
+    if view_id is None:
+        return None
+    try:
+        return view_plans.get(session, view_id, module)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
 @router.get("")
-def get_views(module: str, session: Session = Depends(get_session)):
+def get_views(module: str, session: Session = Depends(get_read_session)):
     return {"items": list_views(session, DEFAULT_USER_ID, module)}
 
 @router.post("")
@@ -31,5 +44,10 @@ def post_view(payload: dict, session: Session = Depends(get_session)):
         sort_json=payload.get("sort_json", "{}"),
         grouping_json=payload.get("grouping_json", "{}"),
     )
+    if module in MODULES:
+        try:
+            compile_view(view)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
     saved = upsert_view(session, view)
     return {"item": saved}
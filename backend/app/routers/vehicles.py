@@ -1,16 +1,19 @@
 from __future__ import annotations
 import uuid
-from typing import Optional
+from typing import Optional, Union
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select, func
 
-from app.db import get_session
+from app.db import get_read_session
 from app.models import Vehicle, Job
-from app.schemas import Page
+from app.schemas import Page, GroupedPage
+from app.routers.saved_views import resolve_view
+from app.services.grouping import grouped, parse_group_by
+from app.services.timeline import entity_timeline
 
 router = APIRouter(prefix="/vehicles", tags=["vehicles"])
 
-@router.get("", response_model=Page)
+@router.get("", response_model=Union[Page, GroupedPage])
 def get_vehicles(
     page: int = 1,
     page_size: int = 50,
@@ -20,8 +23,16 @@ def get_vehicles(
     region: Optional[str] = None,
     vehicle_class: Optional[str] = None,
     compliance_state: Optional[str] = None,
-    session: Session = Depends(get_session),
+    view_id: Optional[uuid.UUID] = None,
+    group_by: Optional[str] = None,
+    group_top: int = 0,
+    session: Session = Depends(get_read_session),
 ):
+    view = resolve_view(session, view_id, "vehicles")
+    try:
+        group = parse_group_by("vehicles", group_by, view)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     stmt = select(Vehicle)
     if q:
         like = f"%{q.lower()}%"
@@ -37,15 +48,31 @@ def get_vehicles(
     if compliance_state:
         stmt = stmt.where(Vehicle.compliance_state == compliance_state)
 
+    if view:
+        stmt = view.apply(stmt)
+
+    order_by = view.order_by if view else (Vehicle.last_update_at.desc(),)
+    if group:
+        return grouped(session, stmt, module="vehicles", group_by=group, order_by=order_by, top=group_top)
+
     total = session.exec(select(func.count()).select_from(stmt.subquery())).one()
-    stmt = stmt.order_by(Vehicle.last_update_at.desc()).offset((page - 1) * min(page_size, 200)).limit(min(page_size, 200))
-    items = list(session.exec(stmt).all())
+    stmt = stmt.order_by(*order_by).offset((page - 1) * min(page_size, 200)).limit(min(page_size, 200))
+    items = view.fetch(session, stmt) if view else list(session.exec(stmt).all())
     return Page(items=items, total=int(total), page=page, page_size=min(page_size, 200))
 
 @router.get("/{vehicle_id}")
-def get_vehicle(vehicle_id: uuid.UUID, session: Session = Depends(get_session)):
+def get_vehicle(vehicle_id: uuid.UUID, session: Session = Depends(get_read_session)):
     vehicle = session.get(Vehicle, vehicle_id)
     if not vehicle:
         raise HTTPException(404, "Vehicle not found")
     current_job = session.exec(select(Job).where(Job.vehicle_id == vehicle.id).order_by(Job.last_update_at.desc())).first()
     return {"vehicle": vehicle, "current_job": current_job}
+
+@router.get("/{vehicle_id}/timeline")
+def get_vehicle_timeline(vehicle_id: uuid.UUID, limit: int = 50, cursor: Optional[str] = None, session: Session = Depends(get_read_session)):
+    if session.get(Vehicle, vehicle_id) is None:
+        raise HTTPException(404, "Vehicle not found")
+    try:
+        return entity_timeline(session, "vehicle", vehicle_id, limit=min(max(limit, 1), 200), cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
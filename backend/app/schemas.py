@@ -1,7 +1,7 @@
 from __future__ import annotations
 import uuid
 from datetime import datetime
-from typing import Optional, Any, Dict, List
+from typing import Optional, Any, Dict, List, Literal
 from pydantic import BaseModel
 
 class Page(BaseModel):
@@ -10,6 +10,11 @@ class Page(BaseModel):
     page: int
     page_size: int
 
+class GroupedPage(BaseModel):
+    group_by: str
+    groups: List[Dict[str, Any]]
+    total: int
+
 class JobUpdate(BaseModel):
     id: uuid.UUID
     status: str
@@ -20,3 +25,10 @@ class JobUpdate(BaseModel):
 class WsEvent(BaseModel):
     type: str
     payload: Dict[str, Any]
+
+class IngestEvent(BaseModel):
+    # a status change, or a heartbeat when status is omitted; at defaults to receipt time
+    entity_type: Literal["job", "driver", "vehicle"]
+    entity_id: uuid.UUID
+    status: Optional[str] = None
+    at: Optional[datetime] = None
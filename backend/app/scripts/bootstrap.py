@@ -1,18 +1,57 @@
 from __future__ import annotations
-import os
-import subprocess
+import argparse
+import logging
+from pathlib import Path
+from sqlalchemy import text
 from sqlmodel import Session, select
 from datetime import datetime, timedelta, date
 import uuid
 import random
 
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
 from app.config import settings
 from app.db import get_engine
-from app.models import User, Role, UserRole, Driver, Vehicle, Job, Alert
+from app.models import User, Role, UserRole, Driver, Vehicle, Job, JobCode, Alert
 from app.services.audit import write_audit
 
-def run_migrations():
-    subprocess.check_call(["alembic", "upgrade", "head"])
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+MIGRATION_LOCK_KEY = 0x0C0A5E01  # pg advisory lock shared by all replicas
+
+def _alembic_config() -> Config:
+    cfg = Config(str(BACKEND_DIR / "alembic.ini"))
+    cfg.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+def _at_head(connection, script: ScriptDirectory) -> bool:
+    current = set(MigrationContext.configure(connection).get_current_heads())
+    return current == set(script.get_heads())
+
+def run_migrations() -> bool:
+    # upgrades to head in-process; returns False when already at head
+    cfg = _alembic_config()
+    script = ScriptDirectory.from_config(cfg)
+    engine = get_engine()
+
+    # fast path: no lock and no Alembic environment when nothing is pending
+    with engine.connect() as connection:
+        if _at_head(connection, script):
+            return False
+
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            # replicas booting together queue here; the transaction-scoped lock
+            # is released on commit, after which the others see head and skip
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        if _at_head(connection, script):
+            return False
+        cfg.attributes["connection"] = connection
+        command.upgrade(cfg, "head")
+    return True
 
 def seed():
     engine = get_engine()
@@ -109,6 +148,7 @@ def seed():
                 last_update_at=now - timedelta(minutes=random.randint(0, 180)),
             )
             session.add(j)
+            session.add(JobCode(job_code=j.job_code))
             jobs.append(j)
 
         session.commit()
@@ -122,6 +162,7 @@ def seed():
             ("vehicle_due_service_assigned", "vehicle"),
             ("compliance_block", "job"),
         ]
+        open_alerts = set()
         for i in range(65):
             at, et = random.choice(alert_types)
             related = None
@@ -133,6 +174,10 @@ def seed():
                 related = random.choice(vehicles)
 
             status = "open" if random.random() < 0.75 else "resolved"
+            if status == "open" and (at, et, related.id) in open_alerts:
+                status = "resolved"  # uq_alerts_open_entity allows one unresolved alert per entity
+            elif status == "open":
+                open_alerts.add((at, et, related.id))
             a = Alert(
                 severity=random.choice(["low", "medium", "high", "critical"]),
                 alert_type=at,
@@ -150,8 +195,26 @@ def seed():
         # audit seed: record initial seed event
         write_audit(session, actor_user_id=admin_user.id, entity_type="system", entity_id=None, action="seed.completed", before=None, after={"jobs": 350, "drivers": 40, "vehicles": 45, "alerts": 65})
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.scripts.bootstrap")
+    sub = parser.add_subparsers(dest="command")
+    seed_cmd = sub.add_parser("seed", help="seed sample data (or a load-test dataset with --scale)")
+    seed_cmd.add_argument("--scale", type=int, default=None, help="load-test scale; 1 unit = 100k jobs over 2 years")
+    seed_cmd.add_argument("--rng-seed", type=int, default=42)
+    seed_cmd.add_argument("--anchor", type=date.fromisoformat, default=None, help="end date of the generated history (YYYY-MM-DD)")
+    seed_cmd.add_argument("--reset", action="store_true", help="truncate operational tables first")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-5.5s [%(name)s] %(message)s")
     run_migrations()
+    if args.command == "seed":
+        if args.scale:
+            from app.scripts.seed_scale import seed_scale
+            anchor = datetime.combine(args.anchor, datetime.min.time()) if args.anchor else None
+            seed_scale(args.scale, rng_seed=args.rng_seed, anchor=anchor, reset=args.reset)
+        else:
+            seed()
+        return
     if settings.seed_on_start:
         seed()
 
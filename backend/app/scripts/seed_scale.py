@@ -0,0 +1,267 @@
+from __future__ import annotations
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.db import get_engine
+
+ADMIN_USER_ID = uuid.UUID("00000000-0000-0000-0000-000000000001")
+
+# rows generated per unit of --scale; scale 10 gives ~1M jobs, ~200k alerts and ~3M audit rows over 2 years
+DRIVERS_PER_UNIT = 100
+VEHICLES_PER_UNIT = 110
+JOBS_PER_UNIT = 100_000
+HISTORY_DAYS = 730
+CHUNK_SIZE = 50_000
+
+DEPOTS = [("JHB", "Gauteng", 40), ("PTA", "Gauteng", 25), ("DBN", "KZN", 20), ("CPT", "WC", 15)]
+VEHICLE_CLASSES = [("8t", 30), ("14t", 35), ("34t", 25), ("tanker", 10)]
+PRIORITIES = [("low", 20), ("normal", 55), ("high", 20), ("critical", 5)]
+TERMINAL_STATUSES = [("completed", 90), ("failed", 5), ("cancelled", 5)]
+OPEN_STATUSES = [("unassigned", 25), ("assigned", 30), ("in_progress", 35), ("late", 10)]
+SITES = [
+    "Witbank Yard", "Richards Bay Port", "Vereeniging Depot", "Sasolburg Site", "Kriel Mine",
+    "Secunda Terminal", "Durban Harbour", "Cape Town Docks", "Rosslyn Plant", "Kempton Hub",
+    "Middelburg Colliery", "Ermelo Siding", "Newcastle Works", "Pinetown DC", "Bellville DC",
+]
+CUSTOMER_STEMS = ["Acme", "BlueRock", "Coal", "Delta", "Eagle", "Fynbos", "Granite", "Highveld", "Impala", "Jacaranda"]
+CUSTOMER_SUFFIXES = ["Mining", "Logistics", "Energy", "Holdings", "Freight", "Minerals", "Agri", "Chemicals"]
+ALERT_TYPES = [
+    ("job_late", "job", 35),
+    ("sla_risk", "job", 30),
+    ("missing_proof", "job", 15),
+    ("compliance_block", "job", 5),
+    ("driver_over_hours", "driver", 10),
+    ("vehicle_due_service_assigned", "vehicle", 5),
+]
+SEVERITIES = [("low", 25), ("medium", 40), ("high", 25), ("critical", 10)]
+
+JOB_COLUMNS = [
+    "id", "job_code", "priority", "customer", "pickup_site", "drop_site", "scheduled_at", "eta_at", "status",
+    "sla_minutes_total", "sla_started_at", "driver_id", "vehicle_id", "exceptions", "owner_user_id",
+    "last_update_at", "created_at",
+]
+ALERT_COLUMNS = [
+    "id", "severity", "alert_type", "entity_type", "entity_id", "description", "owner_user_id", "status",
+    "created_at", "due_by", "last_seen_at",
+]
+AUDIT_COLUMNS = [
+    "id", "actor_user_id", "timestamp", "entity_type", "entity_id", "action", "before_json", "after_json",
+    "source", "correlation_id",
+]
+
+
+class _Weighted:
+    def __init__(self, rng: random.Random, options):
+        self._rng = rng
+        self._values = [o[:-1] if len(o) > 2 else o[0] for o in options]
+        self._weights = [o[-1] for o in options]
+
+    def __call__(self):
+        return self._rng.choices(self._values, weights=self._weights)[0]
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _copy(cur, table: str, columns: list[str], rows) -> int:
+    n = 0
+    with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row(row)
+            n += 1
+    return n
+
+
+def _customers(rng: random.Random) -> tuple[list[str], list[float]]:
+    names = [f"{s} {x}" for s in CUSTOMER_STEMS for x in CUSTOMER_SUFFIXES]
+    rng.shuffle(names)
+    # a few large accounts and a long tail, as in production
+    weights = [1.0 / (rank + 1) ** 1.1 for rank in range(len(names))]
+    return names, weights
+
+
+def _created_at(rng: random.Random, anchor: datetime) -> datetime:
+    # volume grows over the two years and dips on weekends
+    while True:
+        age_days = HISTORY_DAYS * (1.0 - rng.random() ** 0.75)
+        ts = anchor - timedelta(days=age_days)
+        if ts.weekday() < 5 or rng.random() < 0.35:
+            return ts.replace(microsecond=0)
+
+
+def seed_scale(scale: int, *, rng_seed: int = 42, anchor: datetime | None = None, reset: bool = False, log=print) -> dict:
+    if scale < 1:
+        raise ValueError("scale must be >= 1")
+    rng = random.Random(rng_seed)
+    anchor = anchor or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    engine = get_engine()
+    started = time.monotonic()
+
+    pick_depot = _Weighted(rng, DEPOTS)
+    pick_class = _Weighted(rng, VEHICLE_CLASSES)
+    pick_priority = _Weighted(rng, PRIORITIES)
+    pick_terminal = _Weighted(rng, TERMINAL_STATUSES)
+    pick_open = _Weighted(rng, OPEN_STATUSES)
+    pick_alert = _Weighted(rng, ALERT_TYPES)
+    pick_severity = _Weighted(rng, SEVERITIES)
+    customers, customer_weights = _customers(rng)
+
+    counts = {"drivers": 0, "vehicles": 0, "jobs": 0, "alerts": 0, "audit": 0}
+
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        with conn.cursor() as cur:
+            if reset:
+                # idempotency_keys too: stored responses would replay jobs that no longer exist
+                cur.execute(
+                    "TRUNCATE audit_log_entities, audit_log_entries, alerts, jobs, job_codes, job_daily_rollups, "
+                    "idempotency_keys, drivers, vehicles"
+                )
+            cur.execute(
+                "INSERT INTO users (id, email, display_name) VALUES (%s, 'admin@local', 'Admin') ON CONFLICT DO NOTHING",
+                (ADMIN_USER_ID,),
+            )
+
+            drivers = []
+            for i in range(DRIVERS_PER_UNIT * scale):
+                depot, region = pick_depot()
+                drivers.append((
+                    _uuid(rng), f"Driver {i+1:05d}", f"DRV{i+1:06d}", depot, region,
+                    rng.choice(["on_duty", "on_job", "idle", "off_duty"]),
+                    rng.randint(0, 11), rng.randint(10, 55),
+                    "blocked" if rng.random() < 0.05 else "ok", anchor,
+                ))
+            counts["drivers"] = _copy(cur, "drivers", [
+                "id", "name", "staff_id", "depot", "region", "status", "hours_today", "hours_week",
+                "compliance_state", "last_update_at",
+            ], drivers)
+
+            vehicles = []
+            for i in range(VEHICLES_PER_UNIT * scale):
+                depot, region = pick_depot()
+                vehicles.append((
+                    _uuid(rng), f"REG{i+1:06d} GP", f"FLT{i+1:06d}", pick_class(), depot, region,
+                    rng.choice(["available", "in_use", "in_use", "due_service", "out_of_service"]),
+                    anchor.date() + timedelta(days=rng.randint(-10, 90)), rng.randint(0, 4),
+                    "blocked" if rng.random() < 0.04 else "ok", anchor,
+                ))
+            counts["vehicles"] = _copy(cur, "vehicles", [
+                "id", "registration", "fleet_id", "vehicle_class", "depot", "region", "status",
+                "next_service_date", "faults_open", "compliance_state", "last_update_at",
+            ], vehicles)
+            conn.commit()
+            log(f"seed: {counts['drivers']} drivers, {counts['vehicles']} vehicles")
+
+            driver_ids = [d[0] for d in drivers]
+            vehicle_ids = [v[0] for v in vehicles]
+            total_jobs = JOBS_PER_UNIT * scale
+            unresolved_alerts: set[tuple] = set()
+            open_window = timedelta(days=2)
+
+            for chunk_start in range(0, total_jobs, CHUNK_SIZE):
+                jobs, alerts, audit = [], [], []
+                for i in range(chunk_start, min(chunk_start + CHUNK_SIZE, total_jobs)):
+                    job_id = _uuid(rng)
+                    created = _created_at(rng, anchor)
+                    is_open = anchor - created < open_window
+                    status = pick_open() if is_open else pick_terminal()
+                    sla_total = rng.choice([180, 240, 360, 480])
+                    scheduled = created + timedelta(minutes=rng.randint(30, 1440))
+                    assigned = status not in ("unassigned", "cancelled") or rng.random() < 0.3
+                    driver_id = rng.choice(driver_ids) if assigned and rng.random() < 0.9 else None
+                    vehicle_id = rng.choice(vehicle_ids) if assigned and rng.random() < 0.92 else None
+                    if status == "unassigned":
+                        driver_id = vehicle_id = None
+                    duration = timedelta(minutes=int(rng.lognormvariate(5.3, 0.45)))
+                    last_update = created + duration if not is_open else anchor - timedelta(minutes=rng.randint(0, 180))
+                    owner = ADMIN_USER_ID if rng.random() < 0.25 else None
+                    jobs.append((
+                        job_id, f"JOB-{i+1:08d}", pick_priority(),
+                        rng.choices(customers, weights=customer_weights)[0],
+                        rng.choice(SITES), rng.choice(SITES), scheduled,
+                        scheduled + timedelta(minutes=rng.randint(30, 240)), status, sla_total,
+                        scheduled - timedelta(minutes=rng.randint(30, 120)), driver_id, vehicle_id,
+                        "missing_proof" if rng.random() < 0.05 else None, owner, last_update, created,
+                    ))
+
+                    audit.append((
+                        _uuid(rng), None, created, "job", job_id, "job.create", None,
+                        json.dumps({"status": "unassigned", "customer": jobs[-1][3]}), "crm", None,
+                    ))
+                    if driver_id or vehicle_id:
+                        ts = created + duration / 4
+                        audit.append((
+                            _uuid(rng), owner, ts, "job", job_id, "job.assign",
+                            json.dumps({"status": "unassigned", "driver_id": None, "vehicle_id": None}),
+                            json.dumps({"status": "assigned", "driver_id": str(driver_id) if driver_id else None,
+                                        "vehicle_id": str(vehicle_id) if vehicle_id else None}),
+                            "web", None,
+                        ))
+                    if status not in ("unassigned", "assigned"):
+                        audit.append((
+                            _uuid(rng), None, last_update, "job", job_id, "job.status",
+                            json.dumps({"status": "in_progress"}), json.dumps({"status": status}), "web", None,
+                        ))
+
+                    if rng.random() < 0.2:
+                        alert_type, entity_type = pick_alert()
+                        entity_id = job_id
+                        if entity_type == "driver":
+                            entity_id = driver_id or rng.choice(driver_ids)
+                        elif entity_type == "vehicle":
+                            entity_id = vehicle_id or rng.choice(vehicle_ids)
+                        alert_created = created + duration / 2
+                        alert_open = is_open and rng.random() < 0.75
+                        alert_id = _uuid(rng)
+                        alert_status = "open" if alert_open else rng.choice(["acknowledged", "resolved", "resolved"])
+                        # one unresolved alert per (type, entity), as enforced by uq_alerts_open_entity
+                        alert_key = (alert_type, entity_type, entity_id)
+                        if alert_status != "resolved" and alert_key in unresolved_alerts:
+                            alert_status, alert_open = "resolved", False
+                        elif alert_status != "resolved":
+                            unresolved_alerts.add(alert_key)
+                        alerts.append((
+                            alert_id, pick_severity(), alert_type, entity_type, entity_id,
+                            f"{alert_type.replace('_', ' ').title()} detected",
+                            ADMIN_USER_ID if rng.random() < 0.5 else None,
+                            alert_status,
+                            alert_created,
+                            alert_created + timedelta(hours=rng.randint(2, 48)) if alert_open else None,
+                            alert_created,
+                        ))
+                        if alert_status == "acknowledged":
+                            audit.append((
+                                _uuid(rng), owner, alert_created + timedelta(minutes=rng.randint(5, 600)),
+                                "alert", alert_id, "alert.ack", json.dumps({"status": "open"}),
+                                json.dumps({"status": "acknowledged"}), "web", None,
+                            ))
+                        elif alert_status == "resolved":
+                            audit.append((
+                                _uuid(rng), owner, alert_created + timedelta(minutes=rng.randint(5, 600)),
+                                "alert", alert_id, "alert.resolve", json.dumps({"status": "open"}),
+                                json.dumps({"status": "resolved", "reason_code": "resolved"}), "web", None,
+                            ))
+
+                counts["jobs"] += _copy(cur, "jobs", JOB_COLUMNS, jobs)
+                _copy(cur, "job_codes", ["job_code"], [(j[1],) for j in jobs])
+                counts["alerts"] += _copy(cur, "alerts", ALERT_COLUMNS, alerts)
+                counts["audit"] += _copy(cur, "audit_log_entries", AUDIT_COLUMNS, audit)
+                conn.commit()
+                log(f"seed: {counts['jobs']}/{total_jobs} jobs, {counts['alerts']} alerts, {counts['audit']} audit rows "
+                    f"({time.monotonic() - started:.0f}s)")
+    finally:
+        raw.close()
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    counts["seconds"] = round(time.monotonic() - started, 1)
+    log(f"seed: done in {counts['seconds']}s")
+    return counts
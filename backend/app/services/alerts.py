@@ -0,0 +1,101 @@
+from __future__ import annotations
+import uuid
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import literal, literal_column, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select, update
+
+from app.models import Alert
+
+# uq_alerts_open_entity (migration 0004): at most one unresolved alert per
+# (alert_type, entity_type, entity_id). Producers go through raise_alerts(),
+# which folds repeats into the existing row's occurrence counter.
+OPEN_ALERT_KEY = ("alert_type", "entity_type", "entity_id")
+UNRESOLVED = text("status <> 'resolved'")
+FILTER_FIELDS = ("status", "severity", "alert_type", "entity_type", "entity_id")
+MAX_BULK_ALERTS = 1000  # per bulk-ack/bulk-resolve request; filter callers repeat until nothing is left
+
+
+def alert_filters(
+    status: Optional[str] = None,
+    severity: Optional[str] = None,
+    alert_type: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[uuid.UUID] = None,
+) -> list:
+    clauses = []
+    if status:
+        clauses.append(Alert.status == status)
+    if severity:
+        clauses.append(Alert.severity == severity)
+    if alert_type:
+        clauses.append(Alert.alert_type == alert_type)
+    if entity_type:
+        clauses.append(Alert.entity_type == entity_type)
+    if entity_id:
+        clauses.append(Alert.entity_id == entity_id)
+    return clauses
+
+
+def raise_alerts(session: Session, alerts: Iterable[dict], now: datetime) -> list:
+    # Postgres only. Returns (id, severity, inserted) per distinct key; the
+    # caller commits. Repeats within one call are collapsed first because
+    # ON CONFLICT cannot touch the same row twice in a statement.
+    rows: dict[tuple, dict] = {}
+    for alert in alerts:
+        key = tuple(alert[k] for k in OPEN_ALERT_KEY)
+        if key in rows:
+            rows[key]["occurrences"] += 1
+        else:
+            rows[key] = {**alert, "occurrences": 1, "last_seen_at": now}
+    if not rows:
+        return []
+    stmt = pg_insert(Alert).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(OPEN_ALERT_KEY),
+        index_where=UNRESOLVED,
+        set_={
+            "occurrences": Alert.occurrences + stmt.excluded.occurrences,
+            "last_seen_at": stmt.excluded.last_seen_at,
+        },
+    ).returning(Alert.id, Alert.severity, literal_column("xmax = 0").label("inserted"))
+    return list(session.exec(stmt).all())
+
+
+def transition_alerts(
+    session: Session,
+    *,
+    to_status: str,
+    from_statuses: tuple[str, ...],
+    ids: Optional[list[uuid.UUID]] = None,
+    filters: Optional[dict] = None,
+    where: tuple = (),
+    limit: Optional[int] = None,
+) -> list:
+    # one set-based UPDATE per source status, so the previous status of every
+    # returned (id, severity, old_status) row is known without a read first.
+    # With a limit at most that many rows change in total; rows locked by
+    # another writer are skipped.
+    changed = []
+    for from_status in from_statuses:
+        clauses = [Alert.status == from_status, *where]
+        if ids is not None:
+            clauses.append(Alert.id.in_(ids))
+        if filters:
+            clauses += alert_filters(**filters)
+        if limit is not None:
+            if len(changed) >= limit:
+                break
+            batch = select(Alert.id).where(*clauses).limit(limit - len(changed)).with_for_update(skip_locked=True)
+            stmt = update(Alert).where(Alert.id.in_(batch))
+        else:
+            stmt = update(Alert).where(*clauses)
+        stmt = (
+            stmt.values(status=to_status)
+            .returning(Alert.id, Alert.severity, literal(from_status).label("old_status"))
+            .execution_options(synchronize_session=False)
+        )
+        changed += session.exec(stmt).all()
+    return changed
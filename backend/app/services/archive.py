@@ -0,0 +1,135 @@
+from __future__ import annotations
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import false, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, func, update
+
+from app import metrics
+from app.config import settings
+from app.db import get_engine
+from app.models import Job, JobDailyRollup
+from app.services.dashboard import counters
+from app.services.reference_cache import reference_cache
+from app.services.scheduler import DeadlineLoop, TickResult
+from app.services.versioning import bump
+
+logger = logging.getLogger("app.archive")
+
+# Terminal jobs untouched for JOB_ARCHIVE_AFTER_DAYS are flagged archived in
+# batches of JOB_ARCHIVE_BATCH, one transaction each. Migration 0009 list-
+# partitions jobs on that flag, so on Postgres the UPDATE moves every row into
+# the jobs_archive partition and the live partition, with its indexes, only
+# holds current work. Each batch also folds its jobs into job_daily_rollups,
+# which is how /reports reads the archive.
+# Spelled exactly like the ix_jobs_archivable predicate (migration 0009).
+ARCHIVABLE_JOBS = text("jobs.archived = false AND jobs.status IN ('completed', 'failed', 'cancelled')")
+LOCK_KEY = 0x0C0A5E05
+
+jobs_archived_total = metrics.Counter("ops_jobs_archived_total", "Jobs moved out of the live jobs partition.")
+
+
+def _naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def resolution_minutes(created_at: Optional[datetime], last_update_at: Optional[datetime]) -> Optional[float]:
+    if created_at is None or last_update_at is None:
+        return None
+    minutes = (last_update_at - created_at).total_seconds() / 60
+    return minutes if minutes >= 0 else None
+
+
+def _rollups(rows) -> list[dict]:
+    grouped: dict[tuple, dict] = {}
+    for r in rows:
+        key = (r.created_at.date(), r.customer, r.priority, r.status)
+        totals = grouped.setdefault(key, {"jobs": 0, "resolved": 0, "resolution_minutes": 0.0})
+        totals["jobs"] += 1
+        minutes = resolution_minutes(r.created_at, r.last_update_at)
+        if minutes is not None:
+            totals["resolved"] += 1
+            totals["resolution_minutes"] += minutes
+    # sorted so concurrent batches take the rollup row locks in the same order
+    return [
+        {"day": day, "customer": customer, "priority": priority, "status": status, **totals}
+        for (day, customer, priority, status), totals in sorted(grouped.items())
+    ]
+
+
+def _add_rollups(session: Session, values: list[dict]) -> None:
+    insert = pg_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(JobDailyRollup).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day", "customer", "priority", "status"],
+        set_={
+            "jobs": JobDailyRollup.jobs + stmt.excluded.jobs,
+            "resolved": JobDailyRollup.resolved + stmt.excluded.resolved,
+            "resolution_minutes": JobDailyRollup.resolution_minutes + stmt.excluded.resolution_minutes,
+        },
+    )
+    session.exec(stmt)
+
+
+def archive_batch(session: Session, cutoff: datetime) -> list:
+    # one batch in its own transaction; rows a writer holds right now are
+    # skipped and picked up by a later tick
+    batch = (
+        select(Job.id)
+        .where(ARCHIVABLE_JOBS, Job.last_update_at < cutoff)
+        .order_by(Job.last_update_at)
+        .limit(settings.job_archive_batch)
+        .with_for_update(skip_locked=True)
+        .cte("archivable")
+    )
+    rows = session.exec(
+        update(Job)
+        .where(Job.archived == false(), Job.id == batch.c.id)
+        # the version bump makes a status write that read the job before this fail its compare-and-swap
+        .values(archived=True, **bump(Job))
+        .returning(Job.id, Job.status, Job.priority, Job.customer, Job.driver_id, Job.vehicle_id, Job.created_at, Job.last_update_at)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if rows:
+        _add_rollups(session, _rollups(rows))
+    session.commit()
+    return rows
+
+
+class JobArchiver:
+    # Sleeps until the oldest live terminal job crosses the archive age (at
+    # most JOB_ARCHIVE_MAX_SLEEP_SECONDS, which also bounds how late newly
+    # finished jobs are noticed), then archives everything that is due.
+
+    def tick(self) -> TickResult:
+        now = datetime.utcnow()
+        age = timedelta(days=settings.job_archive_after_days)
+        archived = 0
+        with Session(get_engine()) as session:
+            while True:
+                rows = archive_batch(session, now - age)
+                # the dashboard counts live jobs only
+                for r in rows:
+                    counters.job_changed((r.status, r.priority, reference_cache.job_depot(r.driver_id, r.vehicle_id)), None)
+                archived += len(rows)
+                if len(rows) < settings.job_archive_batch:
+                    break
+            oldest = session.exec(select(func.min(Job.last_update_at)).where(ARCHIVABLE_JOBS)).one()
+
+        events = []
+        if archived:
+            jobs_archived_total.inc(amount=archived)
+            logger.info("archived %d jobs", archived)
+            events.append({
+                "type": "ops.refresh",
+                "payload": {"entity": "job", "action": "archived", "count": archived, "last_update_at": now.isoformat()},
+            })
+        next_in = None if oldest is None else (_naive_utc(oldest) + age - now).total_seconds()
+        return TickResult(next_in=next_in, events=events)
+
+
+job_archiver = JobArchiver()
+archive_loop = DeadlineLoop("job_archive", job_archiver.tick, lock_key=LOCK_KEY, max_sleep=settings.job_archive_max_sleep_seconds)
@@ -1,8 +1,31 @@
 from __future__ import annotations
 import uuid
 from typing import Optional, Any
+from sqlalchemy import insert
 from sqlmodel import Session
-from app.models import AuditLogEntry, to_json
+from app.models import AuditLogEntity, AuditLogEntry, to_json
+
+def _entry(
+    *,
+    actor_user_id: Optional[uuid.UUID],
+    entity_type: str,
+    entity_id: Optional[uuid.UUID],
+    action: str,
+    before: Optional[Any],
+    after: Optional[Any],
+    source: str,
+    correlation_id: Optional[str],
+) -> AuditLogEntry:
+    return AuditLogEntry(
+        actor_user_id=actor_user_id,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        action=action,
+        before_json=to_json(before) if before is not None else None,
+        after_json=to_json(after) if after is not None else None,
+        source=source,
+        correlation_id=correlation_id,
+    )
 
 def write_audit(
     session: Session,
@@ -16,17 +39,51 @@ def write_audit(
     source: str = "web",
     correlation_id: Optional[str] = None,
 ) -> AuditLogEntry:
-    entry = AuditLogEntry(
+    entry = _entry(
         actor_user_id=actor_user_id,
         entity_type=entity_type,
         entity_id=entity_id,
         action=action,
-        before_json=to_json(before) if before is not None else None,
-        after_json=to_json(after) if after is not None else None,
+        before=before,
+        after=after,
+        source=source,
+        correlation_id=correlation_id,
+    )
+    session.add(entry)
+    session.commit()
+    session.refresh(entry)
+    return entry
+
+def write_audit_batch(
+    session: Session,
+    *,
+    actor_user_id: Optional[uuid.UUID],
+    entity_type: str,
+    entity_ids: list[uuid.UUID],
+    action: str,
+    after: Optional[dict] = None,
+    source: str = "system",
+    correlation_id: Optional[str] = None,
+) -> AuditLogEntry:
+    # one entry for a set-based change; the affected ids are listed in after_json
+    # and linked through audit_log_entities for the per-entity timelines
+    entry = _entry(
+        actor_user_id=actor_user_id,
+        entity_type=entity_type,
+        entity_id=None,
+        action=action,
+        before=None,
+        after={"count": len(entity_ids), "ids": [str(i) for i in entity_ids], **(after or {})},
         source=source,
         correlation_id=correlation_id,
     )
     session.add(entry)
+    session.flush()
+    if entity_ids:
+        session.execute(
+            insert(AuditLogEntity),
+            [{"audit_id": entry.id, "entity_type": entity_type, "entity_id": i, "timestamp": entry.timestamp} for i in dict.fromkeys(entity_ids)],
+        )
     session.commit()
     session.refresh(entry)
     return entry
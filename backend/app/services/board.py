@@ -0,0 +1,171 @@
+from __future__ import annotations
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlmodel import Session, select, func
+
+from app import metrics
+from app.models import Job
+from app.realtime import hub
+from app.services.dashboard import LIVE_JOBS, OPEN_JOB_STATUSES
+from app.services.reference_cache import reference_cache
+
+OPEN_JOBS = (Job.status.in_(OPEN_JOB_STATUSES), LIVE_JOBS)
+BOARD_FIELDS = (
+    "id", "job_code", "customer", "priority", "status", "pickup_site", "drop_site", "scheduled_at", "eta_at",
+    "sla_started_at", "driver_id", "vehicle_id", "owner_user_id", "version", "last_update_at", "created_at",
+)
+
+board_reconcile_total = metrics.Counter("ops_board_reconcile_total", "Job board reconciliations by result.", ("result",))
+
+
+def _uuid(value) -> Optional[uuid.UUID]:
+    return uuid.UUID(str(value)) if value else None
+
+
+def _naive_utc(value) -> Optional[datetime]:
+    # timestamptz columns read back aware; the board compares with datetime.utcnow()
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value is not None and value.tzinfo else value
+
+
+def _entry(row: Job) -> dict:
+    job = {k: getattr(row, k) for k in BOARD_FIELDS}
+    for k in ("scheduled_at", "eta_at", "sla_started_at", "last_update_at", "created_at"):
+        job[k] = _naive_utc(job[k])
+    return job
+
+
+class JobBoard:
+    # Every open live job, kept in memory for GET /board. Built at startup,
+    # then kept current by applying the hub events this worker broadcasts.
+    # reconcile() periodically compares a count and version sum with the
+    # database and reloads only the jobs that differ. That picks up writes
+    # made on other workers and SLA late marking, which carry no versions.
+    # Driver and vehicle summaries come from the reference cache when read.
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._jobs: dict[uuid.UUID, dict] = {}
+        self.loaded = False
+        self.reconciled_at: Optional[datetime] = None
+
+    def apply(self, message: dict) -> None:
+        # hub listener; anything it cannot place is left for reconcile()
+        kind, payload = message.get("type"), message.get("payload") or {}
+        with self._lock:
+            if kind == "job.created":
+                self._created(payload)
+            elif kind == "job.updated":
+                self._updated(payload)
+            elif kind == "ops.refresh" and payload.get("action") == "sla_scan":
+                for job_id in payload.get("late_ids", []):
+                    job = self._jobs.get(_uuid(job_id))
+                    if job is not None:
+                        job["status"] = "late"
+
+    def _created(self, payload: dict) -> None:
+        if payload.get("status") not in OPEN_JOB_STATUSES or "customer" not in payload:
+            return
+        at = _naive_utc(payload.get("last_update_at"))
+        job = dict.fromkeys(BOARD_FIELDS)
+        job.update({k: payload.get(k) for k in ("job_code", "customer", "priority", "status", "pickup_site", "drop_site", "version")})
+        job.update(id=_uuid(payload["id"]), last_update_at=at, created_at=at)
+        self._jobs[job["id"]] = job
+
+    def _updated(self, payload: dict) -> None:
+        job_id = _uuid(payload.get("id"))
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        # partial updates (claim, version-only) carry no status and leave the job in place
+        if "status" in payload:
+            if payload["status"] not in OPEN_JOB_STATUSES:
+                del self._jobs[job_id]
+                return
+            job["status"] = payload["status"]
+        job["last_update_at"] = _naive_utc(payload.get("last_update_at")) or job["last_update_at"]
+        if "version" in payload:
+            job["version"] = payload["version"]
+        # assignment sends both, None when it clears them
+        for k in ("owner_user_id", "driver_id", "vehicle_id"):
+            if k in payload:
+                job[k] = _uuid(payload[k])
+
+    def checksum(self) -> tuple[int, int]:
+        with self._lock:
+            return len(self._jobs), sum(job["version"] or 0 for job in self._jobs.values())
+
+    def reconcile(self, session: Session) -> None:
+        started = datetime.utcnow()
+        if self.loaded:
+            count, versions = session.exec(select(func.count(), func.coalesce(func.sum(Job.version), 0)).where(*OPEN_JOBS)).one()
+            if (int(count), int(versions)) == self.checksum():
+                board_reconcile_total.inc("match")
+                self.reconciled_at = started
+                return
+            current = dict(session.exec(select(Job.id, Job.version).where(*OPEN_JOBS)).all())
+            with self._lock:
+                changed = [i for i, v in current.items() if self._jobs.get(i, {}).get("version") != v]
+            rows = []
+            for start in range(0, len(changed), 1000):
+                rows += session.exec(select(Job).where(Job.id.in_(changed[start:start + 1000]))).all()
+            board_reconcile_total.inc("repaired")
+        else:
+            rows = session.exec(select(Job).where(*OPEN_JOBS)).all()
+            current = {row.id: row.version for row in rows}
+        with self._lock:
+            for row in rows:
+                job = self._jobs.get(row.id)
+                # an event applied since the read may already be newer
+                if job is None or (job["version"] or 0) <= row.version:
+                    self._jobs[row.id] = _entry(row)
+            for job_id in [i for i, job in self._jobs.items() if i not in current and job["last_update_at"] < started]:
+                del self._jobs[job_id]
+            self.loaded = True
+            self.reconciled_at = started
+
+    def snapshot(
+        self,
+        *,
+        status: Optional[str] = None,
+        depot: Optional[str] = None,
+        priority: Optional[str] = None,
+        stale_minutes: Optional[int] = None,
+    ) -> dict:
+        with self._lock:
+            jobs = [dict(job) for job in self._jobs.values()]
+        cutoff = datetime.utcnow() - timedelta(minutes=stale_minutes) if stale_minutes is not None else None
+        items = []
+        for job in jobs:
+            driver, vehicle = reference_cache.driver(job["driver_id"]), reference_cache.vehicle(job["vehicle_id"])
+            if (
+                (status and job["status"] != status)
+                or (priority and job["priority"] != priority)
+                # as on /jobs: either the assigned driver or the vehicle is at the depot
+                or (depot and not ((driver and driver.depot == depot) or (vehicle and vehicle.depot == depot)))
+                or (cutoff and job["last_update_at"] >= cutoff)
+            ):
+                continue
+            job["depot"] = reference_cache.job_depot(job["driver_id"], job["vehicle_id"])
+            job["driver"] = {"id": driver.id, "name": driver.name, "depot": driver.depot, "status": driver.status} if driver else None
+            job["vehicle"] = {"id": vehicle.id, "registration": vehicle.registration, "depot": vehicle.depot, "status": vehicle.status} if vehicle else None
+            items.append(job)
+        items.sort(key=lambda job: job["last_update_at"], reverse=True)
+        return {
+            "items": items,
+            "total": len(items),
+            "by_status": dict(Counter(job["status"] for job in items)),
+            "by_priority": dict(Counter(job["priority"] for job in items)),
+            "reconciled_at": self.reconciled_at.isoformat() if self.reconciled_at else None,
+        }
+
+
+board = JobBoard()
+hub.subscribe(board.apply)
+
+metrics.Gauge("ops_board_jobs", "Open jobs held by the in-memory job board.", lambda: board.checksum()[0])
@@ -0,0 +1,53 @@
+from __future__ import annotations
+from datetime import date, datetime
+from typing import Any, Optional
+
+from app.config import settings
+from app.models import Job, Driver, Vehicle
+from app.services.reference_cache import reference_cache
+
+DRIVER_FIELDS = ("id", "name", "staff_id", "depot", "region", "status", "hours_today", "hours_week")
+VEHICLE_FIELDS = ("id", "registration", "fleet_id", "vehicle_class", "depot", "region", "status", "next_service_date", "faults_open")
+
+
+def _driver_item(driver: Driver) -> dict[str, Any]:
+    item = {f: getattr(driver, f) for f in DRIVER_FIELDS}
+    item["hours_left_today"] = settings.driver_hours_day_limit - driver.hours_today
+    item["hours_left_week"] = settings.driver_hours_week_limit - driver.hours_week
+    return item
+
+
+def _vehicle_item(vehicle: Vehicle, today: date) -> dict[str, Any]:
+    item = {f: getattr(vehicle, f) for f in VEHICLE_FIELDS}
+    item["days_to_service"] = (vehicle.next_service_date - today).days if vehicle.next_service_date else None
+    return item
+
+
+def find_candidates(
+    job: Job,
+    *,
+    depot: Optional[str] = None,
+    region: Optional[str] = None,
+    vehicle_class: Optional[str] = None,
+    limit: int = 10,
+) -> dict[str, Any]:
+    # Served entirely from the reference cache's availability index: eligible
+    # ids are a set intersection, ranked on precomputed dispatch_rank() tuples
+    # under the cache lock, and only the top `limit` rows are materialised.
+    if depot is None and region is None:
+        depot = reference_cache.job_depot(job.driver_id, job.vehicle_id)
+    today = datetime.utcnow().date()
+
+    driver_ids = reference_cache.driver_ids(depot=depot, region=region, available=True)
+    drivers = reference_cache.best("driver", driver_ids, limit)
+
+    # only vehicles whose next service is still ahead
+    vehicle_ids = reference_cache.vehicle_ids(depot=depot, region=region, vehicle_class=vehicle_class, available=True)
+    vehicles = reference_cache.best("vehicle", vehicle_ids, limit, keep=lambda rank: rank.serviced_after(today))
+
+    return {
+        "job_id": job.id,
+        "criteria": {"depot": depot, "region": region, "vehicle_class": vehicle_class},
+        "drivers": [_driver_item(d) for d in drivers if d is not None],
+        "vehicles": [_vehicle_item(v, today) for v in vehicles if v is not None],
+    }
@@ -0,0 +1,245 @@
+from __future__ import annotations
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import and_, case, or_, text
+from sqlmodel import Session, select, func, update
+
+from app.config import settings
+from app.db import get_engine
+from app.models import Driver, Vehicle, Alert
+from app.services import notify
+from app.services.alerts import raise_alerts, transition_alerts
+from app.services.audit import write_audit_batch
+from app.services.dashboard import counters
+from app.services.escalation import escalation_loop
+from app.services.reference_cache import reference_cache
+from app.services.scheduler import DeadlineLoop, TickResult
+from app.services.versioning import bump
+
+# The predicates are spelled exactly like the partial indexes from migrations
+# 0006 and 0011 so each statement reads only its candidate rows, never the
+# whole table; the thresholds themselves are settings and stay bound parameters.
+DRIVER_OK = text("drivers.compliance_state = 'ok'")
+# only blocks the sweep raised itself are cleared; manual or other-reason blocks stay
+DRIVER_BLOCKED = text("drivers.compliance_state = 'blocked' AND drivers.blocked_by = 'sweep'")
+VEHICLE_OK = text("vehicles.compliance_state = 'ok'")
+VEHICLE_BLOCKED = text("vehicles.compliance_state = 'blocked' AND vehicles.blocked_by = 'sweep'")
+VEHICLE_AVAILABLE = text("vehicles.status = 'available'")
+VEHICLE_DUE_SERVICE = text("vehicles.status = 'due_service'")
+LOCK_KEY = 0x0C0A5E04
+DRIVER_ALERTS = ("driver_over_hours",)
+VEHICLE_ALERTS = ("vehicle_due_service", "vehicle_due_service_assigned")
+
+
+def driver_over_hours():
+    return or_(
+        Driver.hours_today >= settings.driver_hours_day_limit,
+        Driver.hours_week >= settings.driver_hours_week_limit,
+    )
+
+
+def service_due(today: date):
+    return Vehicle.next_service_date <= today
+
+
+def vehicle_blocked(today: date):
+    return or_(service_due(today), Vehicle.faults_open >= settings.vehicle_faults_block_at)
+
+
+def local_today(now: datetime) -> tuple[datetime, date]:
+    # now() comes back naive on SQLite; it is UTC there as well
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    local = now.astimezone(ZoneInfo(settings.ops_timezone))
+    return local, local.date()
+
+
+def _set(session: Session, model, where: tuple, values: dict, returning: tuple) -> list:
+    stmt = (
+        update(model)
+        .where(*where)
+        .values(**values, **bump(model))
+        .returning(*returning)
+        .execution_options(synchronize_session=False)
+    )
+    return list(session.exec(stmt).all())
+
+
+class ComplianceSweep:
+    # Recomputes driver hours and vehicle service compliance with set-based
+    # UPDATEs. Every statement only touches rows whose derived value actually
+    # changes and returns them, so alerts, audit, cache and realtime updates
+    # are driven by the diff alone. hours_today/hours_week roll over at the
+    # ops-timezone day and Monday week boundaries, one statement each.
+
+    def _rollover(self, session: Session, today: date) -> tuple[list, list]:
+        week_start = today - timedelta(days=today.weekday())
+        # a NULL date means "never stamped" rather than stale: stamp it without zeroing
+        day = _set(
+            session, Driver,
+            (or_(Driver.hours_today_date.is_(None), Driver.hours_today_date < today),),
+            {"hours_today": case((Driver.hours_today_date.is_(None), Driver.hours_today), else_=0), "hours_today_date": today},
+            (Driver.id,),
+        )
+        week = _set(
+            session, Driver,
+            (or_(Driver.hours_week_start.is_(None), Driver.hours_week_start < week_start),),
+            {"hours_week": case((Driver.hours_week_start.is_(None), Driver.hours_week), else_=0), "hours_week_start": week_start},
+            (Driver.id,),
+        )
+        return [r[0] for r in day], [r[0] for r in week]
+
+    def _drivers(self, session: Session, now: datetime) -> tuple[list, list]:
+        returning = (Driver.id, Driver.name, Driver.status, Driver.depot, Driver.hours_today, Driver.hours_week)
+        blocked = _set(session, Driver, (DRIVER_OK, driver_over_hours()), {"compliance_state": "blocked", "blocked_by": "sweep", "last_update_at": now}, returning)
+        cleared = _set(session, Driver, (DRIVER_BLOCKED, ~driver_over_hours()), {"compliance_state": "ok", "blocked_by": None, "last_update_at": now}, returning)
+        return blocked, cleared
+
+    def _vehicles(self, session: Session, now: datetime, today: date) -> tuple[list, list]:
+        returning = (Vehicle.id, Vehicle.registration, Vehicle.status, Vehicle.next_service_date, Vehicle.faults_open)
+        blocked = _set(session, Vehicle, (VEHICLE_OK, vehicle_blocked(today)), {"compliance_state": "blocked", "blocked_by": "sweep", "last_update_at": now}, returning)
+        # a NULL next_service_date never makes a vehicle due
+        not_blocked = and_(or_(Vehicle.next_service_date.is_(None), ~service_due(today)), Vehicle.faults_open < settings.vehicle_faults_block_at)
+        cleared = _set(session, Vehicle, (VEHICLE_BLOCKED, not_blocked), {"compliance_state": "ok", "blocked_by": None, "last_update_at": now}, returning)
+        return blocked, cleared
+
+    def _vehicle_status(self, session: Session, now: datetime, today: date) -> tuple[list, list]:
+        # only the available <-> due_service pair is derived; in_use and
+        # out_of_service belong to dispatch and the workshop
+        returning = (Vehicle.id, Vehicle.depot)
+        due = _set(session, Vehicle, (VEHICLE_AVAILABLE, service_due(today)), {"status": "due_service", "last_update_at": now}, returning)
+        serviced = _set(
+            session, Vehicle,
+            (VEHICLE_DUE_SERVICE, or_(Vehicle.next_service_date.is_(None), ~service_due(today))),
+            {"status": "available", "last_update_at": now}, returning,
+        )
+        return due, serviced
+
+    @staticmethod
+    def _alerts(drivers: list, vehicles: list, now: datetime) -> list[dict]:
+        due_by = now + timedelta(minutes=settings.alert_ack_minutes)
+        alerts = [
+            {
+                "id": uuid.uuid4(),
+                "severity": "high" if r.status == "on_job" else "medium",
+                "alert_type": "driver_over_hours",
+                "entity_type": "driver",
+                "entity_id": r.id,
+                "description": f"{r.name} is over hours ({r.hours_today}h today, {r.hours_week}h this week)",
+                "status": "open",
+                "created_at": now,
+                "due_by": due_by,
+            }
+            for r in drivers
+        ]
+        # a vehicle out on a job when it becomes due needs someone to bring it back
+        alerts += [
+            {
+                "id": uuid.uuid4(),
+                "severity": "high" if r.status == "in_use" else "medium",
+                "alert_type": "vehicle_due_service_assigned" if r.status == "in_use" else "vehicle_due_service",
+                "entity_type": "vehicle",
+                "entity_id": r.id,
+                "description": f"{r.registration} is blocked (service due {r.next_service_date}, {r.faults_open} open faults)",
+                "status": "open",
+                "created_at": now,
+                "due_by": due_by,
+            }
+            for r in vehicles
+        ]
+        return alerts
+
+    def tick(self) -> TickResult:
+        with Session(get_engine()) as session:
+            now = session.exec(select(func.now())).one()
+            local_now, today = local_today(now)
+
+            day_ids, week_ids = self._rollover(session, today)
+            drivers_blocked, drivers_cleared = self._drivers(session, now)
+            vehicles_blocked, vehicles_cleared = self._vehicles(session, now, today)
+            went_due, serviced = self._vehicle_status(session, now, today)
+
+            raised = raise_alerts(session, self._alerts(drivers_blocked, vehicles_blocked, now), now)
+            # compliance restored: resolve what the sweep raised for those rows
+            resolved = []
+            for entity_type, alert_types, rows in (
+                ("driver", DRIVER_ALERTS, drivers_cleared),
+                ("vehicle", VEHICLE_ALERTS, vehicles_cleared),
+            ):
+                if rows:
+                    resolved += transition_alerts(
+                        session,
+                        to_status="resolved",
+                        from_statuses=("open", "acknowledged"),
+                        where=(
+                            Alert.entity_type == entity_type,
+                            Alert.entity_id.in_([r.id for r in rows]),
+                            Alert.alert_type.in_(alert_types),
+                        ),
+                    )
+
+            driver_ids = list(dict.fromkeys(r.id for r in [*drivers_blocked, *drivers_cleared]))
+            hours_ids = list(dict.fromkeys([*day_ids, *week_ids]))
+            vehicle_ids = list(dict.fromkeys(r.id for r in [*vehicles_blocked, *vehicles_cleared, *went_due, *serviced]))
+            touched = list(dict.fromkeys([*driver_ids, *hours_ids]))
+            if touched:
+                notify.publish(session, "driver", touched)
+            if vehicle_ids:
+                notify.publish(session, "vehicle", vehicle_ids)
+            session.commit()
+
+            for r in went_due:
+                counters.vehicle_changed(("available", r.depot), ("due_service", r.depot))
+            for r in serviced:
+                counters.vehicle_changed(("due_service", r.depot), ("available", r.depot))
+            for r in raised:
+                if r.inserted:
+                    counters.alert_changed(None, ("open", r.severity))
+            for r in resolved:
+                counters.alert_changed((r.old_status, r.severity), ("resolved", r.severity))
+            if touched:
+                reference_cache.reload_drivers(touched)
+            if vehicle_ids:
+                reference_cache.reload_vehicles(vehicle_ids)
+
+            for action, entity_type, ids in (
+                ("driver.compliance_blocked", "driver", [r.id for r in drivers_blocked]),
+                ("driver.compliance_cleared", "driver", [r.id for r in drivers_cleared]),
+                ("vehicle.compliance_blocked", "vehicle", [r.id for r in vehicles_blocked]),
+                ("vehicle.compliance_cleared", "vehicle", [r.id for r in vehicles_cleared]),
+                ("vehicle.due_service", "vehicle", [r.id for r in went_due]),
+                ("vehicle.serviced", "vehicle", [r.id for r in serviced]),
+            ):
+                if ids:
+                    write_audit_batch(session, actor_user_id=None, entity_type=entity_type, entity_ids=ids, action=action)
+            if hours_ids:
+                write_audit_batch(
+                    session, actor_user_id=None, entity_type="driver", entity_ids=hours_ids, action="driver.hours_rollover",
+                    after={"day": len(day_ids), "week": len(week_ids), "date": today.isoformat()},
+                )
+
+        events = []
+        if driver_ids or vehicle_ids:
+            events.append({
+                "type": "ops.refresh",
+                "payload": {
+                    "entity": "fleet",
+                    "action": "compliance_sweep",
+                    "driver_ids": [str(i) for i in driver_ids],
+                    "vehicle_ids": [str(i) for i in vehicle_ids],
+                    "last_update_at": now.isoformat(),
+                },
+            })
+        if raised:
+            escalation_loop.poke()
+        # the next rollover is at local midnight; service dates also only move then
+        midnight = datetime.combine(today + timedelta(days=1), time(), tzinfo=local_now.tzinfo)
+        return TickResult(next_in=(midnight.astimezone(timezone.utc) - local_now).total_seconds(), events=events)
+
+
+compliance_sweep = ComplianceSweep()
+compliance_loop = DeadlineLoop(
+    "compliance", compliance_sweep.tick, lock_key=LOCK_KEY, max_sleep=settings.compliance_sweep_seconds
+)
@@ -0,0 +1,154 @@
+from __future__ import annotations
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import false
+from sqlmodel import Session, select, func
+from app.models import Job, Driver, Vehicle, Alert
+
+OPEN_JOB_STATUSES = ("unassigned", "assigned", "in_progress", "late")
+# jobs not yet moved to the archive; an equality on the partition key, so Postgres prunes jobs_archive
+LIVE_JOBS = Job.archived == false()
+
+JobKey = Tuple[str, str, Optional[str]]  # status, priority, depot
+FleetKey = Tuple[str, Optional[str]]  # status, depot
+AlertKey = Tuple[str, str]  # status, severity
+KINDS = ("job", "driver", "vehicle", "alert")
+
+
+class DashboardCounters:
+    # Live counts for /dashboard/summary. Write paths apply deltas after they
+    # commit; reconcile() periodically replaces everything with GROUP BY counts
+    # so writes from other workers and any drift are corrected. Deltas that
+    # arrive while a reconcile runs are journalled; those applied after their
+    # kind's SELECT started are replayed onto the new counts, since that
+    # SELECT most likely did not see their commit.
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[str, Counter] = {kind: Counter() for kind in KINDS}
+        self._seq = 0  # deltas applied so far
+        self._journal: Optional[list[tuple[int, str, tuple, tuple]]] = None  # (seq, kind, before, after) during reconcile()
+        self.loaded = False
+        self.reconciled_at: Optional[datetime] = None
+
+    def _mark(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def reconcile(self, session: Session) -> None:
+        with self._lock:
+            self._journal = []
+        try:
+            marks = {"job": self._mark()}
+            jobs = session.exec(
+                select(Job.status, Job.priority, func.coalesce(Driver.depot, Vehicle.depot), func.count())
+                .select_from(Job)
+                .outerjoin(Driver, Job.driver_id == Driver.id)
+                .outerjoin(Vehicle, Job.vehicle_id == Vehicle.id)
+                .where(LIVE_JOBS)
+                .group_by(Job.status, Job.priority, func.coalesce(Driver.depot, Vehicle.depot))
+            ).all()
+            marks["driver"] = self._mark()
+            drivers = session.exec(select(Driver.status, Driver.depot, func.count()).group_by(Driver.status, Driver.depot)).all()
+            marks["vehicle"] = self._mark()
+            vehicles = session.exec(select(Vehicle.status, Vehicle.depot, func.count()).group_by(Vehicle.status, Vehicle.depot)).all()
+            marks["alert"] = self._mark()
+            alerts = session.exec(select(Alert.status, Alert.severity, func.count()).group_by(Alert.status, Alert.severity)).all()
+            with self._lock:
+                counters = {
+                    "job": Counter({(s, p, d): int(n) for s, p, d, n in jobs}),
+                    "driver": Counter({(s, d): int(n) for s, d, n in drivers}),
+                    "vehicle": Counter({(s, d): int(n) for s, d, n in vehicles}),
+                    "alert": Counter({(s, sev): int(n) for s, sev, n in alerts}),
+                }
+                for seq, kind, before, after in self._journal:
+                    if seq > marks[kind]:
+                        self._move(counters[kind], before, after)
+                self._counters = counters
+                self.loaded = True
+                self.reconciled_at = datetime.utcnow()
+        finally:
+            with self._lock:
+                self._journal = None
+
+    @staticmethod
+    def _move(counter: Counter, before, after) -> None:
+        if before == after:
+            return
+        if before is not None:
+            counter[before] -= 1
+            if counter[before] <= 0:
+                del counter[before]
+        if after is not None:
+            counter[after] += 1
+
+    def _changed(self, kind: str, before, after) -> None:
+        with self._lock:
+            self._move(self._counters[kind], before, after)
+            self._seq += 1
+            if self._journal is not None:
+                self._journal.append((self._seq, kind, before, after))
+
+    def job_changed(self, before: Optional[JobKey], after: Optional[JobKey]) -> None:
+        self._changed("job", before, after)
+
+    def driver_changed(self, before: Optional[FleetKey], after: Optional[FleetKey]) -> None:
+        self._changed("driver", before, after)
+
+    def vehicle_changed(self, before: Optional[FleetKey], after: Optional[FleetKey]) -> None:
+        self._changed("vehicle", before, after)
+
+    def alert_changed(self, before: Optional[AlertKey], after: Optional[AlertKey]) -> None:
+        self._changed("alert", before, after)
+
+    def summary(self) -> dict:
+        with self._lock:
+            jobs, drivers = list(self._counters["job"].items()), list(self._counters["driver"].items())
+            vehicles, alerts = list(self._counters["vehicle"].items()), list(self._counters["alert"].items())
+
+        def rollup(items, index, where=None) -> dict:
+            out: Counter = Counter()
+            for key, n in items:
+                if where is None or where(key):
+                    out[key[index] if key[index] is not None else "unknown"] += n
+            return dict(out)
+
+        def is_open(key) -> bool:
+            return key[0] in OPEN_JOB_STATUSES
+
+        def open_alert(key) -> bool:
+            return key[0] == "open"
+
+        return {
+            "jobs": {
+                "total": sum(n for _, n in jobs),
+                "open": sum(n for k, n in jobs if is_open(k)),
+                "by_status": rollup(jobs, 0),
+                "by_priority": rollup(jobs, 1),
+                "by_depot": rollup(jobs, 2),
+                "open_by_priority": rollup(jobs, 1, is_open),
+                "open_by_depot": rollup(jobs, 2, is_open),
+            },
+            "drivers": {
+                "total": sum(n for _, n in drivers),
+                "by_status": rollup(drivers, 0),
+                "by_depot": rollup(drivers, 1),
+            },
+            "vehicles": {
+                "total": sum(n for _, n in vehicles),
+                "by_status": rollup(vehicles, 0),
+                "by_depot": rollup(vehicles, 1),
+            },
+            "alerts": {
+                "open": sum(n for k, n in alerts if open_alert(k)),
+                "open_by_severity": rollup(alerts, 1, open_alert),
+                "by_status": rollup(alerts, 0),
+            },
+            "reconciled_at": self.reconciled_at.isoformat() if self.reconciled_at else None,
+        }
+
+
+counters = DashboardCounters()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+import json
+import logging
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import case, null, text
+from sqlmodel import Session, select, func, update
+
+from app.config import settings
+from app.db import get_engine
+from app.models import Alert
+from app.services.audit import write_audit_batch
+from app.services.dashboard import counters
+from app.services.scheduler import DeadlineLoop, TickResult
+
+logger = logging.getLogger("app.escalation")
+
+# Same predicate as ix_alerts_open_due (migration 0003), written literally so
+# the partial index is usable however parameters are bound.
+OPEN_DUE_ALERTS = text("alerts.status = 'open' AND alerts.due_by IS NOT NULL")
+BATCH_SIZE = 500
+LOCK_KEY = 0x0C0A5E03
+SEVERITIES = ("low", "medium", "high", "critical")
+
+
+@dataclass(frozen=True)
+class EscalationRule:
+    severity: str
+    owner_user_id: Optional[uuid.UUID] = None  # None keeps the current owner
+    ack_minutes: int = 30
+
+
+DEFAULT_NEXT_SEVERITY = {"low": "medium", "medium": "high", "high": "critical", "critical": "critical"}
+
+
+def default_rules() -> dict[str, EscalationRule]:
+    return {s: EscalationRule(n, ack_minutes=settings.alert_ack_minutes) for s, n in DEFAULT_NEXT_SEVERITY.items()}
+
+
+def load_rules(raw: str) -> dict[str, EscalationRule]:
+    # rules never lower the severity, so every chain ends at a rule that keeps it
+    rules = default_rules()
+    for severity, spec in (json.loads(raw) if raw else {}).items():
+        target = spec.get("severity", severity)
+        if severity not in SEVERITIES or target not in SEVERITIES or SEVERITIES.index(target) < SEVERITIES.index(severity):
+            raise ValueError(f"invalid escalation rule for {severity!r}")
+        owner = spec.get("owner_user_id")
+        rules[severity] = EscalationRule(
+            severity=spec.get("severity", rules[severity].severity),
+            owner_user_id=uuid.UUID(owner) if owner else None,
+            ack_minutes=int(spec.get("ack_minutes", settings.alert_ack_minutes)),
+        )
+    return rules
+
+
+class AlertEscalator:
+    # Open (unacknowledged) alerts past due_by move one step up their rule:
+    # new severity, optionally a new owner, and a fresh due_by, so an alert
+    # nobody picks up keeps escalating on every ack window until it reaches a
+    # rule that keeps its severity. That last step clears due_by. The queue is
+    # the partial index on open alerts' due_by, so a restart needs no rebuild.
+
+    def __init__(self, rules: dict[str, EscalationRule]) -> None:
+        self.use(rules)
+
+    def use(self, rules: dict[str, EscalationRule]) -> None:
+        self.rules = rules
+        self._next_severity = {s: r.severity for s, r in rules.items()}
+        self._next_owner = {s: r.owner_user_id for s, r in rules.items() if r.owner_user_id is not None}
+
+    def configure(self, raw: str) -> None:
+        # at startup: a bad ALERT_ESCALATION_RULES is logged and the defaults stay
+        try:
+            self.use(load_rules(raw))
+        except (ValueError, TypeError, AttributeError):
+            logger.exception("invalid ALERT_ESCALATION_RULES; using the default escalation rules")
+
+    def _escalate(self, session: Session, now: datetime) -> list:
+        due = (
+            select(Alert.id, Alert.severity.label("old_severity"))
+            .where(OPEN_DUE_ALERTS, Alert.due_by <= now)
+            .order_by(Alert.due_by)
+            .limit(BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+            .cte("due")
+        )
+        stmt = (
+            update(Alert)
+            .where(Alert.id == due.c.id)
+            .values(
+                severity=case(self._next_severity, value=due.c.old_severity, else_=Alert.severity),
+                owner_user_id=(
+                    case(self._next_owner, value=due.c.old_severity, else_=Alert.owner_user_id)
+                    if self._next_owner else Alert.owner_user_id
+                ),
+                due_by=case(
+                    {s: null() if r.severity == s else now + timedelta(minutes=r.ack_minutes) for s, r in self.rules.items()},
+                    value=due.c.old_severity,
+                    else_=now + timedelta(minutes=settings.alert_ack_minutes),
+                ),
+                escalation_level=Alert.escalation_level + 1,
+            )
+            .returning(Alert.id, due.c.old_severity, Alert.severity, Alert.owner_user_id, Alert.escalation_level)
+            .execution_options(synchronize_session=False)
+        )
+        return list(session.exec(stmt).all())
+
+    def tick(self) -> TickResult:
+        escalated = []
+        with Session(get_engine()) as session:
+            now = session.exec(select(func.now())).one()
+            while True:
+                rows = self._escalate(session, now)
+                session.commit()
+                for r in rows:
+                    counters.alert_changed(("open", r.old_severity), ("open", r.severity))
+                escalated += rows
+                if len(rows) < BATCH_SIZE:
+                    break
+            if escalated:
+                transitions = Counter(f"{r.old_severity}->{r.severity}" for r in escalated)
+                write_audit_batch(
+                    session,
+                    actor_user_id=None,
+                    entity_type="alert",
+                    entity_ids=[r.id for r in escalated],
+                    action="alert.escalate",
+                    after={"transitions": dict(transitions)},
+                )
+            next_due = session.exec(select(func.min(Alert.due_by)).where(OPEN_DUE_ALERTS)).one()
+
+        events = []
+        if escalated:
+            events.append({
+                "type": "ops.refresh",
+                "payload": {
+                    "entity": "alert",
+                    "action": "escalated",
+                    "ids": [str(r.id) for r in escalated],
+                    "last_update_at": now.isoformat(),
+                },
+            })
+        return TickResult(next_in=(next_due - now).total_seconds() if next_due else None, events=events)
+
+
+escalator = AlertEscalator(default_rules())
+escalation_loop = DeadlineLoop(
+    "alert_escalation", escalator.tick, lock_key=LOCK_KEY, max_sleep=settings.alert_escalation_max_sleep_seconds
+)
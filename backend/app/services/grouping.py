@@ -0,0 +1,61 @@
+from __future__ import annotations
+from typing import Any, Optional
+
+from sqlmodel import Session, select, func
+
+from app.models import Job, Driver, Vehicle
+from app.services.views import MODULES, CompiledView
+
+MAX_GROUP_TOP = 50
+_WINDOW_COLUMNS = ("group_key", "group_rank", "group_count")
+
+
+def parse_group_by(module: str, name: Optional[str], view: Optional[CompiledView] = None) -> Optional[str]:
+    # an explicit group_by wins over the saved view's grouping
+    name = name or (view.group_by if view is not None else None)
+    groups = MODULES[module].groups
+    if name is not None and name not in groups:
+        raise ValueError(f"Unsupported group_by: {name} (supported: {', '.join(groups)})")
+    return name
+
+
+def _group_key(module: str, name: str, stmt):
+    if module == "jobs" and name == "depot":
+        # same approximation as the depot filter and dashboard: driver's depot, else vehicle's
+        stmt = stmt.outerjoin(Driver, Job.driver_id == Driver.id).outerjoin(Vehicle, Job.vehicle_id == Vehicle.id)
+        return stmt, func.coalesce(Driver.depot, Vehicle.depot)
+    return stmt, getattr(MODULES[module].model, name)
+
+
+def grouped(session: Session, stmt, *, module: str, group_by: str, order_by: tuple, top: int = 0) -> dict[str, Any]:
+    # Counts per group plus the first `top` rows of each (by order_by), in one
+    # statement: window functions over the filtered rows, then rank <= top.
+    # With top=0 it is a plain GROUP BY count, with no sort of the rows.
+    top = max(0, min(top, MAX_GROUP_TOP))
+    stmt, key = _group_key(module, group_by, stmt)
+    if not top:
+        counts = session.execute(
+            stmt.with_only_columns(key.label("group_key"), func.count().label("group_count"))
+            .group_by(key)
+            .order_by(func.count().desc(), key)
+        ).all()
+        groups = [{"key": k, "count": int(n), "items": []} for k, n in counts]
+        return {"group_by": group_by, "groups": groups, "total": sum(g["count"] for g in groups)}
+    ranked = stmt.add_columns(
+        key.label("group_key"),
+        func.row_number().over(partition_by=key, order_by=order_by).label("group_rank"),
+        func.count().over(partition_by=key).label("group_count"),
+    ).subquery()
+    rows = session.execute(
+        select(ranked)
+        .where(ranked.c.group_rank <= top)
+        .order_by(ranked.c.group_count.desc(), ranked.c.group_key, ranked.c.group_rank)
+    ).all()
+
+    groups: list[dict[str, Any]] = []
+    for row in rows:
+        data = dict(row._mapping)
+        if data["group_rank"] == 1:
+            groups.append({"key": data["group_key"], "count": int(data["group_count"]), "items": []})
+        groups[-1]["items"].append({k: v for k, v in data.items() if k not in _WINDOW_COLUMNS})
+    return {"group_by": group_by, "groups": groups, "total": sum(g["count"] for g in groups)}
@@ -0,0 +1,148 @@
+from __future__ import annotations
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import bindparam, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, delete
+
+from app.config import settings
+from app.db import get_engine
+from app.models import IdempotencyKey
+
+# Idempotency-Key support for retried POSTs. The first request with a key
+# reserves it (a row with no response yet), runs, and stores its response;
+# a retry with the same key gets that response back without the work being
+# repeated. Completed responses are also kept in a process-local LRU so hot
+# retries skip the database entirely. Rows expire after IDEMPOTENCY_TTL_HOURS.
+
+PURGE_BATCH = 1000
+
+
+class KeyInProgress(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: bytes
+    expires_at: datetime
+
+
+def request_hash(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+class IdempotencyStore:
+    def __init__(self, size: int) -> None:
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[tuple[str, str], StoredResponse] = OrderedDict()
+        self._size = size
+
+    def _cached(self, scope: str, key: str, now: datetime) -> Optional[StoredResponse]:
+        with self._lock:
+            stored = self._cache.get((scope, key))
+            if stored is None:
+                return None
+            if stored.expires_at <= now:
+                del self._cache[(scope, key)]
+                return None
+            self._cache.move_to_end((scope, key))
+            return stored
+
+    def _remember(self, scope: str, key: str, stored: StoredResponse) -> None:
+        with self._lock:
+            self._cache[(scope, key)] = stored
+            while len(self._cache) > self._size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _checked(stored: StoredResponse, digest: str) -> StoredResponse:
+        if stored.request_hash != digest:
+            raise ValueError("Idempotency-Key was already used with a different request")
+        return stored
+
+    def begin(self, session: Session, scope: str, key: str, digest: str) -> Optional[StoredResponse]:
+        # The stored response for a completed key, or None once this request holds
+        # the reservation. Raises KeyInProgress while another request holds it and
+        # ValueError when the key is reused for a different payload.
+        now = datetime.utcnow()
+        stored = self._cached(scope, key, now)
+        if stored is not None:
+            return self._checked(stored, digest)
+
+        row = session.get(IdempotencyKey, (scope, key))
+        if row is not None:
+            if _naive_utc(row.expires_at) <= now or (
+                row.status_code is None and _naive_utc(row.created_at) <= now - timedelta(seconds=settings.idempotency_lock_seconds)
+            ):
+                # expired, or abandoned by a request that never finished: start over
+                session.delete(row)
+                session.commit()
+            elif row.status_code is None:
+                raise KeyInProgress("A request with this Idempotency-Key is still in progress")
+            else:
+                stored = StoredResponse(row.request_hash, row.status_code, row.response_body.encode(), _naive_utc(row.expires_at))
+                self._remember(scope, key, stored)
+                return self._checked(stored, digest)
+
+        session.add(IdempotencyKey(
+            scope=scope,
+            key=key,
+            request_hash=digest,
+            created_at=now,
+            expires_at=now + timedelta(hours=settings.idempotency_ttl_hours),
+        ))
+        try:
+            session.commit()
+        except IntegrityError:
+            # a concurrent first request won the insert
+            session.rollback()
+            raise KeyInProgress("A request with this Idempotency-Key is still in progress")
+        return None
+
+    def complete(self, session: Session, scope: str, key: str, status_code: int, body: bytes) -> None:
+        row = session.get(IdempotencyKey, (scope, key))
+        if row is None:
+            return
+        row.status_code = status_code
+        row.response_body = body.decode()
+        session.add(row)
+        session.commit()
+        self._remember(scope, key, StoredResponse(row.request_hash, status_code, body, _naive_utc(row.expires_at)))
+
+    def abandon(self, session: Session, scope: str, key: str) -> None:
+        # the request failed in a way a retry may fix, so free the key for it
+        session.rollback()
+        session.exec(delete(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key))
+        session.commit()
+
+
+def purge_expired() -> None:
+    # periodic TTL cleanup in small batches, so it never holds long locks
+    expired = (
+        select(IdempotencyKey.scope, IdempotencyKey.key)
+        .where(IdempotencyKey.expires_at < bindparam("now"))
+        .limit(PURGE_BATCH)
+    )
+    stmt = delete(IdempotencyKey).where(tuple_(IdempotencyKey.scope, IdempotencyKey.key).in_(expired))
+    with Session(get_engine()) as session:
+        while True:
+            deleted = session.exec(stmt, params={"now": datetime.utcnow()}).rowcount
+            session.commit()
+            if deleted < PURGE_BATCH:
+                return
+
+
+idempotency = IdempotencyStore(settings.idempotency_cache_size)
@@ -0,0 +1,287 @@
+from __future__ import annotations
+import asyncio
+import logging
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import bindparam, update
+from sqlmodel import Session, select
+
+from app import metrics
+from app.config import settings
+from app.db import get_engine
+from app.models import Job, Driver, Vehicle
+from app.readiness import readiness
+from app.realtime import hub
+from app.schemas import IngestEvent
+from app.services import notify
+from app.services.audit import write_audit_batch
+from app.services.dashboard import counters, OPEN_JOB_STATUSES
+from app.services.jobs import TERMINAL_JOB_STATUSES, release_job_resources, apply_released
+from app.services.reference_cache import reference_cache
+from app.services.sla import sla_loop
+
+logger = logging.getLogger("app.ingest")
+
+# Device status and heartbeat events are validated on receipt and parked in a
+# bounded in-memory buffer keyed by entity, so a chatty device costs one slot
+# however often it reports. A background flusher drains the buffer every
+# INGEST_FLUSH_MS and applies it with one executemany UPDATE per entity type,
+# then broadcasts a single ingest.batch message. A full buffer rejects new
+# entities (429 + Retry-After) until the next flush makes room. A failed flush
+# is requeued up to INGEST_MAX_ATTEMPTS times and then dropped and logged, so
+# one poison batch cannot hold the buffer full forever.
+
+STATUSES = {
+    "job": (*OPEN_JOB_STATUSES, "unassigned", *TERMINAL_JOB_STATUSES),
+    "driver": ("on_duty", "on_job", "idle", "off_duty"),
+    "vehicle": ("available", "in_use", "due_service", "out_of_service"),
+}
+MODELS = {"job": Job, "driver": Driver, "vehicle": Vehicle}
+# jobs first: a finished job releases its driver/vehicle before their own events apply
+APPLY_ORDER = ("job", "driver", "vehicle")
+
+ingest_events_total = metrics.Counter("ops_ingest_events_total", "Ingested events by outcome.", ("result",))
+ingest_flush_seconds = metrics.Histogram("ops_ingest_flush_seconds", "Time to apply one ingest flush.")
+ingest_flush_size = metrics.Histogram("ops_ingest_flush_size", "Entities applied per ingest flush.", buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+
+
+class BufferFull(Exception):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Ingest buffer is full; retry later")
+        self.retry_after = retry_after
+
+
+def utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def validate_events(raw: list, received_at: datetime) -> tuple[list[IngestEvent], list[dict]]:
+    # each event stands alone: a bad one is reported by index, the rest go through
+    events, rejected = [], []
+    for index, item in enumerate(raw):
+        try:
+            event = IngestEvent.model_validate(item)
+        except ValidationError as e:
+            rejected.append({"index": index, "error": e.errors(include_url=False, include_context=False)[0]["msg"]})
+            continue
+        if event.status is not None and event.status not in STATUSES[event.entity_type]:
+            rejected.append({"index": index, "error": f"Unknown {event.entity_type} status: {event.status}"})
+            continue
+        events.append(event.model_copy(update={"at": utc(event.at or received_at)}))
+    if rejected:
+        ingest_events_total.inc("invalid", amount=len(rejected))
+    return events, rejected
+
+
+def _merge(older: IngestEvent, newer: IngestEvent) -> IngestEvent:
+    if newer.at < older.at:
+        older, newer = newer, older
+    # a heartbeat after a status change must not drop the status
+    if newer.status is None and older.status is not None:
+        newer = newer.model_copy(update={"status": older.status})
+    return newer
+
+
+class IngestBuffer:
+    def __init__(self, capacity: int) -> None:
+        self._lock = threading.Lock()
+        self._events: dict[tuple[str, uuid.UUID], IngestEvent] = {}
+        self._attempts: dict[tuple[str, uuid.UUID], int] = {}  # failed flushes per requeued entity
+        self.capacity = capacity
+
+    @property
+    def depth(self) -> int:
+        return len(self._events)
+
+    def offer(self, events: list[IngestEvent]) -> None:
+        # all or nothing, so a client retrying after 429 never double-applies part of a batch
+        keys = {(e.entity_type, e.entity_id) for e in events}
+        with self._lock:
+            new = len(keys - self._events.keys())
+            if len(self._events) + new > self.capacity:
+                ingest_events_total.inc("rejected_full", amount=len(events))
+                raise BufferFull(retry_after=max(1, math.ceil(settings.ingest_flush_ms / 1000)))
+            for e in events:
+                key = (e.entity_type, e.entity_id)
+                held = self._events.get(key)
+                self._events[key] = e if held is None else _merge(held, e)
+        ingest_events_total.inc("accepted", amount=len(events))
+        if len(events) > new:
+            ingest_events_total.inc("coalesced", amount=len(events) - new)
+
+    def drain(self) -> dict[tuple[str, uuid.UUID], IngestEvent]:
+        with self._lock:
+            events, self._events = self._events, {}
+        return events
+
+    def requeue(self, events: dict[tuple[str, uuid.UUID], IngestEvent]) -> list[tuple[str, uuid.UUID]]:
+        # after a failed flush; anything newer that arrived meanwhile wins, capacity is not enforced.
+        # Returns the keys dropped for having failed settings.ingest_max_attempts flushes.
+        dropped = []
+        with self._lock:
+            for key, e in events.items():
+                attempts = self._attempts.get(key, 0) + 1
+                held = self._events.get(key)
+                if attempts >= settings.ingest_max_attempts:
+                    self._attempts.pop(key, None)
+                    dropped.append(key)
+                    continue
+                self._attempts[key] = attempts
+                self._events[key] = e if held is None else _merge(e, held)
+        if dropped:
+            ingest_events_total.inc("dropped", amount=len(dropped))
+        return dropped
+
+    def flushed(self, events: dict[tuple[str, uuid.UUID], IngestEvent]) -> None:
+        with self._lock:
+            for key in events:
+                self._attempts.pop(key, None)
+
+
+def _current(session: Session, kind: str, ids: list[uuid.UUID]) -> dict[uuid.UUID, Any]:
+    model = MODELS[kind]
+    columns = [model.id, model.status, model.last_update_at, model.version]
+    if kind == "job":
+        columns += [Job.priority, Job.driver_id, Job.vehicle_id, Job.sla_started_at, Job.archived]
+    else:
+        columns += [model.depot]
+    # row locks for the length of the flush keep the read statuses true until commit
+    rows = session.execute(select(*columns).where(model.id.in_(ids)).with_for_update()).all()
+    return {r.id: r for r in rows}
+
+
+def _apply(session: Session, kind: str, events: list[IngestEvent], now: datetime) -> list[tuple[Any, str, datetime]]:
+    current = _current(session, kind, [e.entity_id for e in events])
+    changes, params, unknown, stale, archived = [], [], 0, 0, 0
+    for e in events:
+        row = current.get(e.entity_id)
+        if row is None:
+            unknown += 1
+            continue
+        # archived jobs are history, counted in job_daily_rollups; devices cannot reopen them
+        if kind == "job" and row.archived:
+            archived += 1
+            continue
+        # device clocks and retries deliver out of order: never move a row back in time
+        if e.at <= utc(row.last_update_at):
+            stale += 1
+            continue
+        status = e.status or row.status
+        params.append({"b_id": row.id, "b_status": status, "b_at": e.at})
+        changes.append((row, status, e.at))
+    if unknown:
+        ingest_events_total.inc("unknown", amount=unknown)
+    if stale:
+        ingest_events_total.inc("stale", amount=stale)
+    if archived:
+        ingest_events_total.inc("archived", amount=archived)
+    if not params:
+        return []
+    table = MODELS[kind].__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(status=bindparam("b_status"), last_update_at=bindparam("b_at"), version=table.c.version + 1)
+    )
+    session.connection().execute(stmt, params)
+    notify.publish(session, kind, [row.id for row, _, _ in changes])
+    return changes
+
+
+def apply_batch(events: dict[tuple[str, uuid.UUID], IngestEvent]) -> dict[str, list]:
+    # one transaction per flush; returns the applied changes per kind for the broadcast
+    by_kind: dict[str, list[IngestEvent]] = {k: [] for k in APPLY_ORDER}
+    for (kind, _), e in events.items():
+        by_kind[kind].append(e)
+    now = datetime.utcnow()
+    applied: dict[str, list] = {}
+    released: list = []
+    with Session(get_engine()) as session:
+        for kind in APPLY_ORDER:
+            if by_kind[kind]:
+                applied[kind] = _apply(session, kind, by_kind[kind], now)
+        for row, status, _ in applied.get("job", []):
+            if status in TERMINAL_JOB_STATUSES and row.status not in TERMINAL_JOB_STATUSES:
+                released += release_job_resources(session, row, now)
+        session.commit()
+
+        for row, status, at in applied.get("job", []):
+            depot = reference_cache.job_depot(row.driver_id, row.vehicle_id)
+            counters.job_changed((row.status, row.priority, depot), (status, row.priority, depot))
+        for kind, changed, update_cache in (
+            ("driver", counters.driver_changed, reference_cache.update_driver),
+            ("vehicle", counters.vehicle_changed, reference_cache.update_vehicle),
+        ):
+            for row, status, at in applied.get(kind, []):
+                changed((row.status, row.depot), (status, row.depot))
+                update_cache(row.id, status=status, last_update_at=at, version=row.version + 1)
+        apply_released(released, now)
+
+        for kind, rows in applied.items():
+            ids = [row.id for row, status, _ in rows if status != row.status]
+            if ids:
+                write_audit_batch(session, actor_user_id=None, entity_type=kind, entity_ids=ids, action=f"{kind}.status_ingest", source="device")
+
+    if any(row.sla_started_at is not None and status != row.status for row, status, _ in applied.get("job", [])):
+        sla_loop.poke()
+    applied["released"] = released
+    return applied
+
+
+def batch_event(applied: dict[str, list]) -> Optional[dict]:
+    payload: dict[str, list] = {}
+    for kind in APPLY_ORDER:
+        rows = applied.get(kind)
+        if rows:
+            payload[kind] = [{"id": str(row.id), "status": status, "last_update_at": at.isoformat()} for row, status, at in rows]
+    for kind, row in applied.get("released", []):
+        payload.setdefault(kind, []).append({"id": str(row.id), "status": "idle" if kind == "driver" else "available"})
+    if not payload:
+        return None
+    return {"type": "ingest.batch", "payload": payload}
+
+
+class IngestFlusher:
+    def __init__(self, buffer: IngestBuffer) -> None:
+        self.buffer = buffer
+
+    async def flush(self) -> None:
+        events = self.buffer.drain()
+        if not events:
+            return
+        started = time.perf_counter()
+        try:
+            applied = await asyncio.to_thread(apply_batch, events)
+        except Exception:
+            logger.exception("ingest flush of %d entities failed; requeued", len(events))
+            dropped = self.buffer.requeue(events)
+            if dropped:
+                logger.error(
+                    "dropped %d ingest events after %d failed flushes: %s",
+                    len(dropped), settings.ingest_max_attempts, ", ".join(f"{kind}:{entity_id}" for kind, entity_id in dropped[:50]),
+                )
+            return
+        self.buffer.flushed(events)
+        ingest_flush_seconds.observe(time.perf_counter() - started)
+        ingest_flush_size.observe(len(events))
+        message = batch_event(applied)
+        if message is not None:
+            await hub.broadcast_json(message)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.ingest_flush_ms / 1000)
+            if readiness.ready:
+                await self.flush()
+
+
+ingest_buffer = IngestBuffer(settings.ingest_buffer_capacity)
+ingest_flusher = IngestFlusher(ingest_buffer)
+
+metrics.Gauge("ops_ingest_buffer_depth", "Entities waiting in the ingest buffer.", lambda: ingest_buffer.depth)
@@ -1,17 +1,69 @@
 from __future__ import annotations
 import uuid
 from datetime import datetime
-from typing import Optional, Dict, Any, Tuple
+from typing import TYPE_CHECKING, Optional, Dict, Any, Tuple
 
-from sqlmodel import Session, select, func
+from sqlalchemy import text
+from sqlmodel import Session, select, func, update
 from app.models import Job, Driver, Vehicle
+from app.services import notify
 from app.services.audit import write_audit
+from app.services.dashboard import counters, LIVE_JOBS, OPEN_JOB_STATUSES
+from app.services.reference_cache import reference_cache
+from app.services.versioning import VersionConflict, bump, cas_update, check_version, current_row
 
-def list_jobs(
-    session: Session,
+if TYPE_CHECKING:
+    from app.services.views import CompiledView
+
+# the claim queue; both are spelled exactly like ix_jobs_claim_queue (migration 0007)
+UNCLAIMED_JOBS = text("jobs.status = 'unassigned' AND jobs.owner_user_id IS NULL")
+CLAIM_RANK = text("(CASE jobs.priority WHEN 'critical' THEN 0 WHEN 'high' THEN 1 WHEN 'normal' THEN 2 ELSE 3 END)")
+
+# compact relation summaries embedded in job payloads by ?include=
+RELATIONS = {
+    "driver": (Driver, Job.driver_id, ("id", "name", "staff_id", "depot", "region", "status", "compliance_state")),
+    "vehicle": (Vehicle, Job.vehicle_id, ("id", "registration", "fleet_id", "vehicle_class", "depot", "region", "status", "compliance_state")),
+}
+
+def parse_include(raw: Optional[str]) -> tuple[str, ...]:
+    names = tuple(dict.fromkeys(n.strip() for n in (raw or "").split(",") if n.strip()))
+    unknown = [n for n in names if n not in RELATIONS]
+    if unknown:
+        raise ValueError(f"Unknown include: {', '.join(unknown)} (supported: {', '.join(RELATIONS)})")
+    return names
+
+def with_relations(stmt, include: tuple[str, ...]):
+    # one LEFT JOIN per relation on top of the filtered job statement
+    columns = []
+    for name in include:
+        model, _, fields = RELATIONS[name]
+        columns += [getattr(model, f).label(f"{name}__{f}") for f in fields]
+    joined = select(Job, *columns).select_from(Job)
+    for name in include:
+        model, fk, _ = RELATIONS[name]
+        joined = joined.outerjoin(model, fk == model.id)
+    if stmt.whereclause is not None:
+        joined = joined.where(stmt.whereclause)
+    return joined
+
+def embed_relations(row, include: tuple[str, ...]) -> Dict[str, Any]:
+    item = row[0].model_dump()
+    mapping = row._mapping
+    for name in include:
+        fields = RELATIONS[name][2]
+        summary = {f: mapping[f"{name}__{f}"] for f in fields}
+        item[name] = summary if summary["id"] is not None else None
+    return item
+
+def fleet_clause(driver_cond, vehicle_cond, *, cached: bool = True, **index):
+    # id lists from the reference cache instead of a drivers/vehicles subquery per list call;
+    # clauses kept beyond one request (saved view plans) use the subquery form
+    if cached and reference_cache.loaded:
+        return Job.driver_id.in_(reference_cache.driver_ids(**index)) | Job.vehicle_id.in_(reference_cache.vehicle_ids(**index))
+    return Job.driver_id.in_(select(Driver.id).where(driver_cond)) | Job.vehicle_id.in_(select(Vehicle.id).where(vehicle_cond))
+
+def filter_jobs(
     *,
-    page: int,
-    page_size: int,
     q: Optional[str] = None,
     status: Optional[str] = None,
     customer: Optional[str] = None,
@@ -19,8 +71,10 @@ def list_jobs(
     region: Optional[str] = None,
     priority: Optional[str] = None,
     stale_minutes: Optional[int] = None,
-) -> Tuple[list[Job], int]:
-    stmt = select(Job)
+    include_archived: bool = False,
+    view: Optional[CompiledView] = None,
+):
+    stmt = select(Job) if include_archived else select(Job).where(LIVE_JOBS)
     if q:
         like = f"%{q.lower()}%"
         stmt = stmt.where(
@@ -41,21 +95,45 @@ def list_jobs(
 
     # depot/region come from assigned driver or vehicle; this is a simple approximation for Phase 1
     if depot:
-        stmt = stmt.where(
-            Job.driver_id.in_(select(Driver.id).where(Driver.depot == depot))
-            | Job.vehicle_id.in_(select(Vehicle.id).where(Vehicle.depot == depot))
-        )
+        stmt = stmt.where(fleet_clause(Driver.depot == depot, Vehicle.depot == depot, depot=depot))
     if region:
-        stmt = stmt.where(
-            Job.driver_id.in_(select(Driver.id).where(Driver.region == region))
-            | Job.vehicle_id.in_(select(Vehicle.id).where(Vehicle.region == region))
-        )
+        stmt = stmt.where(fleet_clause(Driver.region == region, Vehicle.region == region, region=region))
+
+    if view is not None:
+        stmt = stmt.where(*view.where)
+    return stmt
 
+def list_jobs(
+    session: Session,
+    *,
+    page: int,
+    page_size: int,
+    include: tuple[str, ...] = (),
+    view: Optional[CompiledView] = None,
+    **filters,
+) -> Tuple[list, int]:
+    stmt = filter_jobs(view=view, **filters)
     total = session.exec(select(func.count()).select_from(stmt.subquery())).one()
-    stmt = stmt.order_by(Job.last_update_at.desc()).offset((page - 1) * page_size).limit(page_size)
-    items = list(session.exec(stmt).all())
+    if include:
+        stmt = with_relations(stmt, include)
+    elif view is not None:
+        stmt = view.select_columns(stmt)
+    order_by = view.order_by if view is not None else (Job.last_update_at.desc(),)
+    stmt = stmt.order_by(*order_by).offset((page - 1) * page_size).limit(page_size)
+    if include:
+        items = [embed_relations(row, include) for row in session.exec(stmt).all()]
+        if view is not None:
+            items = view.project_items(items, include)
+    elif view is not None:
+        items = view.fetch(session, stmt)
+    else:
+        items = list(session.exec(stmt).all())
     return items, int(total)
 
+def get_job_with_relations(session: Session, job_id: uuid.UUID, include: tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    row = session.exec(with_relations(select(Job).where(Job.id == job_id), include)).first()
+    return embed_relations(row, include) if row else None
+
 def assign_job(
     session: Session,
     *,
@@ -65,46 +143,66 @@ def assign_job(
     actor_user_id: Optional[uuid.UUID],
     override: bool = False,
     override_reason: Optional[str] = None,
+    version: Optional[int] = None,
+    driver_version: Optional[int] = None,
+    vehicle_version: Optional[int] = None,
 ) -> Job:
+    # The compliance check runs against the versions read here, and the job,
+    # driver and vehicle are then written with compare-and-swap on exactly
+    # those versions: a concurrent assignment or compliance change in between
+    # raises VersionConflict instead of being overwritten.
     job = session.get(Job, job_id)
     if not job:
         raise ValueError("Job not found")
+    check_version("job", job, version)
 
     before = job.model_dump()
+    job_key_before = (job.status, job.priority, reference_cache.job_depot(job.driver_id, job.vehicle_id))
+
+    driver = reference_cache.get_driver(session, driver_id)
+    vehicle = reference_cache.get_vehicle(session, vehicle_id)
+    if driver:
+        check_version("driver", driver, driver_version)
+    if vehicle:
+        check_version("vehicle", vehicle, vehicle_version)
 
     # compliance block rule (Phase 1: simple check)
     if not override:
-        if driver_id:
-            driver = session.get(Driver, driver_id)
-            if driver and driver.compliance_state != "ok":
-                raise PermissionError("Assignment blocked: driver compliance not ok")
-        if vehicle_id:
-            vehicle = session.get(Vehicle, vehicle_id)
-            if vehicle and vehicle.compliance_state != "ok":
-                raise PermissionError("Assignment blocked: vehicle compliance not ok")
-
-    driver = session.get(Driver, driver_id) if driver_id else None
-    vehicle = session.get(Vehicle, vehicle_id) if vehicle_id else None
-
-    job.driver_id = driver_id
-    job.vehicle_id = vehicle_id
-    if job.status == "unassigned" and (driver_id or vehicle_id):
-        job.status = "assigned"
-    job.last_update_at = datetime.utcnow()
-    session.add(job)
+        if driver and driver.compliance_state != "ok":
+            raise PermissionError("Assignment blocked: driver compliance not ok")
+        if vehicle and vehicle.compliance_state != "ok":
+            raise PermissionError("Assignment blocked: vehicle compliance not ok")
 
-    if driver:
-        driver.status = "on_job"
-        driver.last_update_at = datetime.utcnow()
-        session.add(driver)
-    if vehicle:
-        vehicle.status = "in_use"
-        vehicle.last_update_at = datetime.utcnow()
-        session.add(vehicle)
+    now = datetime.utcnow()
+    status = "assigned" if job.status == "unassigned" and (driver_id or vehicle_id) else job.status
+    try:
+        cas_update(session, Job, "job", job.id, job.version, driver_id=driver_id, vehicle_id=vehicle_id, status=status, last_update_at=now)
+        # driver/vehicle rows are updated in place; the cache already holds them
+        if driver:
+            driver_row = cas_update(session, Driver, "driver", driver.id, driver.version, status="on_job", last_update_at=now)
+            notify.publish(session, "driver", [driver.id])
+        if vehicle:
+            vehicle_row = cas_update(session, Vehicle, "vehicle", vehicle.id, vehicle.version, status="in_use", last_update_at=now)
+            notify.publish(session, "vehicle", [vehicle.id])
+    except VersionConflict as e:
+        # our cached copy was the stale one: take the current row before the caller retries
+        if e.entity_type == "driver":
+            reference_cache.reload_drivers([e.row_id])
+        elif e.entity_type == "vehicle":
+            reference_cache.reload_vehicles([e.row_id])
+        raise
 
     session.commit()
     session.refresh(job)
 
+    if driver:
+        counters.driver_changed((driver.status, driver.depot), ("on_job", driver.depot))
+        reference_cache.update_driver(driver.id, status="on_job", last_update_at=now, version=driver_row.version)
+    if vehicle:
+        counters.vehicle_changed((vehicle.status, vehicle.depot), ("in_use", vehicle.depot))
+        reference_cache.update_vehicle(vehicle.id, status="in_use", last_update_at=now, version=vehicle_row.version)
+    counters.job_changed(job_key_before, (job.status, job.priority, reference_cache.job_depot(driver_id, vehicle_id)))
+
     after = job.model_dump()
     action = "job.assign"
     if override:
@@ -121,3 +219,90 @@ def assign_job(
         after=after,
     )
     return job
+
+def set_job_status(session: Session, job: Job, status: str, now: datetime, version: Optional[int] = None) -> None:
+    # compare-and-swap on the version the caller read; the caller commits.
+    # Archived jobs are history: they sit in jobs_archive and job_daily_rollups.
+    if job.archived:
+        raise PermissionError("Job is archived")
+    check_version("job", job, version)
+    cas_update(session, Job, "job", job.id, job.version, status=status, last_update_at=now)
+
+def claim_next_job(
+    session: Session,
+    *,
+    user_id: uuid.UUID,
+    priority: Optional[str] = None,
+    customer: Optional[str] = None,
+) -> Optional[Job]:
+    # Hands the most urgent unclaimed job to user_id. Rows another dispatcher is
+    # claiming right now are skipped rather than waited on, so concurrent claims
+    # never block each other and never return the same job.
+    stmt = select(Job.id).where(UNCLAIMED_JOBS)
+    if priority:
+        stmt = stmt.where(Job.priority == priority)
+    if customer:
+        stmt = stmt.where(Job.customer == customer)
+    nxt = stmt.order_by(CLAIM_RANK, Job.scheduled_at).limit(1).with_for_update(skip_locked=True).cte("next_job")
+    claimed = session.exec(
+        update(Job)
+        .where(Job.id == nxt.c.id)
+        .values(owner_user_id=user_id, last_update_at=datetime.utcnow(), **bump(Job))
+        .returning(Job.id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if claimed is None:
+        session.rollback()
+        return None
+    session.commit()
+    job = current_row(session, Job, claimed[0])
+    write_audit(
+        session,
+        actor_user_id=user_id,
+        entity_type="job",
+        entity_id=job.id,
+        action="job.claim",
+        after={"owner_user_id": str(user_id), "version": job.version},
+    )
+    return job
+
+TERMINAL_JOB_STATUSES = ("completed", "failed", "cancelled")
+
+def release_job_resources(session: Session, job: Job, now: datetime) -> list[tuple[str, Any]]:
+    # When a job finishes, its driver/vehicle return to idle/available unless another
+    # open job still holds them. Runs inside the caller's transaction; pass the result
+    # to apply_released() after commit.
+    released: list[tuple[str, Any]] = []
+    for kind, model, fk, busy, free in (
+        ("driver", Driver, Job.driver_id, "on_job", "idle"),
+        ("vehicle", Vehicle, Job.vehicle_id, "in_use", "available"),
+    ):
+        row_id = getattr(job, fk.key)
+        row = reference_cache.get_driver(session, row_id) if kind == "driver" else reference_cache.get_vehicle(session, row_id)
+        if row is None or row.status != busy:
+            continue
+        still_busy = session.exec(
+            select(Job.id).where(fk == row_id, Job.id != job.id, Job.status.in_(OPEN_JOB_STATUSES)).limit(1)
+        ).first()
+        if still_busy:
+            continue
+        version = session.exec(
+            update(model)
+            .where(model.id == row_id, model.status == busy)
+            .values(status=free, last_update_at=now, **bump(model))
+            .returning(model.version)
+        ).first()
+        if version is None:
+            continue
+        notify.publish(session, kind, [row_id])
+        released.append((kind, row.model_copy(update={"version": version[0]})))
+    return released
+
+def apply_released(released: list[tuple[str, Any]], now: datetime) -> None:
+    for kind, row in released:
+        if kind == "driver":
+            counters.driver_changed((row.status, row.depot), ("idle", row.depot))
+            reference_cache.update_driver(row.id, status="idle", last_update_at=now, version=row.version)
+        else:
+            counters.vehicle_changed((row.status, row.depot), ("available", row.depot))
+            reference_cache.update_vehicle(row.id, status="available", last_update_at=now, version=row.version)
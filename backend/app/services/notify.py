@@ -0,0 +1,82 @@
+from __future__ import annotations
+import json
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlmodel import Session
+
+from app.config import settings
+
+# Cross-worker invalidation over Postgres LISTEN/NOTIFY. Write paths publish
+# inside their transaction, so the notification is only delivered on commit;
+# every worker's listener thread hands the ids to the registered handlers.
+# Notifications from this process are skipped because the write path has
+# already updated its local state. Postgres rejects payloads of 8000 bytes or
+# more, so ids go out in chunks, and past RELOAD_ALL_OVER a single message asks
+# handlers to reload every row of the kind (they are called with None).
+
+CHANNEL = "ops_invalidate"
+INSTANCE_ID = uuid.uuid4().hex
+NOTIFY_CHUNK = 150  # ~39 bytes per id in the JSON list: about 6 KB per payload
+RELOAD_ALL_OVER = 1000
+
+logger = logging.getLogger("app.notify")
+Handler = Callable[[Optional[list[uuid.UUID]]], None]
+_handlers: dict[str, List[Handler]] = defaultdict(list)
+
+
+def subscribe(kind: str, handler: Handler) -> None:
+    _handlers[kind].append(handler)
+
+
+def publish(session: Session, kind: str, ids: Iterable[uuid.UUID]) -> None:
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    ids = [str(i) for i in dict.fromkeys(ids)]
+    if len(ids) > RELOAD_ALL_OVER:
+        messages = [{"origin": INSTANCE_ID, "kind": kind, "all": True}]
+    else:
+        messages = [{"origin": INSTANCE_ID, "kind": kind, "ids": ids[i:i + NOTIFY_CHUNK]} for i in range(0, len(ids), NOTIFY_CHUNK)]
+    for message in messages:
+        session.exec(text("SELECT pg_notify(:channel, :payload)"), params={"channel": CHANNEL, "payload": json.dumps(message)})
+
+
+def dispatch(raw: str) -> None:
+    message = json.loads(raw)
+    if message.get("origin") == INSTANCE_ID:
+        return
+    ids = None if message.get("all") else [uuid.UUID(i) for i in message.get("ids", [])]
+    for handler in _handlers.get(message.get("kind"), []):
+        try:
+            handler(ids)
+        except Exception:
+            logger.exception("invalidation handler for %s failed", message.get("kind"))
+
+
+def _listen(stop: threading.Event) -> None:
+    import psycopg
+
+    url = make_url(settings.database_url).set(drivername="postgresql")
+    conninfo = url.render_as_string(hide_password=False)
+    while not stop.is_set():
+        try:
+            with psycopg.connect(conninfo, autocommit=True) as conn:
+                conn.execute(f"LISTEN {CHANNEL}")
+                while not stop.is_set():
+                    for n in conn.notifies(timeout=1.0):
+                        dispatch(n.payload)
+        except Exception:
+            logger.exception("invalidation listener disconnected; retrying")
+            stop.wait(2.0)
+
+
+def start_listener() -> threading.Event:
+    stop = threading.Event()
+    if make_url(settings.database_url).get_backend_name() == "postgresql":
+        threading.Thread(target=_listen, args=(stop,), name="ops-notify", daemon=True).start()
+    return stop
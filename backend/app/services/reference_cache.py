@@ -0,0 +1,217 @@
+from __future__ import annotations
+import heapq
+import threading
+import uuid
+from collections import defaultdict
+from datetime import date
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Union
+
+from sqlmodel import Session, select
+
+from app.config import settings
+from app.db import get_engine
+from app.models import Driver, Vehicle
+from app.services import notify
+
+
+AVAILABLE_DRIVER_STATUSES = ("on_duty", "idle")
+
+
+def driver_available(driver: Driver) -> bool:
+    return (
+        driver.compliance_state == "ok"
+        and driver.status in AVAILABLE_DRIVER_STATUSES
+        and driver.hours_today < settings.driver_hours_day_limit
+        and driver.hours_week < settings.driver_hours_week_limit
+    )
+
+
+def vehicle_available(vehicle: Vehicle) -> bool:
+    # service dates move with the calendar, so callers still check next_service_date
+    return vehicle.compliance_state == "ok" and vehicle.status == "available"
+
+
+class DriverRank(NamedTuple):
+    # smaller is better: most weekly, then daily, hours left
+    hours_week: float
+    hours_today: float
+    name: str
+
+
+class VehicleRank(NamedTuple):
+    # smaller is better: no open faults, then the latest next service
+    faults_open: int
+    service_order: float  # -ordinal of next_service_date; -inf when none is scheduled
+    registration: str
+
+    def serviced_after(self, day: date) -> bool:
+        return -self.service_order > day.toordinal()
+
+
+def dispatch_rank(kind: str, row) -> Union[DriverRank, VehicleRank]:
+    if kind == "driver":
+        return DriverRank(row.hours_week, row.hours_today, row.name)
+    service = row.next_service_date.toordinal() if row.next_service_date else float("inf")
+    return VehicleRank(row.faults_open, -service, row.registration)
+
+
+class ReferenceCache:
+    # Process-local copy of the drivers and vehicles tables (hundreds to low
+    # thousands of rows) with depot/region indexes. Loaded at startup, updated
+    # by write paths after commit and reloaded by id when another worker
+    # publishes an invalidation. Cached objects are shared: treat as read-only.
+    # The same index tracks who is available for dispatch, so it follows every
+    # status, hours and compliance change that goes through the cache.
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._drivers: dict[uuid.UUID, Driver] = {}
+        self._vehicles: dict[uuid.UUID, Vehicle] = {}
+        self._index: dict[tuple, set[uuid.UUID]] = defaultdict(set)
+        self._ranks: dict[uuid.UUID, Union[DriverRank, VehicleRank]] = {}  # dispatch_rank() of every cached row
+        self.loaded = False
+
+    @staticmethod
+    def _keys(kind: str, row) -> list[tuple]:
+        keys = [(kind, "depot", row.depot), (kind, "region", row.region)]
+        if kind == "driver" and driver_available(row):
+            keys.append((kind, "available", True))
+        if kind == "vehicle":
+            keys.append((kind, "vehicle_class", row.vehicle_class))
+            if vehicle_available(row):
+                keys.append((kind, "available", True))
+        return keys
+
+    def _put(self, table: dict, kind: str, row) -> None:
+        old = table.get(row.id)
+        if old is not None:
+            for key in self._keys(kind, old):
+                self._index[key].discard(row.id)
+        table[row.id] = row
+        self._ranks[row.id] = dispatch_rank(kind, row)
+        for key in self._keys(kind, row):
+            self._index[key].add(row.id)
+
+    def load(self, session: Session) -> None:
+        drivers = [Driver.model_validate(d.model_dump()) for d in session.exec(select(Driver)).all()]
+        vehicles = [Vehicle.model_validate(v.model_dump()) for v in session.exec(select(Vehicle)).all()]
+        with self._lock:
+            self._drivers, self._vehicles, self._index, self._ranks = {}, {}, defaultdict(set), {}
+            for d in drivers:
+                self._put(self._drivers, "driver", d)
+            for v in vehicles:
+                self._put(self._vehicles, "vehicle", v)
+            self.loaded = True
+
+    def put_driver(self, driver: Driver) -> None:
+        copy = Driver.model_validate(driver.model_dump())
+        with self._lock:
+            self._put(self._drivers, "driver", copy)
+
+    def put_vehicle(self, vehicle: Vehicle) -> None:
+        copy = Vehicle.model_validate(vehicle.model_dump())
+        with self._lock:
+            self._put(self._vehicles, "vehicle", copy)
+
+    def update_driver(self, driver_id: uuid.UUID, **changes) -> None:
+        with self._lock:
+            old = self._drivers.get(driver_id)
+            if old is not None:
+                self._put(self._drivers, "driver", Driver.model_validate({**old.model_dump(), **changes}))
+
+    def update_vehicle(self, vehicle_id: uuid.UUID, **changes) -> None:
+        with self._lock:
+            old = self._vehicles.get(vehicle_id)
+            if old is not None:
+                self._put(self._vehicles, "vehicle", Vehicle.model_validate({**old.model_dump(), **changes}))
+
+    def reload_drivers(self, ids: Optional[Iterable[uuid.UUID]]) -> None:
+        # None reloads every driver
+        stmt = select(Driver) if ids is None else select(Driver).where(Driver.id.in_(list(ids)))
+        with Session(get_engine()) as session:
+            for d in session.exec(stmt).all():
+                self.put_driver(d)
+
+    def reload_vehicles(self, ids: Optional[Iterable[uuid.UUID]]) -> None:
+        stmt = select(Vehicle) if ids is None else select(Vehicle).where(Vehicle.id.in_(list(ids)))
+        with Session(get_engine()) as session:
+            for v in session.exec(stmt).all():
+                self.put_vehicle(v)
+
+    def driver(self, driver_id: Optional[uuid.UUID]) -> Optional[Driver]:
+        return self._drivers.get(driver_id) if driver_id else None
+
+    def vehicle(self, vehicle_id: Optional[uuid.UUID]) -> Optional[Vehicle]:
+        return self._vehicles.get(vehicle_id) if vehicle_id else None
+
+    def _load_missing(self, session: Session, model, row_id: uuid.UUID):
+        # a replica row may be stale and would then be served to primary-pinned
+        # clients and the assignment checks, so misses are read on the primary
+        if session.get_bind() is get_engine():
+            return session.get(model, row_id)
+        with Session(get_engine()) as primary:
+            return primary.get(model, row_id)
+
+    def get_driver(self, session: Session, driver_id: Optional[uuid.UUID]) -> Optional[Driver]:
+        # cache first; rows created since the last load are fetched once and kept
+        if not driver_id:
+            return None
+        driver = self._drivers.get(driver_id)
+        if driver is None:
+            driver = self._load_missing(session, Driver, driver_id)
+            if driver is not None:
+                self.put_driver(driver)
+                driver = self._drivers.get(driver_id)
+        return driver
+
+    def get_vehicle(self, session: Session, vehicle_id: Optional[uuid.UUID]) -> Optional[Vehicle]:
+        if not vehicle_id:
+            return None
+        vehicle = self._vehicles.get(vehicle_id)
+        if vehicle is None:
+            vehicle = self._load_missing(session, Vehicle, vehicle_id)
+            if vehicle is not None:
+                self.put_vehicle(vehicle)
+                vehicle = self._vehicles.get(vehicle_id)
+        return vehicle
+
+    def driver_ids(self, *, depot: Optional[str] = None, region: Optional[str] = None, available: Optional[bool] = None) -> list[uuid.UUID]:
+        return self._lookup("driver", depot=depot, region=region, available=available)
+
+    def vehicle_ids(
+        self,
+        *,
+        depot: Optional[str] = None,
+        region: Optional[str] = None,
+        vehicle_class: Optional[str] = None,
+        available: Optional[bool] = None,
+    ) -> list[uuid.UUID]:
+        return self._lookup("vehicle", depot=depot, region=region, vehicle_class=vehicle_class, available=available)
+
+    def _lookup(self, kind: str, **criteria) -> list[uuid.UUID]:
+        with self._lock:
+            sets = [self._index.get((kind, name, value), set()) for name, value in criteria.items() if value is not None]
+            if not sets:
+                return list(self._drivers if kind == "driver" else self._vehicles)
+            return list(set.intersection(*sorted(sets, key=len)))
+
+    def best(self, kind: str, ids: Iterable[uuid.UUID], limit: int, keep: Optional[Callable[[Any], bool]] = None) -> list:
+        # the `limit` best-ranked rows among ids, read under the lock so a reload cannot interleave
+        with self._lock:
+            table = self._drivers if kind == "driver" else self._vehicles
+            eligible = [i for i in ids if i in table and (keep is None or keep(self._ranks[i]))]
+            return [table[i] for i in heapq.nsmallest(limit, eligible, key=self._ranks.__getitem__)]
+
+    def job_depot(self, driver_id: Optional[uuid.UUID], vehicle_id: Optional[uuid.UUID]) -> Optional[str]:
+        # same approximation as the jobs depot filter: the assigned driver's depot, else the vehicle's
+        driver, vehicle = self.driver(driver_id), self.vehicle(vehicle_id)
+        if driver and driver.depot:
+            return driver.depot
+        if vehicle and vehicle.depot:
+            return vehicle.depot
+        return None
+
+
+reference_cache = ReferenceCache()
+notify.subscribe("driver", reference_cache.reload_drivers)
+notify.subscribe("vehicle", reference_cache.reload_vehicles)
@@ -2,6 +2,7 @@ from __future__ import annotations
 import uuid
 from sqlmodel import Session, select
 from app.models import SavedView
+from app.services.views import view_plans
 
 def list_views(session: Session, user_id: uuid.UUID, module: str) -> list[SavedView]:
     stmt = select(SavedView).where(SavedView.user_id == user_id, SavedView.module == module).order_by(SavedView.created_at.desc())
@@ -16,9 +17,11 @@ def upsert_view(session: Session, view: SavedView) -> SavedView:
         existing.column_set_json = view.column_set_json
         existing.sort_json = view.sort_json
         existing.grouping_json = view.grouping_json
+        existing.version += 1
         session.add(existing)
         session.commit()
         session.refresh(existing)
+        view_plans.invalidate(existing.id)
         return existing
     session.add(view)
     session.commit()
@@ -0,0 +1,145 @@
+from __future__ import annotations
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.db import get_engine
+from app.readiness import readiness
+from app.realtime import hub
+
+logger = logging.getLogger("app.scheduler")
+
+
+@dataclass
+class TickResult:
+    next_in: Optional[float] = None  # seconds until the next deadline; None = nothing scheduled
+    events: list[dict] = field(default_factory=list)  # hub messages to broadcast after the tick
+
+
+class Leadership:
+    # Session-level advisory locks for every DeadlineLoop in this process, held
+    # on one dedicated connection outside the app pool, so it takes none of the
+    # admission DB slots. The loops' ticks do use pooled connections; admission
+    # leaves room for those (startup.pooled_background_workers). Losing the
+    # connection loses all the locks, and each loop then competes again on its
+    # next tick.
+
+    def __init__(self) -> None:
+        self._mutex = threading.Lock()
+        self._engine = None
+        self._conn = None
+        self._held: set[int] = set()
+
+    def _connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT 1"))
+                self._conn.commit()
+                return self._conn
+            except Exception:
+                logger.warning("leader connection lost; advisory locks released")
+                self._close()
+        if self._engine is None:
+            self._engine = create_engine(settings.database_url, poolclass=NullPool)
+        self._conn = self._engine.connect()
+        return self._conn
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+        self._held.clear()
+
+    def acquire(self, key: int) -> bool:
+        with self._mutex:
+            conn = self._connection()
+            if key in self._held:
+                return True
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+            conn.commit()
+            if acquired:
+                self._held.add(key)
+            return bool(acquired)
+
+    def release(self, key: int) -> None:
+        with self._mutex:
+            if key not in self._held:
+                return
+            self._held.discard(key)
+            try:
+                self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                self._conn.commit()
+            except Exception:
+                self._close()
+            if not self._held:
+                self._close()
+
+
+leadership = Leadership()
+
+
+class DeadlineLoop:
+    # Background loop that sleeps until the next deadline its tick reports
+    # (bounded by max_sleep), runs the tick in a worker thread and broadcasts
+    # the resulting events. poke() wakes it early from any thread. With
+    # several workers only the holder of the Postgres advisory lock ticks.
+
+    def __init__(self, name: str, tick: Callable[[], TickResult], *, lock_key: int, max_sleep: float = 300.0) -> None:
+        self.name = name
+        self.tick = tick
+        self.lock_key = lock_key
+        self.max_sleep = max_sleep
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def poke(self) -> None:
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _is_leader(self) -> bool:
+        if get_engine().dialect.name != "postgresql":
+            return True
+        return leadership.acquire(self.lock_key)
+
+    def _release(self) -> None:
+        if get_engine().dialect.name == "postgresql":
+            leadership.release(self.lock_key)
+
+    async def _sleep(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        try:
+            while True:
+                if not readiness.ready:
+                    await asyncio.sleep(1.0)
+                    continue
+                try:
+                    if not await asyncio.to_thread(self._is_leader):
+                        await self._sleep(self.max_sleep)
+                        continue
+                    result = await asyncio.to_thread(self.tick)
+                except Exception:
+                    logger.exception("%s tick failed", self.name)
+                    result = TickResult(next_in=min(30.0, self.max_sleep))
+                for event in result.events:
+                    await hub.broadcast_json(event)
+                delay = self.max_sleep if result.next_in is None else min(max(result.next_in, 0.05), self.max_sleep)
+                await self._sleep(delay)
+        finally:
+            await asyncio.to_thread(self._release)
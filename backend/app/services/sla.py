@@ -0,0 +1,170 @@
+from __future__ import annotations
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import exists, or_, text
+from sqlmodel import Session, select, func, update
+
+from app.config import settings
+from app.db import get_engine
+from app.models import Job, Alert
+from app.services.alerts import raise_alerts
+from app.services.audit import write_audit_batch
+from app.services.dashboard import counters
+from app.services.escalation import escalation_loop
+from app.services.reference_cache import reference_cache
+from app.services.scheduler import DeadlineLoop, TickResult
+from app.services.versioning import bump
+
+# job_sla_due_at()/job_sla_risk_at() and their partial indexes come from
+# migration 0002; the risk point is fixed at 80% of the SLA window there.
+# The open-job predicate is spelled exactly like the index predicate so the
+# planner can use the partial indexes regardless of parameter binding.
+OPEN_SLA_JOBS = text("jobs.status IN ('unassigned', 'assigned', 'in_progress') AND jobs.sla_started_at IS NOT NULL")
+BATCH_SIZE = 500
+LOCK_KEY = 0x0C0A5E02
+SEVERITY_BY_PRIORITY = {"critical": "critical", "high": "high", "normal": "medium", "low": "medium"}
+
+
+def due_at():
+    return func.job_sla_due_at(Job.sla_started_at, Job.sla_minutes_total)
+
+
+def risk_at():
+    return func.job_sla_risk_at(Job.sla_started_at, Job.sla_minutes_total)
+
+
+def _alerts(rows, alert_type: str, description: str, now: datetime) -> list[dict]:
+    return [
+        {
+            "id": uuid.uuid4(),
+            "severity": SEVERITY_BY_PRIORITY.get(r.priority, "medium"),
+            "alert_type": alert_type,
+            "entity_type": "job",
+            "entity_id": r.id,
+            "description": description.format(job_code=r.job_code),
+            "status": "open",
+            "created_at": now,
+            "due_by": now + timedelta(minutes=settings.alert_ack_minutes),
+        }
+        for r in rows
+    ]
+
+
+class SlaScanner:
+    # Marks open jobs late when their SLA deadline passes and raises sla_risk
+    # alerts once 80% of the window has elapsed. Each tick works off the
+    # partial expression indexes (never a table scan) and reports when the
+    # next deadline or risk point falls, so the loop sleeps exactly that long.
+
+    def __init__(self) -> None:
+        # (risk_at, id) of the last risk point handled; id None = everything up to risk_at
+        self._risk_watermark: Optional[tuple[datetime, Optional[uuid.UUID]]] = None
+
+    def _mark_late(self, session: Session, now: datetime) -> list:
+        due = (
+            select(Job.id, Job.status.label("old_status"))
+            .where(OPEN_SLA_JOBS, due_at() <= now)
+            .limit(BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+            .cte("due")
+        )
+        stmt = (
+            update(Job)
+            .where(Job.id == due.c.id)
+            .values(status="late", last_update_at=now, **bump(Job))
+            .returning(Job.id, Job.job_code, Job.priority, Job.driver_id, Job.vehicle_id, due.c.old_status)
+            .execution_options(synchronize_session=False)
+        )
+        return list(session.exec(stmt).all())
+
+    def _at_risk(self, session: Session, now: datetime) -> list:
+        open_risk_alert = exists().where(
+            Alert.alert_type == "sla_risk",
+            Alert.entity_type == "job",
+            Alert.entity_id == Job.id,
+            Alert.status != "resolved",
+        )
+        stmt = select(Job.id, Job.job_code, Job.priority, risk_at().label("risk_at")).where(
+            OPEN_SLA_JOBS, risk_at() <= now, due_at() > now, ~open_risk_alert
+        )
+        # after the first pass only risk points crossed since the last tick are
+        # considered, so a resolved sla_risk alert is not raised again. Pages are
+        # keyed on (risk_at, id): jobs often share a risk point, and one that fell
+        # just past a full batch must still be picked up by the next.
+        if self._risk_watermark is not None:
+            at, last_id = self._risk_watermark
+            if last_id is None:
+                stmt = stmt.where(risk_at() > at)
+            else:
+                stmt = stmt.where(risk_at() >= at, or_(risk_at() > at, Job.id > last_id))
+        return list(session.exec(stmt.order_by(risk_at(), Job.id).limit(BATCH_SIZE)).all())
+
+    def _next_in(self, session: Session, now: datetime) -> Optional[float]:
+        next_due = session.exec(select(func.min(due_at())).where(OPEN_SLA_JOBS, due_at() > now)).one()
+        next_risk = session.exec(select(func.min(risk_at())).where(OPEN_SLA_JOBS, risk_at() > now)).one()
+        upcoming = [t for t in (next_due, next_risk) if t is not None]
+        return (min(upcoming) - now).total_seconds() if upcoming else None
+
+    @staticmethod
+    def _count_new(raised: list) -> None:
+        for r in raised:
+            if r.inserted:
+                counters.alert_changed(None, ("open", r.severity))
+
+    def tick(self) -> TickResult:
+        late_ids: list[uuid.UUID] = []
+        risk_ids: list[uuid.UUID] = []
+        with Session(get_engine()) as session:
+            now = session.exec(select(func.now())).one()
+
+            while True:
+                rows = self._mark_late(session, now)
+                raised = raise_alerts(session, _alerts(rows, "job_late", "{job_code} breached its SLA", now), now)
+                session.commit()
+                for r in rows:
+                    depot = reference_cache.job_depot(r.driver_id, r.vehicle_id)
+                    counters.job_changed((r.old_status, r.priority, depot), ("late", r.priority, depot))
+                self._count_new(raised)
+                late_ids += [r.id for r in rows]
+                if len(rows) < BATCH_SIZE:
+                    break
+
+            while True:
+                rows = self._at_risk(session, now)
+                if rows:
+                    raised = raise_alerts(session, _alerts(rows, "sla_risk", "{job_code} is at risk of breaching its SLA", now), now)
+                    session.commit()
+                    self._count_new(raised)
+                risk_ids += [r.id for r in rows]
+                if len(rows) < BATCH_SIZE:
+                    self._risk_watermark = (now, None)
+                    break
+                self._risk_watermark = (rows[-1].risk_at, rows[-1].id)
+
+            if late_ids:
+                write_audit_batch(session, actor_user_id=None, entity_type="job", entity_ids=late_ids, action="job.sla_late")
+            if risk_ids:
+                write_audit_batch(session, actor_user_id=None, entity_type="job", entity_ids=risk_ids, action="job.sla_risk")
+            next_in = self._next_in(session, now)
+
+        events = []
+        if late_ids or risk_ids:
+            # the new alerts carry a due_by the escalator has not seen yet
+            escalation_loop.poke()
+            events.append({
+                "type": "ops.refresh",
+                "payload": {
+                    "entity": "job",
+                    "action": "sla_scan",
+                    "late_ids": [str(i) for i in late_ids],
+                    "at_risk_ids": [str(i) for i in risk_ids],
+                    "last_update_at": now.isoformat(),
+                },
+            })
+        return TickResult(next_in=next_in, events=events)
+
+
+sla_scanner = SlaScanner()
+sla_loop = DeadlineLoop("sla", sla_scanner.tick, lock_key=LOCK_KEY, max_sleep=settings.sla_scanner_max_sleep_seconds)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import String, Uuid, cast, literal, null, tuple_, union_all
+from sqlmodel import Session, select
+
+from app.models import Alert, AuditLogEntity, AuditLogEntry
+
+# What happened to one job, driver, vehicle or alert, newest first. Three
+# sources are merged in a single UNION ALL: audit entries written for the
+# entity, batch entries that list it (via audit_log_entities), and alerts
+# raised on it. Each branch walks its (entity_type, entity_id, time DESC,
+# id DESC) index from migration 0010 and stops after one page, so the cost
+# depends on the page size and not on how large the audit log is. Pages are
+# keyset paginated on (at, id); the cursor is opaque to clients.
+
+TEXT = String()
+
+
+def encode_cursor(at: datetime, row_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(json.dumps([at.isoformat(), str(row_id)]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(at), uuid.UUID(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def _page(stmt, at, row_id, after: Optional[tuple], limit: int):
+    if after is not None:
+        stmt = stmt.where(tuple_(at, row_id) < tuple_(*after))
+    return stmt.order_by(at.desc(), row_id.desc()).limit(limit).subquery()
+
+
+def _json(raw: Optional[str]) -> Any:
+    return json.loads(raw) if raw else None
+
+
+def entity_timeline(
+    session: Session,
+    entity_type: str,
+    entity_id: uuid.UUID,
+    *,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> dict:
+    after = decode_cursor(cursor) if cursor else None
+    audit = _page(
+        select(
+            literal("audit").label("kind"),
+            AuditLogEntry.id.label("id"),
+            AuditLogEntry.timestamp.label("at"),
+            AuditLogEntry.action,
+            AuditLogEntry.actor_user_id,
+            AuditLogEntry.source,
+            AuditLogEntry.before_json,
+            AuditLogEntry.after_json,
+            cast(null(), TEXT).label("severity"),
+            cast(null(), TEXT).label("status"),
+            cast(null(), TEXT).label("description"),
+        ).where(AuditLogEntry.entity_type == entity_type, AuditLogEntry.entity_id == entity_id),
+        AuditLogEntry.timestamp, AuditLogEntry.id, after, limit + 1,
+    )
+    batch = _page(
+        select(
+            literal("audit").label("kind"),
+            AuditLogEntry.id.label("id"),
+            AuditLogEntity.timestamp.label("at"),
+            AuditLogEntry.action,
+            AuditLogEntry.actor_user_id,
+            AuditLogEntry.source,
+            cast(null(), TEXT).label("before_json"),
+            cast(null(), TEXT).label("after_json"),  # the batch's id list, not about this entity
+            cast(null(), TEXT).label("severity"),
+            cast(null(), TEXT).label("status"),
+            cast(null(), TEXT).label("description"),
+        )
+        .join(AuditLogEntry, AuditLogEntry.id == AuditLogEntity.audit_id)
+        .where(AuditLogEntity.entity_type == entity_type, AuditLogEntity.entity_id == entity_id),
+        AuditLogEntity.timestamp, AuditLogEntity.audit_id, after, limit + 1,
+    )
+    alerts = _page(
+        select(
+            literal("alert").label("kind"),
+            Alert.id.label("id"),
+            Alert.created_at.label("at"),
+            Alert.alert_type.label("action"),
+            cast(null(), Uuid).label("actor_user_id"),
+            literal("system").label("source"),
+            cast(null(), TEXT).label("before_json"),
+            cast(null(), TEXT).label("after_json"),
+            Alert.severity,
+            Alert.status,
+            Alert.description,
+        ).where(Alert.entity_type == entity_type, Alert.entity_id == entity_id),
+        Alert.created_at, Alert.id, after, limit + 1,
+    )
+    merged = union_all(*(select(*branch.c) for branch in (audit, batch, alerts))).subquery("timeline")
+    rows = session.execute(select(merged).order_by(merged.c.at.desc(), merged.c.id.desc()).limit(limit + 1)).all()
+
+    items = [
+        {
+            "kind": r.kind,
+            "id": r.id,
+            "at": r.at,
+            "action": r.action,
+            "actor_user_id": r.actor_user_id,
+            "source": r.source,
+            **({"before": _json(r.before_json), "after": _json(r.after_json)} if r.kind == "audit" else {}),
+            **({"severity": r.severity, "status": r.status, "description": r.description} if r.kind == "alert" else {}),
+        }
+        for r in rows[:limit]
+    ]
+    next_cursor = encode_cursor(rows[limit - 1].at, rows[limit - 1].id) if len(rows) > limit else None
+    return {"entity_type": entity_type, "entity_id": entity_id, "items": items, "next_cursor": next_cursor}
@@ -0,0 +1,53 @@
+from __future__ import annotations
+import uuid
+from typing import Any, Optional
+
+from sqlmodel import Session, select, update
+
+# jobs, drivers and vehicles carry a version that every write bumps (migration
+# 0007). Writes that act on something a caller has read go through cas_update(),
+# so two dispatchers racing on the same row cannot both succeed: the loser's
+# UPDATE matches nothing and it gets the row as it is now, without any row
+# being locked while either of them decides.
+
+
+class VersionConflict(Exception):
+    def __init__(self, entity_type: str, row_id: uuid.UUID, current: Optional[dict[str, Any]]) -> None:
+        super().__init__(f"{entity_type} {row_id} was changed by someone else; reload and retry")
+        self.entity_type = entity_type
+        self.row_id = row_id
+        self.current = current
+
+
+def bump(model) -> dict[str, Any]:
+    return {"version": model.version + 1}
+
+
+def check_version(entity_type: str, row, expected: Optional[int]) -> None:
+    # early exit for a version the client sent; the UPDATE still re-checks it
+    if expected is not None and row.version != expected:
+        raise VersionConflict(entity_type, row.id, row.model_dump())
+
+
+def current_row(session: Session, model, row_id: uuid.UUID):
+    # bypass the identity map: the session may hold the version we lost with
+    stmt = select(model).where(model.id == row_id).execution_options(populate_existing=True)
+    return session.exec(stmt).first()
+
+
+def cas_update(session: Session, model, entity_type: str, row_id: uuid.UUID, version: int, **values):
+    # UPDATE ... WHERE id = :id AND version = :version RETURNING *. On a miss the
+    # transaction is rolled back and VersionConflict carries the current row.
+    stmt = (
+        update(model)
+        .where(model.id == row_id, model.version == version)
+        .values(**values, **bump(model))
+        .returning(*model.__table__.c)
+        .execution_options(synchronize_session=False)
+    )
+    row = session.execute(stmt).first()
+    if row is not None:
+        return row
+    session.rollback()
+    current = current_row(session, model, row_id)
+    raise VersionConflict(entity_type, row_id, current.model_dump() if current is not None else None)
@@ -0,0 +1,238 @@
+from __future__ import annotations
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from sqlalchemy import DateTime, bindparam, or_
+from sqlmodel import Session, func, select
+
+from app.models import Job, Driver, Vehicle, Alert, SavedView
+from app.services.jobs import fleet_clause
+
+# Saved views are executed server-side: a view's JSON is parsed, validated and
+# compiled once into filter clauses, an ORDER BY and a column projection, then
+# cached per (view id, version). upsert_view() bumps the version, so other
+# workers simply miss their cache on the next request.
+#
+#   filter_json      {"status": "late", "q": "acme", ...}   same names as the list query params
+#   sort_json        {"field": "scheduled_at", "direction": "asc"}
+#   column_set_json  {"columns": ["job_code", "status"]}    id is always included
+#   grouping_json    {"field": "status"}
+
+PLAN_CACHE_SIZE = 1024
+
+
+def _eq(column) -> Callable[[Any], Any]:
+    return lambda value: column == str(value)
+
+
+def _search(*columns) -> Callable[[Any], Any]:
+    def clause(value):
+        like = f"%{str(value).lower()}%"
+        return or_(*(func.lower(func.coalesce(c, "")).like(like) for c in columns))
+    return clause
+
+
+def _stale(column) -> Callable[[Any], Any]:
+    # evaluated on every execution, so a cached plan keeps a moving cutoff
+    def clause(value):
+        minutes = int(value)
+        cutoff = bindparam(None, callable_=lambda: datetime.utcnow() - timedelta(minutes=minutes), type_=DateTime(timezone=True))
+        return column < cutoff
+    return clause
+
+
+@dataclass(frozen=True)
+class ViewModule:
+    model: type
+    filters: dict[str, Callable[[Any], Any]]
+    sorts: dict[str, Any]  # only columns with an index behind them, (column, id) unless unique
+    default_sort: tuple[str, str]
+    groups: tuple[str, ...]
+
+
+MODULES: dict[str, ViewModule] = {
+    "jobs": ViewModule(
+        model=Job,
+        filters={
+            "q": _search(Job.job_code, Job.customer, Job.pickup_site, Job.drop_site),
+            "status": _eq(Job.status),
+            "customer": _eq(Job.customer),
+            "priority": _eq(Job.priority),
+            "depot": lambda v: fleet_clause(Driver.depot == str(v), Vehicle.depot == str(v), cached=False),
+            "region": lambda v: fleet_clause(Driver.region == str(v), Vehicle.region == str(v), cached=False),
+            "stale_minutes": _stale(Job.last_update_at),
+        },
+        sorts={"last_update_at": Job.last_update_at, "scheduled_at": Job.scheduled_at, "job_code": Job.job_code},
+        default_sort=("last_update_at", "desc"),
+        groups=("status", "customer", "depot"),
+    ),
+    "drivers": ViewModule(
+        model=Driver,
+        filters={
+            "q": _search(Driver.name, Driver.staff_id),
+            "status": _eq(Driver.status),
+            "depot": _eq(Driver.depot),
+            "region": _eq(Driver.region),
+            "compliance_state": _eq(Driver.compliance_state),
+        },
+        sorts={"last_update_at": Driver.last_update_at, "staff_id": Driver.staff_id},
+        default_sort=("last_update_at", "desc"),
+        groups=("status", "depot", "region", "compliance_state"),
+    ),
+    "vehicles": ViewModule(
+        model=Vehicle,
+        filters={
+            "q": _search(Vehicle.registration, Vehicle.fleet_id),
+            "status": _eq(Vehicle.status),
+            "depot": _eq(Vehicle.depot),
+            "region": _eq(Vehicle.region),
+            "vehicle_class": _eq(Vehicle.vehicle_class),
+            "compliance_state": _eq(Vehicle.compliance_state),
+        },
+        sorts={"last_update_at": Vehicle.last_update_at, "registration": Vehicle.registration},
+        default_sort=("last_update_at", "desc"),
+        groups=("status", "depot", "region", "vehicle_class", "compliance_state"),
+    ),
+    "alerts": ViewModule(
+        model=Alert,
+        filters={
+            "status": _eq(Alert.status),
+            "severity": _eq(Alert.severity),
+            "alert_type": _eq(Alert.alert_type),
+            "entity_type": _eq(Alert.entity_type),
+        },
+        sorts={"created_at": Alert.created_at, "severity": Alert.severity},
+        default_sort=("created_at", "desc"),
+        groups=("status", "severity", "alert_type", "entity_type"),
+    ),
+}
+
+
+@dataclass(frozen=True)
+class CompiledView:
+    module: str
+    where: tuple = ()
+    order_by: tuple = ()
+    columns: tuple[str, ...] = ()  # empty: every column
+    group_by: Optional[str] = None
+
+    def apply(self, stmt):
+        return self.select_columns(stmt.where(*self.where))
+
+    def select_columns(self, stmt):
+        if not self.columns:
+            return stmt
+        model = MODULES[self.module].model
+        return stmt.with_only_columns(*(getattr(model, c) for c in self.columns))
+
+    def fetch(self, session: Session, stmt) -> list:
+        if not self.columns:
+            return list(session.exec(stmt).all())
+        # execute() rather than exec(): a projected select returns rows, not model scalars
+        return [dict(row._mapping) for row in session.execute(stmt).all()]
+
+    def project_items(self, items: list[dict], extra: tuple[str, ...] = ()) -> list[dict]:
+        # for results not built through apply(), e.g. jobs with include=; extra keeps the embedded relations
+        if not self.columns:
+            return items
+        keep = {*self.columns, *extra}
+        return [{k: v for k, v in item.items() if k in keep} for item in items]
+
+
+def _load(raw: str, name: str):
+    try:
+        return json.loads(raw or "{}")
+    except json.JSONDecodeError:
+        raise ValueError(f"{name} is not valid JSON")
+
+
+def compile_view(view: SavedView) -> CompiledView:
+    module = MODULES.get(view.module)
+    if module is None:
+        raise ValueError(f"Saved views are not supported for module {view.module!r}")
+
+    filters = _load(view.filter_json, "filter_json")
+    if not isinstance(filters, dict):
+        raise ValueError("filter_json must be an object")
+    unknown = sorted(set(filters) - set(module.filters))
+    if unknown:
+        raise ValueError(f"Unsupported filter: {unknown[0]} (supported: {', '.join(module.filters)})")
+    try:
+        where = tuple(module.filters[k](v) for k, v in filters.items() if v not in (None, ""))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid filter value")
+
+    sort = _load(view.sort_json, "sort_json")
+    sort_field = sort.get("field", module.default_sort[0]) if isinstance(sort, dict) else None
+    direction = sort.get("direction", module.default_sort[1]) if isinstance(sort, dict) else None
+    if sort_field not in module.sorts:
+        raise ValueError(f"Unsupported sort: {sort_field} (supported: {', '.join(module.sorts)})")
+    if direction not in ("asc", "desc"):
+        raise ValueError("sort direction must be asc or desc")
+    # id breaks ties so offset pages never repeat or skip rows with equal sort values;
+    # (column, id) indexes from migration 0013 keep that an index scan. Unique columns need none.
+    column = module.sorts[sort_field]
+    keys = (column,) if module.model.__table__.c[sort_field].unique else (column, module.model.id)
+    order_by = tuple(c.desc() if direction == "desc" else c.asc() for c in keys)
+
+    column_set = _load(view.column_set_json, "column_set_json")
+    names = column_set.get("columns", []) if isinstance(column_set, dict) else column_set
+    if not isinstance(names, list):
+        raise ValueError("column_set_json must list columns")
+    unknown = sorted(set(names) - set(module.model.model_fields))
+    if unknown:
+        raise ValueError(f"Unknown column: {unknown[0]}")
+    columns = tuple(dict.fromkeys(["id", *names])) if names else ()
+
+    grouping = _load(view.grouping_json, "grouping_json")
+    group_by = grouping.get("field") if isinstance(grouping, dict) else None
+    if group_by is not None and group_by not in module.groups:
+        raise ValueError(f"Unsupported grouping: {group_by} (supported: {', '.join(module.groups)})")
+
+    return CompiledView(view.module, where, order_by, columns, group_by)
+
+
+class ViewPlanCache:
+    def __init__(self, size: int = PLAN_CACHE_SIZE) -> None:
+        self._lock = threading.Lock()
+        self._plans: OrderedDict[tuple[uuid.UUID, int], CompiledView] = OrderedDict()
+        self._size = size
+
+    def get(self, session: Session, view_id: uuid.UUID, module: str) -> CompiledView:
+        # raises LookupError for an unknown view and ValueError for one that does not compile.
+        # A hit costs a primary-key probe of two columns; the JSON is only read to compile.
+        probe = session.exec(select(SavedView.module, SavedView.version).where(SavedView.id == view_id)).first()
+        if probe is None:
+            raise LookupError("Saved view not found")
+        view_module, version = probe
+        if view_module != module:
+            raise ValueError(f"Saved view belongs to {view_module}, not {module}")
+        key = (view_id, version)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+        view = session.get(SavedView, view_id)
+        if view is None:
+            raise LookupError("Saved view not found")
+        key = (view.id, view.version)
+        plan = compile_view(view)
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self._size:
+                self._plans.popitem(last=False)
+        return plan
+
+    def invalidate(self, view_id: uuid.UUID) -> None:
+        with self._lock:
+            for key in [k for k in self._plans if k[0] == view_id]:
+                del self._plans[key]
+
+
+view_plans = ViewPlanCache()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.config import settings
+from app.db import get_engine
+from app.readiness import readiness
+from app.replicas import replicas
+from app.services.board import board
+from app.services.dashboard import counters
+from app.services.reference_cache import reference_cache
+from app.services.archive import archive_loop
+from app.services.compliance import compliance_loop
+from app.services.escalation import escalation_loop, escalator
+from app.services.idempotency import purge_expired
+from app.services.ingest import ingest_flusher
+from app.services.sla import sla_loop
+
+logger = logging.getLogger("app.startup")
+
+
+def warm_pool() -> None:
+    # open pool_size connections up front so the first requests don't pay for connects
+    engine = get_engine()
+    connections = [engine.connect() for _ in range(settings.db_pool_size)]
+    try:
+        for connection in connections:
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def migrate() -> None:
+    from app.scripts.bootstrap import run_migrations, seed
+    if settings.run_migrations_on_start:
+        applied = run_migrations()
+        logger.info("migrations %s", "applied" if applied else "already at head")
+    if settings.seed_on_start:
+        seed()
+
+
+def reconcile_dashboard() -> None:
+    with Session(get_engine()) as session:
+        counters.reconcile(session)
+
+
+def reconcile_board() -> None:
+    with Session(get_engine()) as session:
+        board.reconcile(session)
+
+
+def load_reference_cache() -> None:
+    with Session(get_engine()) as session:
+        reference_cache.load(session)
+
+
+def _step(name: str, fn: Callable[[], None]) -> bool:
+    started = time.monotonic()
+    try:
+        fn()
+    except Exception as e:
+        logger.exception("startup step %s failed", name)
+        readiness.fail(name, e)
+        return False
+    readiness.done(name)
+    logger.info("startup step %s done in %.2fs", name, time.monotonic() - started)
+    return True
+
+
+def run_startup() -> None:
+    steps = [
+        ("migrations", migrate),
+        ("pool", warm_pool),
+        ("reference_cache", load_reference_cache),
+        ("dashboard", reconcile_dashboard),
+        ("board", reconcile_board),
+    ]
+    readiness.require(*(name for name, _ in steps))
+    for name, fn in steps:
+        if not _step(name, fn):
+            return
+
+
+async def _periodic(name: str, seconds: float, fn: Callable[[], None]) -> None:
+    while True:
+        await asyncio.sleep(seconds)
+        if not readiness.ready:
+            continue
+        try:
+            await asyncio.to_thread(fn)
+        except Exception:
+            logger.exception("periodic task %s failed", name)
+
+
+def _background_workers() -> list[tuple[str, Callable[[], Awaitable[None]], bool]]:
+    # (task name, coroutine factory, whether a run checks out a primary pool connection)
+    periodic = [
+        ("dashboard.reconcile", settings.dashboard_reconcile_seconds, reconcile_dashboard),
+        ("board.reconcile", settings.board_reconcile_seconds, reconcile_board),
+        # safety net for invalidations missed while the LISTEN connection was down
+        ("reference_cache.reload", settings.reference_cache_reload_seconds, load_reference_cache),
+        ("idempotency.purge", settings.idempotency_cleanup_seconds, purge_expired),
+    ]
+    workers = [(name, partial(_periodic, name, seconds, fn), True) for name, seconds, fn in periodic]
+    if replicas.replicas:
+        # replica engines have pools of their own
+        workers.append(("replicas.lag", partial(_periodic, "replicas.lag", settings.replica_lag_check_seconds, replicas.check_lag), False))
+    workers.append(("ingest.flush", ingest_flusher.run, True))
+    workers.append(("jobs.archive", archive_loop.run, True))
+    # the deadline loops rely on the partial indexes from migrations 0002/0003/0006
+    if get_engine().dialect.name == "postgresql":
+        workers.append(("sla.scan", sla_loop.run, True))
+        workers.append(("alert.escalation", escalation_loop.run, True))
+        workers.append(("compliance.sweep", compliance_loop.run, True))
+    return workers
+
+
+def pooled_background_workers() -> int:
+    # each runs one tick at a time on one connection; admission control keeps these out of the request slots
+    return sum(pooled for _, _, pooled in _background_workers())
+
+
+def start_background_tasks() -> list[asyncio.Task]:
+    escalator.configure(settings.alert_escalation_rules)
+    return [asyncio.create_task(run(), name=name) for name, run, _ in _background_workers()]
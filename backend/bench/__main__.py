@@ -0,0 +1,125 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from bench.scenarios import SCENARIOS, BenchContext
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def _git_sha() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def _run(args) -> dict:
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"unknown scenario(s): {', '.join(unknown)}; available: {', '.join(SCENARIOS)}")
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60.0, limits=limits) as client:
+        ctx = BenchContext(
+            client=client,
+            ws_url=args.ws_url,
+            duration_s=args.duration,
+            concurrency=args.concurrency,
+            ws_clients=args.ws_clients,
+            rng=random.Random(args.rng_seed),
+        )
+        results = {}
+        for name in names:
+            print(f"bench: {name}", file=sys.stderr)
+            for key, summary in (await SCENARIOS[name](ctx)).items():
+                results[key] = summary
+                print(f"  {key:<28} {_line(summary)}", file=sys.stderr)
+    return results
+
+
+def _line(summary: dict) -> str:
+    if "skipped" in summary:
+        return f"skipped: {summary['skipped']}"
+    parts = [f"{k}={summary[k]}" for k in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "errors") if k in summary]
+    return " ".join(parts)
+
+
+def cmd_run(args) -> None:
+    if args.seed_scale:
+        from app.scripts.seed_scale import seed_scale
+        seed_scale(args.seed_scale, rng_seed=args.rng_seed, reset=True)
+
+    results = asyncio.run(_run(args))
+    report = {
+        "meta": {
+            "git_sha": _git_sha(),
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "seed_scale": args.seed_scale,
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "ws_clients": args.ws_clients,
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{report['meta']['git_sha']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, sort_keys=True))
+    print(out)
+
+
+def cmd_compare(args) -> None:
+    base = json.loads(Path(args.base).read_text())["results"]
+    head = json.loads(Path(args.head).read_text())["results"]
+    metric = args.metric
+    print(f"{'result':<30} {'base':>10} {'head':>10} {'change':>8}")
+    for key in sorted(set(base) | set(head)):
+        b, h = base.get(key, {}).get(metric), head.get(key, {}).get(metric)
+        change = f"{(h - b) / b * 100:+.1f}%" if b and h is not None else ""
+        print(f"{key:<30} {_fmt(b):>10} {_fmt(h):>10} {change:>8}")
+
+
+def _fmt(v) -> str:
+    return "-" if v is None else f"{v:.2f}" if isinstance(v, float) else str(v)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run scenarios against a running API and write a JSON report")
+    run.add_argument("scenarios", nargs="*", help=f"subset of: {', '.join(SCENARIOS)}")
+    run.add_argument("--base-url", default="http://localhost:8000")
+    run.add_argument("--ws-url", default="ws://localhost:8000/ws")
+    run.add_argument("--duration", type=float, default=10.0, help="seconds per measured result")
+    run.add_argument("--concurrency", type=int, default=16)
+    run.add_argument("--ws-clients", type=int, default=200)
+    run.add_argument("--rng-seed", type=int, default=42)
+    run.add_argument("--seed-scale", type=int, default=None, help="reseed the database at this scale first (destructive)")
+    run.add_argument("--out", default=None)
+    run.set_defaults(func=cmd_run)
+
+    compare = sub.add_parser("compare", help="diff two JSON reports")
+    compare.add_argument("base")
+    compare.add_argument("head")
+    compare.add_argument("--metric", default="p95_ms")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+from __future__ import annotations
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+import msgpack
+import websockets
+
+from bench.stats import summarize
+
+Scenario = Callable[["BenchContext"], Awaitable[dict]]
+SCENARIOS: dict[str, Scenario] = {}
+
+
+def scenario(name: str):
+    def register(fn: Scenario) -> Scenario:
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+
+@dataclass
+class BenchContext:
+    client: httpx.AsyncClient
+    ws_url: str
+    duration_s: float
+    concurrency: int
+    ws_clients: int
+    rng: random.Random
+    fixtures: dict[str, Any] = field(default_factory=dict)
+
+
+async def drive(ctx: BenchContext, request: Callable[[], Awaitable[httpx.Response]], *, concurrency: Optional[int] = None) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + ctx.duration_s
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                res = await request()
+                ok = res.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency or ctx.concurrency)))
+    return summarize(latencies, errors=errors, elapsed_s=time.perf_counter() - started, concurrency=concurrency or ctx.concurrency)
+
+
+async def load_fixtures(ctx: BenchContext) -> None:
+    if ctx.fixtures:
+        return
+    c = ctx.client
+    jobs = (await c.get("/jobs", params={"page_size": 200})).json()
+    open_jobs = (await c.get("/jobs", params={"page_size": 200, "status": "in_progress"})).json()
+    drivers = (await c.get("/drivers", params={"page_size": 200, "compliance_state": "ok"})).json()
+    vehicles = (await c.get("/vehicles", params={"page_size": 200, "compliance_state": "ok"})).json()
+    ctx.fixtures.update(
+        jobs_total=jobs["total"],
+        job_ids=[j["id"] for j in jobs["items"]],
+        open_job_ids=[j["id"] for j in open_jobs["items"]],
+        customers=sorted({j["customer"] for j in jobs["items"]}),
+        depots=sorted({d["depot"] for d in drivers["items"] if d.get("depot")}),
+        driver_ids=[d["id"] for d in drivers["items"]],
+        vehicle_ids=[v["id"] for v in vehicles["items"]],
+    )
+
+
+def _jobs_filters(ctx: BenchContext) -> dict[str, Callable[[], dict]]:
+    f, rng = ctx.fixtures, ctx.rng
+    deep_page = max(1, f["jobs_total"] // 50 - 1)
+    return {
+        "jobs.default": lambda: {},
+        "jobs.q": lambda: {"q": rng.choice(["job-0001", "acme", "port", "mine"])},
+        "jobs.status": lambda: {"status": rng.choice(["unassigned", "assigned", "in_progress", "late"])},
+        "jobs.depot": lambda: {"depot": rng.choice(f["depots"])},
+        "jobs.stale_minutes": lambda: {"stale_minutes": rng.choice([30, 60, 120])},
+        "jobs.q+depot": lambda: {"q": "acme", "depot": rng.choice(f["depots"])},
+        "jobs.status+depot+stale": lambda: {"status": "in_progress", "depot": rng.choice(f["depots"]), "stale_minutes": 60},
+        "jobs.deep_page": lambda: {"page": rng.randint(max(1, deep_page // 2), deep_page)},
+    }
+
+
+@scenario("jobs")
+async def bench_jobs(ctx: BenchContext) -> dict:
+    await load_fixtures(ctx)
+    results = {}
+    for name, params in _jobs_filters(ctx).items():
+        results[name] = await drive(ctx, lambda: ctx.client.get("/jobs", params={"page_size": 50, **params()}))
+    return results
+
+
+@scenario("reports")
+async def bench_reports(ctx: BenchContext) -> dict:
+    return {
+        "reports.jobs": await drive(ctx, lambda: ctx.client.get("/reports/jobs", params={"days": ctx.rng.choice([30, 180, 730])})),
+    }
+
+
+@scenario("board")
+async def bench_board(ctx: BenchContext) -> dict:
+    await load_fixtures(ctx)
+    f, rng = ctx.fixtures, ctx.rng
+    return {
+        "board.all": await drive(ctx, lambda: ctx.client.get("/board")),
+        "board.depot": await drive(ctx, lambda: ctx.client.get("/board", params={"depot": rng.choice(f["depots"])})),
+        "board.status+stale": await drive(ctx, lambda: ctx.client.get("/board", params={"status": "in_progress", "stale_minutes": 60})),
+    }
+
+
+@scenario("compression")
+async def bench_compression(ctx: BenchContext) -> dict:
+    # the largest read payloads under each Accept-Encoding; reports bytes on
+    # the wire per response next to latency and server CPU per request
+    await load_fixtures(ctx)
+    endpoints = {
+        "jobs": ("/jobs", {"page_size": 200}),
+        "audit": ("/audit", {"page_size": 200}),
+        "reports": ("/reports/jobs", {"days": 730}),
+    }
+    results = {}
+    for label, (path, params) in endpoints.items():
+        for encoding in ("identity", "gzip", "br"):
+            headers = {"Accept-Encoding": encoding}
+            wire: list[int] = []
+
+            async def request():
+                res = await ctx.client.get(path, params=params, headers=headers)
+                wire.append(res.num_bytes_downloaded)
+                return res
+
+            cpu_before = await _server_cpu(ctx)
+            stats = await drive(ctx, request)
+            cpu_after = await _server_cpu(ctx)
+            requests = len(wire)
+            stats.update(
+                wire_bytes=round(sum(wire) / requests) if requests else None,
+                server_cpu_ms_per_request=round((cpu_after - cpu_before) * 1000 / requests, 2)
+                if requests and cpu_before is not None and cpu_after is not None else None,
+            )
+            results[f"compression.{label}.{encoding}"] = stats
+    return results
+
+
+@scenario("assign")
+async def bench_assign(ctx: BenchContext) -> dict:
+    await load_fixtures(ctx)
+    f, rng = ctx.fixtures, ctx.rng
+    if not f["open_job_ids"] or not f["driver_ids"] or not f["vehicle_ids"]:
+        return {"jobs.assign": {"skipped": "no open jobs or compliant drivers/vehicles"}}
+
+    def request():
+        return ctx.client.post(
+            f"/jobs/{rng.choice(f['open_job_ids'])}/assign",
+            json={"driver_id": rng.choice(f["driver_ids"]), "vehicle_id": rng.choice(f["vehicle_ids"])},
+        )
+
+    return {"jobs.assign": await drive(ctx, request)}
+
+
+@scenario("ws_fanout")
+async def bench_ws_fanout(ctx: BenchContext) -> dict:
+    await load_fixtures(ctx)
+    if not ctx.fixtures["open_job_ids"]:
+        return {"ws.fanout": {"skipped": "no open jobs"}}
+    job_id = ctx.fixtures["open_job_ids"][0]
+    sockets = await asyncio.gather(*(websockets.connect(ctx.ws_url, max_size=None) for _ in range(ctx.ws_clients)))
+    latencies: list[float] = []
+    missed = 0
+    rounds = 0
+    try:
+        deadline = time.perf_counter() + ctx.duration_s
+        while time.perf_counter() < deadline:
+            rounds += 1
+            t0 = time.perf_counter()
+            await ctx.client.post(f"/jobs/{job_id}/status", json={"status": "in_progress"})
+            results = await asyncio.gather(*(_await_job_event(ws, job_id, t0) for ws in sockets))
+            for r in results:
+                if r is None:
+                    missed += 1
+                else:
+                    latencies.append(r)
+    finally:
+        await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+    return {"ws.fanout": summarize(latencies, errors=missed, clients=ctx.ws_clients, rounds=rounds)}
+
+
+class _CountingProtocol(websockets.WebSocketClientProtocol):
+    # bytes as read off the socket: after permessage-deflate, including frame headers
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.wire_bytes = 0
+        self.received = 0  # hub messages decoded by the scenario
+
+    def data_received(self, data: bytes) -> None:
+        self.wire_bytes += len(data)
+        super().data_received(data)
+
+
+async def _server_cpu(ctx: BenchContext) -> Optional[float]:
+    for line in (await ctx.client.get("/metrics")).text.splitlines():
+        if line.startswith("process_cpu_seconds_total "):
+            return float(line.split()[1])
+    return None
+
+
+@scenario("ws_encoding")
+async def bench_ws_encoding(ctx: BenchContext) -> dict:
+    # the same fan-out as ws_fanout for each hub encoding, with and without
+    # permessage-deflate; reports wire bytes per client per hub message and
+    # server CPU per hub message (including the status update that triggers it)
+    await load_fixtures(ctx)
+    if not ctx.fixtures["open_job_ids"]:
+        return {"ws.encoding": {"skipped": "no open jobs"}}
+    job_id = ctx.fixtures["open_job_ids"][0]
+    results = {}
+    for encoding in ("json", "msgpack"):
+        for compression in (None, "deflate"):
+            name = f"ws.{encoding}" + ("+deflate" if compression else "")
+            sockets = await asyncio.gather(*(
+                websockets.connect(
+                    ctx.ws_url, subprotocols=[f"ops.{encoding}"], compression=compression,
+                    create_protocol=_CountingProtocol, max_size=None,
+                )
+                for _ in range(ctx.ws_clients)
+            ))
+            latencies: list[float] = []
+            missed = 0
+            rounds = 0
+            try:
+                wire_before = sum(ws.wire_bytes for ws in sockets)
+                cpu_before = await _server_cpu(ctx)
+                deadline = time.perf_counter() + ctx.duration_s
+                while time.perf_counter() < deadline:
+                    rounds += 1
+                    t0 = time.perf_counter()
+                    await ctx.client.post(f"/jobs/{job_id}/status", json={"status": "in_progress"})
+                    for r in await asyncio.gather(*(_await_job_event(ws, job_id, t0, encoding) for ws in sockets)):
+                        if r is None:
+                            missed += 1
+                        else:
+                            latencies.append(r)
+                cpu_after = await _server_cpu(ctx)
+                # the last round's trailing messages
+                await asyncio.gather(*(_drain(ws, encoding) for ws in sockets))
+                wire = sum(ws.wire_bytes for ws in sockets) - wire_before
+                messages = sum(ws.received for ws in sockets)
+            finally:
+                await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+            broadcasts = messages / len(sockets) if sockets else 0
+            results[name] = summarize(
+                latencies,
+                errors=missed,
+                clients=ctx.ws_clients,
+                rounds=rounds,
+                broadcasts=round(broadcasts),
+                wire_bytes_per_message=round(wire / messages, 1) if messages else None,
+                wire_bytes_per_broadcast=round(wire / broadcasts) if broadcasts else None,
+                server_cpu_ms_per_broadcast=round((cpu_after - cpu_before) * 1000 / broadcasts, 2)
+                if broadcasts and cpu_before is not None and cpu_after is not None else None,
+            )
+    return results
+
+
+def _decode(raw, encoding: str) -> dict:
+    return msgpack.unpackb(raw) if encoding == "msgpack" else json.loads(raw)
+
+
+async def _drain(ws: _CountingProtocol, encoding: str, idle: float = 0.5) -> None:
+    try:
+        while True:
+            _decode(await asyncio.wait_for(ws.recv(), idle), encoding)
+            ws.received += 1
+    except (asyncio.TimeoutError, websockets.ConnectionClosed):
+        pass
+
+
+async def _await_job_event(ws, job_id: str, t0: float, encoding: str = "json", timeout: float = 5.0) -> Optional[float]:
+    try:
+        async with asyncio.timeout(timeout):
+            while True:
+                msg = _decode(await ws.recv(), encoding)
+                if isinstance(ws, _CountingProtocol):
+                    ws.received += 1
+                if msg.get("type") == "job.updated" and msg.get("payload", {}).get("id") == job_id:
+                    return time.perf_counter() - t0
+    except (TimeoutError, websockets.ConnectionClosed):
+        return None
@@ -0,0 +1,34 @@
+from __future__ import annotations
+import math
+from typing import Optional
+
+
+def percentile(sorted_values: list[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    if lo == hi:
+        return sorted_values[lo]
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies_s: list[float], *, errors: int = 0, elapsed_s: Optional[float] = None, **extra) -> dict:
+    values = sorted(v * 1000.0 for v in latencies_s)
+    out = {
+        "count": len(values),
+        "errors": errors,
+        "p50_ms": _round(percentile(values, 50)),
+        "p95_ms": _round(percentile(values, 95)),
+        "p99_ms": _round(percentile(values, 99)),
+        "mean_ms": _round(sum(values) / len(values)) if values else None,
+        "max_ms": _round(values[-1]) if values else None,
+    }
+    if elapsed_s:
+        out["throughput_rps"] = round(len(values) / elapsed_s, 1)
+    out.update(extra)
+    return out
+
+
+def _round(v: Optional[float]) -> Optional[float]:
+    return round(v, 3) if v is not None else None
@@ -21,6 +21,8 @@ type Job = {
   exceptions?: string | null
   last_update_at: string
   owner_user_id?: string | null
+  driver?: { id: string; name: string; depot?: string | null; compliance_state: string } | null
+  vehicle?: { id: string; registration: string; vehicle_class?: string | null; compliance_state: string } | null
 }
 
 type Driver = { id: string; name: string; depot?: string | null; region?: string | null; compliance_state: string }
@@ -52,6 +54,8 @@ export default function Jobs() {
     { header: 'Pickup', accessorKey: 'pickup_site', size: 180 },
     { header: 'Drop', accessorKey: 'drop_site', size: 180 },
     { header: 'Status', accessorKey: 'status', cell: ({row}) => <Pill tone={toneForStatus(row.original.status) as any} text={row.original.status} /> },
+    { header: 'Driver', id: 'driver', size: 140, cell: ({row}) => row.original.driver?.name ?? <span style={{color:'var(--muted)'}}>-</span> },
+    { header: 'Vehicle', id: 'vehicle', size: 120, cell: ({row}) => row.original.vehicle?.registration ?? <span style={{color:'var(--muted)'}}>-</span> },
     { header: 'Exceptions', accessorKey: 'exceptions', cell: ({row}) => row.original.exceptions ? <Pill tone="warn" text={row.original.exceptions} /> : <span style={{color:'var(--muted)'}}>-</span> },
     { header: 'Last update', accessorKey: 'last_update_at', size: 170, cell: ({row}) => new Date(row.original.last_update_at).toLocaleString() },
   ], [])
@@ -71,6 +75,7 @@ export default function Jobs() {
       status: status || undefined,
       priority: priority || undefined,
       stale_minutes: stale === '' ? undefined : stale,
+      include: 'driver,vehicle',
     })
     setData(res)
     if (!selectedId && res.items.length) setSelectedId(res.items[0].id)
@@ -2,9 +2,10 @@ import React, { useEffect, useState } from 'react'
 import { Panel, Pill } from '../ui/table'
 import { apiGet } from '../ui/api'
 
-type Page<T> = { items: T[]; total: number; page: number; page_size: number }
-type Job = { id: string; status: string; priority: string; customer: string; last_update_at: string }
-type Alert = { id: string; severity: string; alert_type: string; status: string; created_at: string }
+type Summary = {
+  jobs: { total: number; open: number; by_status: Record<string, number> }
+  alerts: { open: number; open_by_severity: Record<string, number> }
+}
 
 function tile(label: string, value: number, tone: 'ok'|'warn'|'danger'|'info'|'muted' = 'info') {
   return (
@@ -19,21 +20,12 @@ function tile(label: string, value: number, tone: 'ok'|'warn'|'danger'|'info'|'m
 }
 
 export default function Overview() {
-  const [jobs, setJobs] = useState<Page<Job> | null>(null)
-  const [alerts, setAlerts] = useState<Page<Alert> | null>(null)
-  const [unassigned, setUnassigned] = useState(0)
-  const [late, setLate] = useState(0)
+  const [summary, setSummary] = useState<Summary | null>(null)
   const [events, setEvents] = useState<string[]>([])
 
   async function load() {
-    const j = await apiGet<Page<Job>>('/jobs', { page: 1, page_size: 1 })
-    const a = await apiGet<Page<Alert>>('/alerts', { page: 1, page_size: 1, status: 'open' })
-    const u = await apiGet<Page<Job>>('/jobs', { page: 1, page_size: 1, status: 'unassigned' })
-    const l = await apiGet<Page<Job>>('/jobs', { page: 1, page_size: 1, status: 'late' })
-    setJobs(j)
-    setAlerts(a)
-    setUnassigned(u.total)
-    setLate(l.total)
+    // one in-memory counter read instead of four list requests
+    setSummary(await apiGet<Summary>('/dashboard/summary'))
   }
 
   useEffect(() => {
@@ -54,12 +46,15 @@ export default function Overview() {
     return () => window.removeEventListener('ops:ws', onWs)
   }, [])
 
+  const unassigned = summary?.jobs.by_status.unassigned ?? 0
+  const late = summary?.jobs.by_status.late ?? 0
+
   return (
     <div style={{padding:12, display:'grid', gap:12}}>
       <Panel title="Today">
         <div style={{display:'flex', gap:10, flexWrap:'wrap'}}>
-          {tile('Total jobs', jobs?.total ?? 0, 'info')}
-          {tile('Open alerts', alerts?.total ?? 0, (alerts?.total ?? 0) > 20 ? 'warn' : 'ok')}
+          {tile('Total jobs', summary?.jobs.total ?? 0, 'info')}
+          {tile('Open alerts', summary?.alerts.open ?? 0, (summary?.alerts.open ?? 0) > 20 ? 'warn' : 'ok')}
           {tile('Unassigned', unassigned, unassigned > 0 ? 'warn' : 'ok')}
           {tile('Late', late, late > 0 ? 'danger' : 'ok')}
         </div>